@@ -1,24 +1,64 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
-import numpy as np
-from backend.db.database import get_db, IS_STANDALONE, engine, SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
+from backend.db.database import get_db, get_async_db, IS_STANDALONE, engine, SessionLocal, AsyncSessionLocal
+from backend.db.migrate_embeddings import add_model_versions, add_job_counters
 from backend.models.models import Base, IngestionJob, Professor, Paper, Author
 from backend.core.nlp_core import nlp_engine
+from backend.core.vector_index import vector_index
+from backend.core import pg_search
+from backend.core.lexical import search_papers, reciprocal_rank_fusion, tokenize, backfill_if_empty as backfill_lexical
+from backend.core.match_rows import fetch_matches, backfill_if_empty as backfill_match_rows
+from backend.core.centroids import backfill_if_empty as backfill_centroids
+from backend.core.prefilter import normalize_filters
+from backend.core.embedding_cache import query_cache, document_cache
+from backend.core.result_cache import result_cache, aget_index_generation, query_key
+from backend.core.scoring_pool import scoring_pool
+from backend.core.deadline import latency_model, fallback_paths, path_name
+from backend.core.embedding_batcher import ingest_metrics
 from backend.workers.tasks import ingest_university_faculty
+from backend.core.snapshot import warm_start, snapshot_checkpointer
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Literal
+from collections import deque
+from contextlib import asynccontextmanager
 import os
 import json
+import time
+import asyncio
 from openpyxl import Workbook
 from io import BytesIO
 
+# Upper bound on profiles per /match/batch request
+MAX_BATCH_PROFILES = int(os.getenv("MAX_BATCH_PROFILES", "1000"))
+
+NDJSON = "application/x-ndjson"
+
 # Initialize database on startup (especially for SQLite)
 Base.metadata.create_all(bind=engine)
+add_model_versions()
+add_job_counters()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Upgraded deployments: fill the derived tables before /match reads them
+    await run_in_threadpool(backfill_match_rows)
+    await run_in_threadpool(backfill_lexical)
+    await run_in_threadpool(backfill_centroids)
+    # Warm start from the newest snapshot under data/snapshots, checkpoint
+    # periodically while serving, and write a final snapshot on shutdown
+    if await run_in_threadpool(warm_start):
+        snapshot_checkpointer.mark_current()
+    snapshot_checkpointer.start()
+    yield
+    snapshot_checkpointer.stop()
+    await run_in_threadpool(snapshot_checkpointer.checkpoint)
 
-app = FastAPI(title="SRME API")
+app = FastAPI(title="SRME API", lifespan=lifespan)
 
 # Serve static files from frontend/static
 # This assumes the directory exists at the same level as backend
@@ -42,132 +82,325 @@ class MatchRequest(BaseModel):
     profile_text: str
     limit: int = 50  # Get more papers initially to group
     min_score: float = 0.4
+    # "exact" brute force, "ivf" / "hnsw" approximate search, "int8" / "pq"
+    # compressed scan + exact re-rank, "centroid" (professors first, then only
+    # their papers), or "auto" (hnsw once the corpus passes HNSW_THRESHOLD
+    # papers). Postgres runs "exact" and "centroid" as such and every other
+    # strategy as an ordered pgvector index scan (probes / ef_search apply).
+    strategy: Literal["auto", "exact", "ivf", "hnsw", "int8", "pq", "centroid"] = "auto"
+    probes: Optional[int] = None  # IVF lists to scan (default IVF_PROBES)
+    ef_search: Optional[int] = None  # HNSW candidate list size (default HNSW_EF_SEARCH)
+    rerank: Optional[int] = None  # int8/pq candidates re-scored exactly (default RERANK_CANDIDATES)
+    professors: Optional[int] = None  # centroid: professors whose papers are scored (default CENTROID_PROFESSORS)
+    stream: bool = False  # NDJSON, one professor group per line as soon as it is final
+    # "hybrid" fuses the vector ranking (above min_score) with BM25 over
+    # titles/abstracts via reciprocal rank fusion; lexical hits are kept
+    # whatever their similarity, so exact terms and acronyms still surface
+    mode: Literal["vector", "hybrid"] = "vector"
+    # Pre-filters, applied before scoring (exact university names)
+    universities: Optional[List[str]] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    min_citations: Optional[int] = None
+    # Latency budget: past it, cheaper paths answer instead (lexical without
+    # an embedding, cached rankings, ANN / centroid, fewer probes). The
+    # X-Match-Path / X-Match-Scanned headers say which path served the results.
+    deadline_ms: Optional[int] = None
+
+class BatchMatchRequest(BaseModel):
+    profiles: List[str]
+    limit: int = 50
+    min_score: float = 0.4
 
 class IngestRequest(BaseModel):
     university: str
     dept_url: str
 
-@app.post("/match")
-def get_matches(request: MatchRequest, db: Session = Depends(get_db)):
-    # 1. Embed user profile
-    vector = nlp_engine.encode(request.profile_text)
-    
+def _iter_group_matches(matches_flat):
+    # Group flat (paper, professor) matches by professor, best first, keeping
+    # the top 3 papers each (mimicking the Postgres query). Matches arrive in
+    # score order, so a group is final once it holds 3 papers; it is yielded
+    # as soon as every better-scoring group has been yielded too.
+    grouped = {}
+    pending = deque()
+    for m in matches_flat:
+        key = m['prof_id']
+        if key not in grouped:
+            grouped[key] = {
+                "professor": m['prof_name'],
+                "university": m['university'],
+                "email": m['email'],
+                "max_score": m['score'],
+                "papers": []
+            }
+            pending.append(key)
+        if len(grouped[key]['papers']) < 3:
+            grouped[key]['papers'].append({
+                "title": m['title'],
+                "year": m['year'],
+                "score": m['score'],
+                "url": m['url']
+            })
+        while pending and len(grouped[pending[0]]['papers']) == 3:
+            yield grouped[pending.popleft()]
+    # Out of matches: everything still pending is final
+    while pending:
+        yield grouped[pending.popleft()]
+
+def _group_matches(matches_flat):
+    return list(_iter_group_matches(matches_flat))
+
+def _stream_groups(matches_flat):
+    for group in _iter_group_matches(matches_flat):
+        yield json.dumps(group) + "\n"
+
+def _request_filters(request):
+    return normalize_filters(request.universities, request.year_min, request.year_max, request.min_citations)
+
+def _rank_matches(db, vector, request, limit, min_score, stats=None):
+    # Flat (paper, professor) matches, best first, in the shape _group_matches
+    # expects. `stats` receives the strategy and fraction of the corpus scanned.
+    filters = _request_filters(request)
     if IS_STANDALONE:
         # 2a. Standalone (SQLite) matching logic
-        # We need to manually compute similarity since SQLite has no pgvector
-        query = text("""
-            SELECT 
-                p.id as paper_id, p.title, p.year, p.paper_url,
-                prof.name as prof_name, prof.university, prof.email, e.embedding
-            FROM paper_embeddings e
-            JOIN papers p ON e.paper_id = p.id
-            JOIN paper_authors pa ON p.id = pa.paper_id
-            JOIN authors a ON pa.author_id = a.id
-            JOIN professors prof ON a.professor_id = prof.id
-        """)
-        rows = db.execute(query).fetchall()
-        
-        matches_flat = []
-        vec_a = np.array(vector)
-        for row in rows:
-            # Parse vector from JSON string
-            vec_b = np.array(json.loads(row.embedding))
-            # Cosine similarity
-            similarity = np.dot(vec_a, vec_b) / (np.linalg.norm(vec_a) * np.linalg.norm(vec_b))
-            
-            if similarity >= request.min_score:
-                matches_flat.append({
-                    "prof_id": row.prof_name + row.university, # Simple key
-                    "prof_name": row.prof_name,
-                    "university": row.university,
-                    "email": row.email,
-                    "title": row.title,
-                    "year": row.year,
-                    "score": float(similarity),
-                    "url": row.paper_url
-                })
-        
-        # Sort and Group (mimicking the Postgres query)
-        matches_flat.sort(key=lambda x: x['score'], reverse=True)
-        
-        grouped = {}
-        for m in matches_flat[:request.limit]:
-            key = m['prof_id']
-            if key not in grouped:
-                grouped[key] = {
-                    "professor": m['prof_name'],
-                    "university": m['university'],
-                    "email": m['email'],
-                    "max_score": m['score'],
-                    "papers": []
-                }
-            if len(grouped[key]['papers']) < 3:
-                grouped[key]['papers'].append({
-                    "title": m['title'],
-                    "year": m['year'],
-                    "score": m['score'],
-                    "url": m['url']
-                })
-        
-        return list(grouped.values())
+        # SQLite has no pgvector, so similarity is computed against the
+        # process-wide in-memory index (one matrix-vector product per query)
+        return vector_index.search(
+            db, vector, limit, min_score,
+            strategy=request.strategy, n_probes=request.probes,
+            ef_search=request.ef_search, n_rerank=request.rerank,
+            n_professors=request.professors, filters=filters, stats=stats
+        )
     else:
         # 2b. Production (Postgres + pgvector) matching logic
-        query = text("""
-            WITH ranked_papers AS (
-                SELECT 
-                    p.id as paper_id, 
-                    p.title, 
-                    p.year, 
-                    p.citations,
-                    p.paper_url,
-                    prof.id as prof_id,
-                    prof.name as prof_name,
-                    prof.university,
-                    (1 - (e.embedding <=> :vec)) as similarity
-                FROM paper_embeddings e
-                JOIN papers p ON e.paper_id = p.id
-                JOIN paper_authors pa ON p.id = pa.paper_id
-                JOIN authors a ON pa.author_id = a.id
-                JOIN professors prof ON a.professor_id = prof.id
-                WHERE (1 - (e.embedding <=> :vec)) >= :min_score
-                ORDER BY similarity DESC
-                LIMIT :limit
-            )
-            SELECT 
-                prof_id, 
-                prof_name, 
-                university,
-                MAX(similarity) as max_score,
-                JSON_AGG(JSON_BUILD_OBJECT(
-                    'title', title, 
-                    'year', year, 
-                    'score', similarity,
-                    'url', paper_url
-                )) as top_papers
-            FROM ranked_papers
-            GROUP BY prof_id, prof_name, university
-            ORDER BY max_score DESC
-        """)
-        
-        results = db.execute(query, {
-            "vec": str(vector), 
-            "limit": request.limit,
-            "min_score": request.min_score
-        }).fetchall()
-        
-        matches = []
-        for row in results:
-            matches.append({
-                "professor": row.prof_name,
-                "university": row.university,
-                "max_score": round(float(row.max_score), 4),
-                "papers": row.top_papers[:3]
-            })
-            
-        return matches
+        if stats is not None:
+            _pg_stats(stats, request, filters)
+        if request.strategy == "centroid":
+            return pg_search.centroid_matches(db, vector, limit, min_score, request.professors, filters=filters)
+        if request.strategy == "exact":
+            return pg_search.exact_matches(db, vector, limit, min_score, filters=filters)
+        # Ordered ivfflat / hnsw index scan, thresholded afterwards
+        return pg_search.index_matches(db, vector, limit, min_score,
+                                       probes=request.probes, ef_search=request.ef_search, filters=filters)
+
+def _pg_stats(stats, request, filters):
+    # pgvector does not report how many rows an index scan visited; only an
+    # unfiltered exact scan is known to read the whole corpus
+    stats["strategy"] = request.strategy
+    stats["scanned"] = 1.0 if request.strategy == "exact" and not filters else None
+
+async def _arank_matches(db, vector, request, limit, min_score, stats=None):
+    # _rank_matches for the async request path
+    if IS_STANDALONE:
+        # CPU-bound scoring against the in-memory index runs on the scoring pool
+        return await scoring_pool.run(_with_session, _rank_matches, vector, request, limit, min_score, stats)
+    filters = _request_filters(request)
+    if stats is not None:
+        _pg_stats(stats, request, filters)
+    if request.strategy == "centroid":
+        return await pg_search.acentroid_matches(db, vector, limit, min_score, request.professors, filters=filters)
+    if request.strategy == "exact":
+        return await pg_search.aexact_matches(db, vector, limit, min_score, filters=filters)
+    return await pg_search.aindex_matches(db, vector, limit, min_score,
+                                          probes=request.probes, ef_search=request.ef_search, filters=filters)
+
+def _with_session(fn, *args):
+    # Runs fn(db, *args) on a scoring pool thread with its own sync session
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+def _rank_matches_batch(db, vectors, limit, min_score):
+    # One flat match list per vector (None vectors give [])
+    if IS_STANDALONE:
+        # Exact scores for the whole batch from one matrix-matrix product per segment
+        return vector_index.search_many(db, vectors, limit, min_score)
+    # pgvector: one index query per profile, all on the same connection
+    return [pg_search.index_matches(db, v, limit, min_score) if v is not None else [] for v in vectors]
+
+def _rank_hybrid(db, vector, request, limit, stats=None):
+    # Flat matches in fused order; "score" stays the cosine similarity
+    semantic = _rank_matches(db, vector, request, limit, request.min_score, stats)
+    lexical = search_papers(db, request.profile_text, limit)
+    paper_rank = {paper_id: rank for rank, (paper_id, _) in enumerate(lexical)}
+
+    lexical_matches = fetch_matches(db, list(paper_rank), vector, filters=_request_filters(request))
+    by_key = {(m['paper_id'], m['prof_id']): m for m in lexical_matches}
+    by_key.update({(m['paper_id'], m['prof_id']): m for m in semantic})
+    # Every professor of a lexical hit inherits the paper's rank
+    lexical_keys = sorted((k for k in by_key if k[0] in paper_rank), key=lambda k: paper_rank[k[0]])
+
+    fused = reciprocal_rank_fusion([[(m['paper_id'], m['prof_id']) for m in semantic], lexical_keys])
+    return [by_key[k] for k in sorted(fused, key=fused.get, reverse=True)[:limit]]
+
+def _rank_lexical(db, request, limit):
+    # Embedding-free fallback: BM25 order. Without a vector there is no
+    # similarity, so "score" is the BM25 score relative to the best hit (0-1]
+    lexical = search_papers(db, request.profile_text, limit)
+    if not lexical:
+        return []
+    best = lexical[0][1] or 1.0
+    paper_rank = {paper_id: rank for rank, (paper_id, _) in enumerate(lexical)}
+    bm25 = dict(lexical)
+    matches = fetch_matches(db, list(paper_rank), None, filters=_request_filters(request))
+    for m in matches:
+        m['score'] = bm25[m['paper_id']] / best
+    return sorted(matches, key=lambda m: paper_rank[m['paper_id']])[:limit]
+
+def _ranking_key(vector, request, filters):
+    # Hybrid rankings depend on the query terms and on min_score (applied
+    # before fusion), so both join the key; vector rankings are unthresholded
+    hybrid = request.mode == "hybrid"
+    return query_key(vector, strategy=request.strategy, probes=request.probes,
+                     ef_search=request.ef_search, rerank=request.rerank, professors=request.professors,
+                     mode=request.mode, filters=filters,
+                     terms=tuple(sorted(set(tokenize(request.profile_text)))) if hybrid else None,
+                     min_score=request.min_score if hybrid else None)
+
+async def _rank_and_cache(db, vector, request, depth, generation, filters):
+    # Ranks one path, times it for deadline planning and caches the ranking.
+    # With db=None the ranking uses its own session, so it may outlive the
+    # request (a path overrunning its deadline completes in the background).
+    started = time.perf_counter()
+    stats = {}
+    key = latency_model.key(request, filters is not None)
+    try:
+        if request.mode == "hybrid":
+            # BM25 scoring reads posting lists through a sync session
+            ranking = await scoring_pool.run(_with_session, _rank_hybrid, vector, request, depth, stats)
+        elif db is None:
+            async with AsyncSessionLocal() as own_db:
+                ranking = await _arank_matches(own_db, vector, request, depth, -1.0, stats)
+        else:
+            ranking = await _arank_matches(db, vector, request, depth, -1.0, stats)
+    except asyncio.CancelledError:
+        # Abandoned past its deadline: the time so far is a lower bound, which
+        # keeps the planner from choosing this path again under the same budget
+        latency_model.observe(key, (time.perf_counter() - started) * 1000)
+        raise
+    latency_model.observe(key, (time.perf_counter() - started) * 1000)
+    result_cache.put(generation, _ranking_key(vector, request, filters), ranking, depth)
+    return ranking, stats
+
+async def _within(task, deadline):
+    # Awaits the task until the deadline (if any). On timeout it keeps running.
+    if deadline is None:
+        return await task
+    return await asyncio.wait_for(asyncio.shield(task), max(deadline - time.perf_counter(), 0))
+
+def _discard_result(task):
+    # Background rankings past a deadline: nobody awaits them any more
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Background ranking failed: {task.exception()}")
+
+def _served_path(request, stats):
+    # Path label with "auto" resolved to the strategy that actually ran
+    return path_name(request.model_copy(update={"strategy": stats.get("strategy", request.strategy)}))
+
+def _match_response(request, response, ranking, path, scanned, started, scored=True):
+    # Groups the ranking (JSON or NDJSON) and reports how it was served
+    headers = {"X-Match-Path": path, "X-Match-Elapsed-Ms": f"{(time.perf_counter() - started) * 1000:.1f}"}
+    if scanned is not None:
+        headers["X-Match-Scanned"] = f"{scanned:.4f}"
+    # Hybrid and lexical rankings keep hits whatever their similarity
+    keep_all = request.mode == "hybrid" or not scored
+    matches_flat = (m for m in ranking[:request.limit] if keep_all or m['score'] >= request.min_score)
+    if request.stream:
+        # The generator only touches the ranking, never the request's session
+        return StreamingResponse(_stream_groups(matches_flat), media_type=NDJSON, headers=headers)
+    response.headers.update(headers)
+    return _group_matches(matches_flat)
+
+@app.post("/match")
+async def get_matches(request: MatchRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
+    # Async end to end: the embeddings call and database reads are awaited,
+    # and CPU-bound ranking runs on the bounded scoring pool, so concurrent
+    # queries do not each hold a server thread while they wait.
+    started = time.perf_counter()
+    deadline = started + request.deadline_ms / 1000 if request.deadline_ms else None
+    filters = _request_filters(request)
+    depth = max(request.limit, result_cache.depth)
+
+    # 1. Embed user profile (cached: users re-run the same profile while tuning
+    # sliders). An in-memory cache hit is taken before the deadline applies,
+    # so even a spent budget does not fall back to BM25 when a vector exists.
+    vector = nlp_engine.cached_query(request.profile_text)
+    if vector is None:
+        embedding = asyncio.ensure_future(nlp_engine.aencode_query(request.profile_text))
+        try:
+            vector = await _within(embedding, deadline)
+        except asyncio.TimeoutError:
+            # The embeddings call keeps going and fills the query cache for the
+            # next request; meanwhile answer from BM25, which needs no vector
+            embedding.add_done_callback(_discard_result)
+            ranking = await scoring_pool.run(_with_session, _rank_lexical, request, depth)
+            return _match_response(request, response, ranking, "lexical", 0.0, started, scored=False)
+    if vector is None:
+        return StreamingResponse(iter(()), media_type=NDJSON) if request.stream else []
+
+    # 2. Rank, or reuse the ranking cached for this query in the current index
+    # generation. The cache holds the unthresholded top RESULT_CACHE_DEPTH, so
+    # a different limit / min_score is a slice + filter of the same ranking.
+    generation = await aget_index_generation(db)
+    ranking = result_cache.get(generation, _ranking_key(vector, request, filters), request.limit)
+    if ranking is not None:
+        return _match_response(request, response, ranking, "cache", 0.0, started)
+    if deadline is None:
+        ranking, stats = await _rank_and_cache(db, vector, request, depth, generation, filters)
+        return _match_response(request, response, ranking, _served_path(request, stats), stats.get("scanned"), started)
+
+    # 3. Under a deadline: the most accurate path expected to fit what is
+    # left of the budget (from observed latencies), cheaper ones after it
+    ready = vector_index.ready_strategies() if IS_STANDALONE else {"hnsw", "centroid"}
+    paths = fallback_paths(request, ready)
+    path = latency_model.plan(paths, filters is not None, (deadline - time.perf_counter()) * 1000)
+    if path is not paths[0]:
+        # The requested path's ranking was looked up above
+        ranking = result_cache.get(generation, _ranking_key(vector, path, filters), request.limit)
+        if ranking is not None:
+            return _match_response(request, response, ranking, f"cache {path_name(path)}", 0.0, started)
+    task = asyncio.ensure_future(_rank_and_cache(None, vector, path, depth, generation, filters))
+    try:
+        ranking, stats = await _within(task, deadline)
+    except asyncio.TimeoutError:
+        if path is paths[-1]:
+            # Nothing cheaper left: best effort is this path's answer
+            ranking, stats = await task
+        else:
+            # Race the overrunning path against the cheapest one: whichever
+            # answers first is served and the other is cancelled. That drops
+            # it while still queued on the scoring pool (or aborts its
+            # Postgres query); a standalone ranking already running on the
+            # pool completes in the background and only fills the result cache
+            cheapest = asyncio.ensure_future(_rank_and_cache(None, vector, paths[-1], depth, generation, filters))
+            done, _ = await asyncio.wait((task, cheapest), return_when=asyncio.FIRST_COMPLETED)
+            if task in done and task.exception() is None:
+                cheapest.cancel()
+            else:
+                task.cancel()
+                path, task = paths[-1], cheapest
+            ranking, stats = await task
+    return _match_response(request, response, ranking, _served_path(path, stats), stats.get("scanned"), started)
+
+@app.post("/match/batch")
+def get_batch_matches(request: BatchMatchRequest, db: Session = Depends(get_db)):
+    if len(request.profiles) > MAX_BATCH_PROFILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PROFILES} profiles per batch")
+
+    # 1. Embed every profile with one embeddings call (cache hits are skipped)
+    vectors = nlp_engine.encode_queries(request.profiles)
+
+    # 2. Score the whole batch at once and group per profile
+    rankings = _rank_matches_batch(db, vectors, request.limit, request.min_score)
+    return [
+        {"index": i, "matches": _group_matches(ranking)}
+        for i, ranking in enumerate(rankings)
+    ]
 
 @app.post("/ingest")
-def start_ingest(request: IngestRequest, db: Session = Depends(get_db)):
+async def start_ingest(request: IngestRequest, db: AsyncSession = Depends(get_async_db)):
     import uuid
     job_id = str(uuid.uuid4())
     
@@ -178,9 +411,10 @@ def start_ingest(request: IngestRequest, db: Session = Depends(get_db)):
         status="queued"
     )
     db.add(job)
-    db.commit()
+    await db.commit()
 
-    ingest_university_faculty.delay(request.university, request.dept_url, job_id=job_id)
+    # Publishing to the broker is blocking I/O
+    await run_in_threadpool(ingest_university_faculty.delay, request.university, request.dept_url, job_id=job_id)
     return {"task_id": job_id, "status": "Queued"}
 
 @app.get("/job/{job_id}")
@@ -189,13 +423,25 @@ def get_job_status(job_id: str, db: Session = Depends(get_db)):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    # Embedding throughput over the job's lifetime so far (updated_at moves
+    # with every progress / embedding update)
+    elapsed = (job.updated_at - job.created_at).total_seconds() if job.updated_at and job.created_at else 0
+    papers_embedded = job.papers_embedded or 0
+    embedding_calls = job.embedding_calls or 0
+    cache_hits = job.embedding_cache_hits or 0
     return {
         "id": job.id,
         "university": job.university,
         "status": job.status,
         "total_faculty": job.total_faculty,
         "processed_faculty": job.processed_faculty,
-        "progress": (job.processed_faculty / job.total_faculty) if job.total_faculty > 0 else 0
+        "progress": (job.processed_faculty / job.total_faculty) if job.total_faculty > 0 else 0,
+        "papers_embedded": papers_embedded,
+        "embedding_calls": embedding_calls,
+        "embedding_cache_hits": cache_hits,
+        "cache_hit_ratio": round(cache_hits / papers_embedded, 3) if papers_embedded else 0.0,
+        "papers_per_call": round(papers_embedded / embedding_calls, 2) if embedding_calls else 0.0,
+        "papers_per_second": round(papers_embedded / elapsed, 2) if elapsed > 0 else 0.0
     }
 
 @app.get("/export/professors.xlsx")
@@ -246,6 +492,18 @@ def export_professors(db: Session = Depends(get_db)):
         }
     )
 
+@app.get("/stats")
+def stats():
+    return {
+        "query_embedding_cache": query_cache.stats(),
+        "document_embedding_cache": document_cache.stats(),
+        "embedding_throttle": nlp_engine.throttle.stats(),
+        "match_result_cache": result_cache.stats(),
+        "match_latency_ms": latency_model.stats(),
+        # Embedding batches run in this process in standalone mode (Celery workers keep their own)
+        "ingestion": ingest_metrics.stats()
+    }
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -0,0 +1,127 @@
+"""
+Recall@k versus latency report for the standalone IVF and HNSW indexes against
+the exact (brute force) path, used to pick IVF_LISTS / IVF_PROBES and
+HNSW_EF_SEARCH for a corpus size.
+
+    # against the live standalone index
+    python -m backend.benchmarks.ann_recall --k 10 --probes 1,2,4,8,16,32
+
+    # include HNSW (graph build is pure Python, allow ~1-2 min per 50k papers)
+    python -m backend.benchmarks.ann_recall --hnsw --ef 16,32,64,128
+
+    # against a synthetic clustered corpus (100k-1M papers, no database needed)
+    python -m backend.benchmarks.ann_recall --synthetic 100000 --lists 1264
+"""
+import argparse
+import time
+import numpy as np
+from backend.core.ivf_index import IVFIndex, inverted_lists, search_lists
+from backend.core.hnsw_index import HNSWIndex
+
+
+def synthetic_corpus(n, dim=768, n_topics=2000, noise=1.0, seed=0):
+    # Papers cluster around research topics, which is what makes IVF useful;
+    # uniformly random vectors would be a worst case no real corpus resembles.
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 50000):
+        end = min(start + 50000, n)
+        chunk = topics[rng.integers(0, n_topics, end - start)]
+        chunk += noise * rng.standard_normal((end - start, dim)).astype(np.float32)
+        matrix[start:end] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return matrix
+
+
+def _queries(gather, n, n_queries, dim, seed=1):
+    # Perturbed corpus rows approximate "a profile close to some existing papers"
+    rng = np.random.default_rng(seed)
+    q = gather(np.sort(rng.choice(n, size=min(n_queries, n), replace=False)))
+    q = q + 0.8 * rng.standard_normal(q.shape).astype(np.float32) / np.sqrt(dim)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def run(gather, score_all, ids, k, probes, n_lists, n_queries, ef_values=()):
+    n = len(ids)
+    dim = gather(np.arange(1)).shape[1]
+    queries = _queries(gather, n, n_queries, dim)
+
+    started = time.time()
+    ivf = IVFIndex.train(gather, ids, n_lists=n_lists or None)
+    offsets, rows = inverted_lists(ivf.lookup(ids), ivf.n_lists)
+    print(f"Corpus: {n} vectors x {dim} dims | IVF: {ivf.n_lists} lists, trained in {time.time() - started:.1f}s")
+
+    exact, exact_ms = [], []
+    for q in queries:
+        t = time.perf_counter()
+        exact.append(set(_top_k(score_all(q), k).tolist()))
+        exact_ms.append((time.perf_counter() - t) * 1000)
+
+    print(f"\n{'strategy':<10}{'probes':>8}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}{'scanned':>10}")
+    print(f"{'exact':<10}{'-':>8}{1.0:>12.3f}{np.percentile(exact_ms, 50):>10.2f}{np.percentile(exact_ms, 95):>10.2f}{'100%':>10}")
+    for n_probes in probes:
+        recalls, latencies, scanned = [], [], []
+        for q, truth in zip(queries, exact):
+            t = time.perf_counter()
+            lists = ivf.probe(q, n_probes)
+            candidates, scores = search_lists(q, lists, offsets, rows, gather)
+            found = candidates[_top_k(scores, k)] if len(candidates) else candidates
+            latencies.append((time.perf_counter() - t) * 1000)
+            recalls.append(len(truth & set(found.tolist())) / max(len(truth), 1))
+            scanned.append(len(candidates) / n)
+        print(f"{'ivf':<10}{n_probes:>8}{np.mean(recalls):>12.3f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 95):>10.2f}{np.mean(scanned):>10.1%}")
+
+    if not ef_values:
+        return
+    started = time.time()
+    hnsw = HNSWIndex(dim)
+    for start in range(0, n, 4096):
+        rows = np.arange(start, min(start + 4096, n))
+        for vector, row in zip(gather(rows), rows):
+            hnsw.insert(vector, row)
+    print(f"\nHNSW: M={hnsw.M}, ef_construction={hnsw.ef_construction}, built in {time.time() - started:.1f}s")
+    print(f"{'strategy':<10}{'ef':>8}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for ef in ef_values:
+        recalls, latencies = [], []
+        for q, truth in zip(queries, exact):
+            t = time.perf_counter()
+            found, _ = hnsw.search(q, k, ef)
+            latencies.append((time.perf_counter() - t) * 1000)
+            recalls.append(len(truth & set(found.tolist())) / max(len(truth), 1))
+        print(f"{'hnsw':<10}{ef:>8}{np.mean(recalls):>12.3f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF recall@k vs latency report")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", default="1,2,4,8,16,32")
+    parser.add_argument("--lists", type=int, default=0, help="inverted lists (default ~4*sqrt(N))")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark a synthetic corpus of this many papers")
+    parser.add_argument("--hnsw", action="store_true", help="also build and measure an HNSW graph")
+    parser.add_argument("--ef", default="16,32,64,128")
+    args = parser.parse_args()
+    probes = [int(p) for p in args.probes.split(",")]
+    ef_values = [int(e) for e in args.ef.split(",")] if args.hnsw else []
+
+    if args.synthetic:
+        matrix = synthetic_corpus(args.synthetic)
+        run(lambda r: matrix[r], lambda q: matrix @ q, np.arange(len(matrix)), args.k, probes, args.lists, args.queries, ef_values)
+    else:
+        from backend.db.database import SessionLocal
+        from backend.core.vector_index import vector_index
+
+        db = SessionLocal()
+        try:
+            state = vector_index.ensure_fresh(db)
+        finally:
+            db.close()
+        run(state.vectors, state.score, state.paper_ids, args.k, probes, args.lists, args.queries, ef_values)
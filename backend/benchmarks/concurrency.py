@@ -0,0 +1,108 @@
+"""
+Latency under concurrent load for a running API: fires /match requests at
+each concurrency level and reports p50 / p95 / p99 latency and throughput.
+
+    uvicorn backend.api.main:app --port 8000
+    python -m backend.benchmarks.concurrency --url http://localhost:8000 --concurrency 50,100,200
+
+By default a small set of profiles is repeated, so after the first round the
+embeddings come from the query cache and rankings from the result cache
+(the common "tuning sliders" load). --unique makes every profile distinct,
+which exercises the embeddings API and full scoring on each request.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+import httpx
+
+PROFILES = [
+    "Deep learning for medical image segmentation and diagnosis",
+    "CRISPR gene editing and functional genomics of cancer",
+    "Reinforcement learning for robotic manipulation",
+    "Climate modelling and extreme weather attribution",
+    "Graph neural networks for drug discovery",
+    "Quantum error correction and fault-tolerant computing",
+    "Natural language processing for low-resource languages",
+    "Battery materials and solid-state electrolytes",
+]
+
+
+async def _one(client, url, body):
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, json=body)
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+async def run_level(base_url, concurrency, n_requests, limit, strategy, unique):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        gate = asyncio.Semaphore(concurrency)
+        run_id = time.time_ns()
+
+        async def request(i):
+            text = PROFILES[i % len(PROFILES)]
+            if unique:
+                text = f"{text} ({run_id}-{i})"
+            async with gate:
+                return await _one(client, "/match", {"profile_text": text, "limit": limit, "strategy": strategy})
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([ms for ms, ok in results if ok])
+    errors = sum(not ok for _, ok in results)
+    if not len(latencies):
+        return {"concurrency": concurrency, "requests": n_requests, "errors": errors}
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+async def run(base_url, levels, per_level, limit, strategy, unique, output=None):
+    lines = [f"/match at {base_url} | limit={limit} strategy={strategy} unique={unique}",
+             f"{'conc':>6}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}"]
+    print(lines[0])
+    print(lines[1])
+    # Warm-up: loads the index and fills the caches for the repeated profiles
+    await run_level(base_url, len(PROFILES), len(PROFILES), limit, strategy, False)
+    for concurrency in levels:
+        r = await run_level(base_url, concurrency, per_level * concurrency, limit, strategy, unique)
+        if "p50" in r:
+            line = (f"{r['concurrency']:>6}{r['requests']:>7}{r['errors']:>8}"
+                    f"{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['rps']:>9.1f}")
+        else:
+            line = f"{r['concurrency']:>6}{r['requests']:>7}{r['errors']:>8}   (every request failed)"
+        print(line)
+        lines.append(line)
+
+    if output:
+        with open(output, "w") as fh:
+            fh.write("\n".join(lines) + "\n")
+        print(f"📝 Report written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /match latency (p50/p95/p99)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", default="50,100,200", help="comma-separated in-flight request counts")
+    parser.add_argument("--per-level", type=int, default=5, help="requests per level = concurrency x this")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--strategy", default="auto")
+    parser.add_argument("--unique", action="store_true", help="distinct profile per request (no cache hits)")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, [int(c) for c in args.concurrency.split(",")], args.per_level,
+                    args.limit, args.strategy, args.unique, args.output))
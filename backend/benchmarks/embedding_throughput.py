@@ -0,0 +1,70 @@
+"""
+Embedding throughput of ingestion: one embeddings call per paper (the old
+per-paper task) vs the batched calls the embedding batcher makes. Paper
+texts come from the database; nothing is written.
+
+    python -m backend.benchmarks.embedding_throughput --papers 256 --batch 16,64,256
+    python -m backend.benchmarks.embedding_throughput --provider local --papers 10000
+
+Every run calls the configured provider (--papers texts per row of the
+report); with the OpenAI provider that is the embeddings API.
+"""
+import argparse
+import time
+from sqlalchemy import text
+from backend.db.database import SessionLocal
+from backend.core.nlp_core import NLPEngine, nlp_engine
+from backend.core.embedding_providers import PROVIDERS, get_provider
+
+
+def _texts(n):
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("SELECT title, abstract FROM papers ORDER BY id LIMIT :n"), {"n": n}).fetchall()
+    finally:
+        db.close()
+    return [f"{r.title}. {r.abstract or ''}" for r in rows if r.title or r.abstract]
+
+
+def run(n_papers, batch_sizes, output=None, engine=nlp_engine):
+    texts = _texts(n_papers)
+    if not texts:
+        print("No papers in the database")
+        return
+    lines = [f"Embedding {len(texts)} papers with {engine.model_name} ({engine.dimensions} dims)",
+             f"{'batch':>7}{'calls':>8}{'seconds':>10}{'papers/s':>10}{'speedup':>9}"]
+    print(lines[0])
+    print(lines[1])
+    baseline = None
+    for batch in [1] + batch_sizes:
+        started = time.perf_counter()
+        calls = 0
+        for start in range(0, len(texts), batch):
+            chunk = texts[start:start + batch]
+            if batch == 1:
+                engine.encode(chunk[0])
+            else:
+                engine.batch_encode(chunk)
+            calls += 1
+        elapsed = time.perf_counter() - started
+        rate = len(texts) / elapsed
+        baseline = baseline or rate
+        line = f"{batch:>7}{calls:>8}{elapsed:>10.2f}{rate:>10.1f}{rate / baseline:>8.1f}x"
+        print(line)
+        lines.append(line)
+
+    if output:
+        with open(output, "w") as fh:
+            fh.write("\n".join(lines) + "\n")
+        print(f"📝 Report written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-paper vs batched embedding throughput")
+    parser.add_argument("--papers", type=int, default=256)
+    parser.add_argument("--batch", default="16,64,256", help="comma-separated batch sizes (1 = per paper is always run)")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default=None, help="default: EMBEDDING_PROVIDER")
+    args = parser.parse_args()
+    engine = NLPEngine(get_provider(args.provider)) if args.provider else nlp_engine
+    run(args.papers, [int(b) for b in args.batch.split(",") if b and int(b) > 1], args.output, engine)
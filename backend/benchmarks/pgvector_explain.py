@@ -0,0 +1,112 @@
+"""
+EXPLAIN ANALYZE report for the Postgres /match queries: the exact full scan
+against the index-friendly ORDER BY ... LIMIT query, checking that the
+latter is served by the ivfflat / hnsw index, plus latency and recall.
+
+    python -m backend.benchmarks.pgvector_explain --limit 200 --probes 10 --queries 20 --output explain.txt
+
+Query vectors are stored paper embeddings with a little noise, so no
+embeddings API call is needed.
+"""
+import argparse
+import json
+import re
+import numpy as np
+from sqlalchemy import text
+from backend.db.database import IS_STANDALONE, SessionLocal
+from backend.db.pgvector_index import vector_indexes
+from backend.core.pg_search import EXACT_QUERY, INDEX_QUERY, index_ef_search, set_search_params
+
+
+def _explain(db, query, params):
+    plan = [r[0] for r in db.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + query.text), params)]
+    ms = next((float(m.group(1)) for line in plan if (m := re.search(r"Execution Time: ([\d.]+) ms", line))), float("nan"))
+    return plan, ms
+
+
+def _pairs(db, query, params):
+    return {(r.title, r.prof_id) for r in db.execute(query, params)}
+
+
+def run(limit, probes, ef_search, n_queries, min_score, output=None):
+    db = SessionLocal()
+    lines = []
+
+    def emit(line=""):
+        print(line)
+        lines.append(line)
+
+    try:
+        indexes = vector_indexes(db.connection())
+        emit(f"Vector indexes on match_rows: {', '.join(f'{idx.name} ({idx.method})' for idx in indexes) or 'none'}")
+        rows = db.execute(text("SELECT embedding FROM match_rows ORDER BY random() LIMIT :n"), {"n": n_queries}).fetchall()
+        rng = np.random.default_rng(0)
+        queries = []
+        for r in rows:
+            v = np.asarray(json.loads(r[0]), dtype=np.float32)
+            queries.append(str((v + rng.normal(0, 0.3 * np.abs(v).mean(), len(v))).tolist()))
+        if not queries:
+            emit("No embeddings to query.")
+            return
+
+        ef = index_ef_search(limit, ef_search)
+        timings = {"exact": [], "index": []}
+        recalls = []
+        index_used = 0
+        for i, vec in enumerate(queries):
+            params = {"vec": vec, "limit": limit, "min_score": min_score}
+
+            exact_plan, exact_ms = _explain(db, EXACT_QUERY, params)
+            db.rollback()
+            set_search_params(db, probes, ef)
+            index_plan, index_ms = _explain(db, INDEX_QUERY, params)
+            used = any(idx.name in line for line in index_plan for idx in indexes)
+            index_used += used
+
+            truth = _pairs(db, EXACT_QUERY, params)
+            db.rollback()
+            set_search_params(db, probes, ef)
+            found = _pairs(db, INDEX_QUERY, params)
+            db.rollback()
+
+            timings["exact"].append(exact_ms)
+            timings["index"].append(index_ms)
+            if truth:
+                recalls.append(len(truth & found) / len(truth))
+
+            if i == 0:
+                emit("\n--- exact (full scan) ---")
+                for line in exact_plan:
+                    emit(line)
+                emit(f"\n--- index (ORDER BY <=> LIMIT {limit}, probes={probes}, ef_search={ef}) ---")
+                for line in index_plan:
+                    emit(line)
+
+        emit(f"\n{'query':<8}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, ms in timings.items():
+            emit(f"{name:<8}{np.percentile(ms, 50):>10.2f}{np.percentile(ms, 95):>10.2f}")
+        emit(f"\nIndex scan used in {index_used}/{len(queries)} index queries")
+        emit(f"Recall@{limit} of index query vs exact: {np.mean(recalls) if recalls else float('nan'):.4f}")
+    finally:
+        db.close()
+
+    if output:
+        with open(output, "w") as fh:
+            fh.write("\n".join(lines) + "\n")
+        print(f"📝 Report written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE of the pgvector /match queries")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=None, help="ivfflat.probes (default PG_IVFFLAT_PROBES)")
+    parser.add_argument("--ef-search", type=int, default=None, help="hnsw.ef_search (default PG_HNSW_EF_SEARCH)")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--min-score", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    if IS_STANDALONE:
+        print("Standalone mode: set POSTGRES_HOST to benchmark the pgvector queries.")
+    else:
+        run(args.limit, args.probes, args.ef_search, args.queries, args.min_score, args.output)
@@ -0,0 +1,77 @@
+"""
+Memory vs recall report for the compressed (int8 / PQ) first-pass scan with
+exact float32 re-ranking, against the exact path.
+
+    # against the live standalone index
+    python -m backend.benchmarks.quantization_recall --k 10 --rerank 50,200,1000
+
+    # against a synthetic clustered corpus
+    python -m backend.benchmarks.quantization_recall --synthetic 100000
+"""
+import argparse
+import time
+import numpy as np
+from backend.core.quantization import QUANTIZERS, TRAIN_SAMPLE, rerank
+from backend.benchmarks.ann_recall import synthetic_corpus, _queries, _top_k
+
+
+def run(gather, score_all, n, k, rerank_sizes, n_queries, kinds):
+    dim = gather(np.arange(1)).shape[1]
+    queries = _queries(gather, n, n_queries, dim)
+    exact = [set(_top_k(score_all(q), k).tolist()) for q in queries]
+    sample = gather(np.sort(np.random.default_rng(0).choice(n, size=min(n, TRAIN_SAMPLE), replace=False)))
+    print(f"Corpus: {n} vectors x {dim} dims, float32 = {n * dim * 4 / 2**20:.1f} MiB")
+
+    print(f"\n{'kind':<6}{'MiB':>9}{'ratio':>7}{'rerank':>8}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for kind in kinds:
+        started = time.time()
+        quantizer = QUANTIZERS[kind].train(sample)
+        codes = np.concatenate([quantizer.encode(gather(np.arange(s, min(s + 65536, n)))) for s in range(0, n, 65536)])
+        build_s = time.time() - started
+        size = codes.nbytes / 2**20
+        codes = quantizer.layout(codes)
+        ratio = (dim * 4) / quantizer.bytes_per_vector
+        for n_rerank in [0] + rerank_sizes:
+            recalls, latencies = [], []
+            for q, truth in zip(queries, exact):
+                t = time.perf_counter()
+                approx = quantizer.scan(codes, q)
+                if n_rerank:
+                    positions, scores = rerank(q, approx, k, gather, n_rerank)
+                    found = positions[_top_k(scores, k)]
+                else:
+                    found = _top_k(approx, k)
+                latencies.append((time.perf_counter() - t) * 1000)
+                recalls.append(len(truth & set(found.tolist())) / max(len(truth), 1))
+            print(f"{kind:<6}{size:>9.1f}{ratio:>6.0f}x{n_rerank or '-':>8}{np.mean(recalls):>12.3f}"
+                  f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}")
+        print(f"       ({kind} trained + encoded in {build_s:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="int8 / PQ recall@k vs memory report")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", default="50,200,1000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--kinds", default="int8,pq")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark a synthetic corpus of this many papers")
+    args = parser.parse_args()
+    rerank_sizes = [int(r) for r in args.rerank.split(",") if r]
+    kinds = args.kinds.split(",")
+
+    if args.synthetic:
+        matrix = synthetic_corpus(args.synthetic)
+        run(lambda r: matrix[r], lambda q: matrix @ q, len(matrix), args.k, rerank_sizes, args.queries, kinds)
+    else:
+        from backend.db.database import SessionLocal
+        from backend.core.vector_index import vector_index
+
+        db = SessionLocal()
+        try:
+            state = vector_index.ensure_fresh(db)
+        finally:
+            db.close()
+        # Unique papers only (superseded rows are never served)
+        gather = lambda p: state.vectors(state.lookup_rows[p])
+        score_all = lambda q: state.vectors(state.lookup_rows) @ q
+        run(gather, score_all, len(state.lookup_rows), args.k, rerank_sizes, args.queries, kinds)
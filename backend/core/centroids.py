@@ -0,0 +1,134 @@
+import os
+import math
+import numpy as np
+from sqlalchemy import text, bindparam
+from sqlalchemy.exc import IntegrityError
+from backend.db.database import SessionLocal, IS_STANDALONE, db_lock
+from backend.models.models import ProfessorCentroid
+from backend.core.nlp_core import nlp_engine
+from backend.core.result_cache import bump_index_generation
+
+# Professors whose papers are scored by strategy="centroid" (at least `limit`)
+CENTROID_PROFESSORS = int(os.getenv("CENTROID_PROFESSORS", "50"))
+# Recompute attempts per professor when concurrent inserts of its row conflict
+CENTROID_ATTEMPTS = 3
+
+
+def paper_weight(citations):
+    # Highly cited papers pull the centroid harder, with diminishing returns
+    return 1.0 + math.log1p(max(citations or 0, 0))
+
+
+def _recompute(db, prof_id):
+    # Row lock first (Postgres) so concurrent workers serialise per professor
+    centroid = (
+        db.query(ProfessorCentroid)
+        .filter(ProfessorCentroid.professor_id == prof_id)
+        .with_for_update()
+        .first()
+    )
+    rows = db.execute(text("""
+        SELECT e.paper_id, e.embedding, p.citations
+        FROM paper_embeddings e
+        JOIN papers p ON e.paper_id = p.id
+        JOIN paper_authors pa ON pa.paper_id = p.id
+        JOIN authors a ON pa.author_id = a.id
+        WHERE a.professor_id = :prof_id AND e.model_version = :model_version
+    """).columns(embedding=ProfessorCentroid.embedding.type),
+        {"prof_id": prof_id, "model_version": nlp_engine.model_version}).fetchall()
+
+    total, weight, seen = None, 0.0, set()
+    for row in rows:
+        if row.paper_id in seen:
+            continue
+        seen.add(row.paper_id)
+        v = np.asarray(row.embedding, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        if norm == 0:
+            continue
+        w = paper_weight(row.citations)
+        total = v * (w / norm) if total is None else total + v * (w / norm)
+        weight += w
+
+    if centroid is None:
+        centroid = ProfessorCentroid(professor_id=prof_id)
+        db.add(centroid)
+    centroid.embedding = total.tolist() if total is not None else None
+    centroid.weight = weight
+    centroid.paper_count = len(seen)
+    db.commit()
+
+
+def update_professor_centroids(db, prof_ids):
+    """
+    Recomputes the centroids of the given professors from their embedded
+    papers. Only the affected professors are touched (a few dozen papers
+    each), and recomputing rather than adding deltas keeps it idempotent when
+    the link and embedding tasks race.
+    """
+    for prof_id in set(prof_ids):
+        for attempt in range(CENTROID_ATTEMPTS):
+            try:
+                if IS_STANDALONE:
+                    with db_lock:
+                        _recompute(db, prof_id)
+                else:
+                    _recompute(db, prof_id)
+                break
+            except IntegrityError:
+                # Another worker inserted the row first; retry as an update
+                db.rollback()
+        else:
+            print(f"⚠️ Centroid of professor {prof_id} not updated after {CENTROID_ATTEMPTS} conflicting writes; "
+                  f"it is recomputed on their next update, or by python -m backend.core.centroids")
+
+
+def professors_of_paper(db, paper_id):
+    return professors_of_papers(db, [paper_id])
+
+
+def professors_of_papers(db, paper_ids):
+    if not paper_ids:
+        return []
+    return [r[0] for r in db.execute(text("""
+        SELECT DISTINCT a.professor_id
+        FROM paper_authors pa JOIN authors a ON pa.author_id = a.id
+        WHERE pa.paper_id IN :paper_ids AND a.professor_id IS NOT NULL
+    """).bindparams(bindparam("paper_ids", expanding=True)), {"paper_ids": list(paper_ids)})]
+
+
+def backfill():
+    """Recomputes every professor's centroid (e.g. after upgrading). Returns the number of professors."""
+    db = SessionLocal()
+    try:
+        prof_ids = [r[0] for r in db.execute(text("SELECT id FROM professors"))]
+        update_professor_centroids(db, prof_ids)
+        bump_index_generation(db)
+    finally:
+        db.close()
+    print(f"✅ Recomputed centroids for {len(prof_ids)} professors")
+    return len(prof_ids)
+
+
+def backfill_if_empty():
+    """
+    Runs backfill() when no centroids exist but match_rows does: a deployment
+    upgraded from before centroids, where strategy="centroid" would find no
+    professors. Called on API startup, after the match_rows backfill.
+    """
+    db = SessionLocal()
+    try:
+        needed = (db.execute(text("SELECT 1 FROM professor_centroids LIMIT 1")).first() is None and
+                  db.execute(text("SELECT 1 FROM match_rows LIMIT 1")).first() is not None)
+    finally:
+        db.close()
+    if not needed:
+        return False
+    print("⚠️ professor_centroids is empty but papers are served: backfilling it before serving /match")
+    backfill()
+    return True
+
+
+if __name__ == "__main__":
+    # Backfill centroids for every professor (e.g. after upgrading)
+    backfill()
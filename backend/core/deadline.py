@@ -0,0 +1,81 @@
+import os
+import threading
+
+# Weight of the newest observation in a path's moving latency average
+LATENCY_ALPHA = 0.2
+# Share of the remaining budget a path may be expected to take; the rest
+# covers grouping, serialisation and estimation error
+DEADLINE_HEADROOM = float(os.getenv("DEADLINE_HEADROOM", "0.8"))
+# ef_search of the cheapest HNSW rung
+FAST_EF_SEARCH = int(os.getenv("FAST_EF_SEARCH", "16"))
+
+
+def path_name(request):
+    """Label of the ranking path a MatchRequest takes, e.g. "ivf probes=1"."""
+    knobs = [f"{name}={value}" for name, value in (("probes", request.probes), ("ef_search", request.ef_search),
+                                                   ("rerank", request.rerank), ("professors", request.professors))
+             if value is not None]
+    name = " ".join([request.strategy] + knobs)
+    return f"hybrid {name}" if request.mode == "hybrid" else name
+
+
+def fallback_paths(request, ready):
+    """
+    The requested ranking path followed by progressively cheaper ones, as
+    MatchRequest copies. `ready` names the approximate strategies whose
+    structures are already built: training an IVF or building an HNSW graph
+    would blow any budget, so unbuilt ones are skipped.
+    """
+    ladder = [{}]
+    if request.strategy not in ("hnsw", "ivf", "centroid"):
+        ladder += [{"strategy": s} for s in ("hnsw", "ivf") if s in ready]
+    if request.strategy != "centroid" and "centroid" in ready:
+        ladder.append({"strategy": "centroid"})
+    # Same structures, narrower search
+    if "ivf" in ready:
+        ladder.append({"strategy": "ivf", "probes": 1})
+    elif "hnsw" in ready:
+        ladder.append({"strategy": "hnsw", "ef_search": FAST_EF_SEARCH})
+    return [request.model_copy(update=update) for update in ladder]
+
+
+class LatencyModel:
+    """Moving average of /match ranking latency per path, for deadline planning."""
+
+    def __init__(self, alpha=LATENCY_ALPHA):
+        self.alpha = alpha
+        self._ms = {}
+        self._lock = threading.Lock()
+
+    def key(self, request, filtered):
+        # Filtered rankings score a subset, so they are timed separately
+        return f"{path_name(request)} filtered" if filtered else path_name(request)
+
+    def observe(self, key, ms):
+        with self._lock:
+            previous = self._ms.get(key)
+            self._ms[key] = ms if previous is None else previous + self.alpha * (ms - previous)
+
+    def expected(self, key):
+        """Expected milliseconds, or None before the path's first run."""
+        return self._ms.get(key)
+
+    def plan(self, paths, filtered, remaining_ms):
+        """
+        The first (most accurate) path expected to finish within the budget.
+        Paths never timed are assumed to fit; when none fits, the cheapest.
+        """
+        budget = remaining_ms * DEADLINE_HEADROOM
+        for request in paths:
+            expected = self.expected(self.key(request, filtered))
+            if expected is None or expected <= budget:
+                return request
+        return paths[-1]
+
+    def stats(self):
+        with self._lock:
+            return {key: round(ms, 2) for key, ms in sorted(self._ms.items())}
+
+
+# Global latency model instance
+latency_model = LatencyModel()
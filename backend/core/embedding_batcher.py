@@ -0,0 +1,118 @@
+import os
+import time
+import atexit
+import threading
+
+# A batch is dispatched once it holds EMBED_BATCH_SIZE papers, or
+# EMBED_BATCH_WAIT_MS after its first paper was queued, whichever comes first
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_BATCH_WAIT_MS = int(os.getenv("EMBED_BATCH_WAIT_MS", "250"))
+
+
+class EmbeddingBatcher:
+    """
+    Aggregates paper ids queued for embedding (from every professor being
+    ingested by this process) into batches, so ingestion makes one
+    embeddings call and one bulk insert per batch instead of one per paper.
+
+    `dispatch(items)` receives lists of [paper_id, job_id] pairs; it should
+    only enqueue the work (e.g. a Celery task), as it runs on the batcher's
+    thread.
+    """
+
+    def __init__(self, dispatch, max_items=EMBED_BATCH_SIZE, max_wait_ms=EMBED_BATCH_WAIT_MS):
+        self.dispatch = dispatch
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._first_at = None   # when the oldest pending id was queued
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.drain)
+
+    def submit(self, paper_ids, job_id=None):
+        with self._cond:
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.extend([paper_id, job_id] for paper_id in paper_ids)
+            if self._thread is None:
+                # Started lazily, so it exists in the process that submits
+                # (Celery forks its pool after importing the tasks)
+                self._thread = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+                self._thread.start()
+            self._cond.notify()
+
+    def _take(self):
+        # Next batch; callers hold the condition
+        batch, self._pending = self._pending[:self.max_items], self._pending[self.max_items:]
+        self._first_at = time.monotonic() if self._pending else None
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while len(self._pending) < self.max_items:
+                    remaining = self._first_at + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take()
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        try:
+            self.dispatch(batch)
+        except Exception as e:
+            print(f"⚠️ Embedding batch of {len(batch)} papers could not be dispatched: {e}")
+
+    def drain(self):
+        """Dispatches everything still pending (at exit, or at worker shutdown)."""
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return
+                batch = self._take()
+            self._dispatch(batch)
+
+
+class IngestMetrics:
+    """Process-wide embedding throughput: papers, cache hits, embeddings calls and time spent per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.papers = 0
+        self.cache_hits = 0
+        self.api_calls = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def record(self, papers, api_calls, encode_seconds, write_seconds, cache_hits=0):
+        with self._lock:
+            self.batches += 1
+            self.papers += papers
+            self.cache_hits += cache_hits
+            self.api_calls += api_calls
+            self.encode_seconds += encode_seconds
+            self.write_seconds += write_seconds
+
+    def stats(self):
+        with self._lock:
+            busy = self.encode_seconds + self.write_seconds
+            return {
+                "batches": self.batches,
+                "papers": self.papers,
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": round(self.cache_hits / self.papers, 3) if self.papers else 0.0,
+                "api_calls": self.api_calls,
+                "papers_per_call": round(self.papers / self.api_calls, 2) if self.api_calls else 0.0,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "write_seconds": round(self.write_seconds, 3),
+                "papers_per_second": round(self.papers / busy, 2) if busy else 0.0,
+            }
+
+
+# Global metrics instance
+ingest_metrics = IngestMetrics()
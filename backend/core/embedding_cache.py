@@ -0,0 +1,208 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from backend.db.database import DATA_DIR
+from backend.models.vector import encode_vector, decode_vector
+
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))            # in-process LRU entries
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", str(30 * 24 * 3600)))  # seconds on disk
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "100000"))   # disk entries
+# Paper texts embedded during ingestion (co-authored and re-ingested papers repeat)
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "1024"))
+DOCUMENT_CACHE_TTL = int(os.getenv("DOCUMENT_CACHE_TTL", str(365 * 24 * 3600)))
+DOCUMENT_CACHE_MAX_ROWS = int(os.getenv("DOCUMENT_CACHE_MAX_ROWS", "200000"))  # ~600 MiB at 768 dims
+
+# Disk eviction runs once every N writes to keep puts cheap
+_EVICT_EVERY = 200
+# Keys per SELECT ... IN (...) of a bulk lookup (SQLite's variable limit)
+_LOOKUP_CHUNK = 500
+
+
+def normalize_text(text):
+    # Whitespace and Unicode-form differences should not defeat the cache
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def cache_key(text, model_name, dimensions):
+    payload = f"{model_name}\0{dimensions}\0{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: a bounded in-process LRU in front of a SQLite
+    file store with TTL expiry and size-bounded eviction (least recently
+    accessed first). Vectors are stored as packed float32 BLOBs.
+    """
+
+    def __init__(self, path, memory_size, ttl, max_rows):
+        self.path = path
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.max_rows = max_rows
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_accessed ON embeddings (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached float32 vector or None."""
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return vector
+
+            now = time.time()
+            row = self._db().execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+            self._db().execute("UPDATE embeddings SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db().commit()
+            vector = decode_vector(row[0])
+            self._remember(key, vector)
+            self.hits_disk += 1
+            return vector
+
+    def get_memory(self, key):
+        """get() from the in-process tier only: never touches the disk, so event loops may call it."""
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+            return vector
+
+    def get_many(self, keys):
+        """get() for many keys with one disk query per chunk. Returns {key: vector} for the hits."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    found[key] = vector
+                else:
+                    missing.append(key)
+
+            now = time.time()
+            conn = self._db()
+            for start in range(0, len(missing), _LOOKUP_CHUNK):
+                chunk = missing[start:start + _LOOKUP_CHUNK]
+                rows = conn.execute(
+                    f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                fresh = [(key, blob) for key, blob, created_at in rows if created_at >= now - self.ttl]
+                conn.executemany("UPDATE embeddings SET accessed_at = ? WHERE key = ?", [(now, key) for key, _ in fresh])
+                for key, blob in fresh:
+                    found[key] = decode_vector(blob)
+                    self._remember(key, found[key])
+                self.hits_disk += len(fresh)
+                self.misses += len(chunk) - len(fresh)
+            if missing:
+                conn.commit()
+        return found
+
+    def put(self, key, vector):
+        self.put_many([(key, vector)])
+
+    def put_many(self, items):
+        """Stores (key, vector) pairs in one transaction."""
+        blobs = [(key, encode_vector(vector)) for key, vector in items]
+        if not blobs:
+            return
+        with self._lock:
+            now = time.time()
+            for key, blob in blobs:
+                self._remember(key, decode_vector(blob))
+            self._db().executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, blob, now, now) for key, blob in blobs]
+            )
+            self._db().commit()
+            before = self._writes
+            self._writes += len(blobs)
+            if self._writes // _EVICT_EVERY != before // _EVICT_EVERY:
+                self._evict(now)
+
+    def _evict(self, now):
+        conn = self._db()
+        conn.execute("DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl,))
+        excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_rows
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?
+                )
+            """, (excess,))
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+            }
+
+
+# Cache for /match profile texts
+query_cache = EmbeddingCache(
+    os.path.join(CACHE_DIR, "query_embeddings.db"),
+    memory_size=QUERY_CACHE_SIZE,
+    ttl=QUERY_CACHE_TTL,
+    max_rows=QUERY_CACHE_MAX_ROWS,
+)
+
+# Cache for paper texts, checked by ingestion before every embeddings call
+document_cache = EmbeddingCache(
+    os.path.join(CACHE_DIR, "document_embeddings.db"),
+    memory_size=DOCUMENT_CACHE_SIZE,
+    ttl=DOCUMENT_CACHE_TTL,
+    max_rows=DOCUMENT_CACHE_MAX_ROWS,
+)
@@ -0,0 +1,252 @@
+"""
+Embedding providers behind NLPEngine, selected with EMBEDDING_PROVIDER:
+
+    openai   text-embedding-3-small over the API (default; needs OPENAI_API_KEY)
+    local    hashed character n-grams projected to 768 dims on the CPU; no
+             network, no per-call latency (air-gapped ingestion, benchmarks)
+
+The local projection is stored in data/models/hashed_ngrams.npy: a seeded
+random projection, created on first use, or an SVD of the papers already in
+the database (LSA-style, better neighbours):
+
+    python -m backend.core.embedding_providers --fit-svd --papers 50000
+
+The projection's checksum is part of the local model name, so caches and
+stored embeddings never mix vectors from different projections.
+"""
+import os
+import zlib
+import asyncio
+import threading
+import unicodedata
+import numpy as np
+from backend.db.database import DATA_DIR
+from backend.core.embedding_throttle import EMBED_TPM, EMBED_RPM
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBEDDING_DIMENSIONS = 768  # Crucial: Matches init.sql's pgvector(768) schema!
+
+LOCAL_PROJECTION_PATH = os.getenv("LOCAL_EMBEDDING_PROJECTION", os.path.join(DATA_DIR, "models", "hashed_ngrams.npy"))
+LOCAL_FEATURES = int(os.getenv("LOCAL_EMBEDDING_FEATURES", "8192"))  # hashed feature buckets, a power of two
+LOCAL_NGRAMS = (3, 4, 5)
+
+# Texts featurized at once by the local provider (bounds the dense feature matrix)
+_LOCAL_CHUNK = 256
+# FNV-1a prime, then a 64-bit golden-ratio multiply so the top bits are well mixed
+_FNV_PRIME = np.uint64(0x100000001B3)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+class EmbeddingProvider:
+    """
+    Interface: `model_name`, `dimensions` and embed(texts) -> one vector
+    (list of floats) per text. Per-minute limits of None mean unthrottled.
+    """
+    model_name = None
+    dimensions = EMBEDDING_DIMENSIONS
+    tokens_per_minute = None
+    requests_per_minute = None
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+    async def aembed(self, texts):
+        # Providers without an async client embed on a worker thread, so the
+        # event loop is never blocked by CPU-bound or synchronous I/O work
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIProvider(EmbeddingProvider):
+    """OpenAI embeddings. Clients are built on first use, so importing never needs a key or the network."""
+    model_name = "text-embedding-3-small"
+    tokens_per_minute = EMBED_TPM
+    requests_per_minute = EMBED_RPM
+
+    def __init__(self):
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        if not os.getenv("OPENAI_API_KEY"):
+            print("WARNING: OPENAI_API_KEY is not set in environment (EMBEDDING_PROVIDER=local works offline).")
+
+    def _api_key(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set; set it or use EMBEDDING_PROVIDER=local")
+        return api_key
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                # 429s surface to the ThrottledEncoder, which shrinks batches instead of blindly retrying
+                self._client = OpenAI(api_key=self._api_key(), max_retries=0)
+            return self._client
+
+    @property
+    def async_client(self):
+        # Used by the async request path, so /match never blocks a thread on the API.
+        # Like the sync client it does not retry: the ThrottledEncoder handles 429s
+        with self._lock:
+            if self._async_client is None:
+                from openai import AsyncOpenAI
+                self._async_client = AsyncOpenAI(api_key=self._api_key(), max_retries=0)
+            return self._async_client
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(input=texts, model=self.model_name, dimensions=self.dimensions)
+        return [item.embedding for item in response.data]
+
+    async def aembed(self, texts):
+        response = await self.async_client.embeddings.create(input=texts, model=self.model_name,
+                                                             dimensions=self.dimensions)
+        return [item.embedding for item in response.data]
+
+
+def hashed_ngram_features(texts, n_features=LOCAL_FEATURES):
+    """
+    Signed, log-scaled counts of hashed character 3/4/5-grams (lower-cased,
+    whitespace-collapsed, space-padded so word boundaries count) as a dense
+    (len(texts), n_features) float32 matrix. All texts are hashed in one pass
+    over their concatenated bytes; n-grams spanning two texts are dropped.
+    """
+    bits = n_features.bit_length() - 1
+    if n_features != 1 << bits:
+        raise ValueError(f"n_features must be a power of two, got {n_features}")
+    docs = [f" {' '.join(unicodedata.normalize('NFKC', str(t)).lower().split())} ".encode("utf-8") for t in texts]
+    lengths = np.fromiter((len(d) for d in docs), dtype=np.int64, count=len(docs))
+    data = np.frombuffer(b"".join(docs), dtype=np.uint8).astype(np.uint64)
+    doc_of = np.repeat(np.arange(len(docs), dtype=np.int64), lengths)
+
+    slots = []
+    for n in LOCAL_NGRAMS:
+        m = len(data) - n + 1
+        if m <= 0:
+            continue
+        h = np.full(m, np.uint64(n))
+        for k in range(n):
+            h = (h ^ data[k:m + k]) * _FNV_PRIME
+        h *= _MIX
+        inside = doc_of[:m] == doc_of[n - 1:]
+        # Top bits + 1 pick the bucket, the next one the sign
+        slots.append(doc_of[:m][inside] * (2 * n_features) + (h[inside] >> np.uint64(63 - bits)).astype(np.int64))
+    if not slots:
+        return np.zeros((len(docs), n_features), dtype=np.float32)
+    counts = np.bincount(np.concatenate(slots), minlength=len(docs) * 2 * n_features)
+    counts = counts.reshape(len(docs), n_features, 2)
+    x = (counts[..., 0] - counts[..., 1]).astype(np.float32)
+    return np.sign(x) * np.log1p(np.abs(x))
+
+
+def random_projection(n_features=LOCAL_FEATURES, dimensions=EMBEDDING_DIMENSIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((n_features, dimensions)) / np.sqrt(dimensions)).astype(np.float32)
+
+
+def fit_svd_projection(texts, n_features=LOCAL_FEATURES, dimensions=EMBEDDING_DIMENSIONS, seed=0, power_iterations=1):
+    """
+    Top right singular vectors of the (row-normalised) hashed feature matrix
+    of `texts`, by randomized SVD. Features are recomputed per chunk on each
+    pass instead of held in memory.
+    """
+    k = min(n_features, dimensions + 64)
+
+    def chunks():
+        for start in range(0, len(texts), _LOCAL_CHUNK):
+            x = hashed_ngram_features(texts[start:start + _LOCAL_CHUNK], n_features)
+            norms = np.linalg.norm(x, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            yield x / norms
+
+    q = np.random.default_rng(seed).standard_normal((n_features, k)).astype(np.float32)
+    for _ in range(1 + power_iterations):
+        # Range of X^T X, orthonormalised
+        y = np.zeros((n_features, k), dtype=np.float32)
+        for x in chunks():
+            y += x.T @ (x @ q)
+        q, _ = np.linalg.qr(y)
+    gram = np.zeros((k, k), dtype=np.float64)
+    for x in chunks():
+        b = x @ q
+        gram += b.T @ b
+    _, vectors = np.linalg.eigh(gram)
+    return np.ascontiguousarray(q @ vectors[:, ::-1][:, :dimensions], dtype=np.float32)
+
+
+def save_projection(projection, path=LOCAL_PROJECTION_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.save(fh, projection)
+    os.replace(tmp_path, path)
+
+
+class HashedNgramProvider(EmbeddingProvider):
+    """
+    Local CPU embeddings: hashed_ngram_features() times the stored projection,
+    L2-normalised. Deterministic; a few thousand paper texts per second per core.
+    """
+
+    def __init__(self, path=LOCAL_PROJECTION_PATH):
+        if not os.path.exists(path):
+            save_projection(random_projection(), path)
+            print(f"🎲 Stored a random n-gram projection at {path}")
+        self.projection = np.load(path, mmap_mode="r")
+        self.n_features, self.dimensions = self.projection.shape
+        self.model_name = f"hashed-ngrams-{zlib.crc32(self.projection.tobytes()):08x}"
+
+    def embed_array(self, texts):
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), _LOCAL_CHUNK):
+            out[start:start + _LOCAL_CHUNK] = (
+                hashed_ngram_features(texts[start:start + _LOCAL_CHUNK], self.n_features) @ self.projection
+            )
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    def embed(self, texts):
+        return self.embed_array(texts).tolist()
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "local": HashedNgramProvider,
+}
+
+
+def get_provider(name=EMBEDDING_PROVIDER):
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {name!r} (expected one of {', '.join(PROVIDERS)})")
+    return PROVIDERS[name]()
+
+
+if __name__ == "__main__":
+    import argparse
+    from sqlalchemy import text
+    from backend.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Fit or reset the local n-gram embedding projection")
+    parser.add_argument("--fit-svd", action="store_true", help="fit an SVD projection on paper texts (default: random)")
+    parser.add_argument("--papers", type=int, default=50000, help="papers to fit on")
+    parser.add_argument("--features", type=int, default=LOCAL_FEATURES)
+    args = parser.parse_args()
+
+    if args.fit_svd:
+        db = SessionLocal()
+        try:
+            rows = db.execute(text("SELECT title, abstract FROM papers ORDER BY id LIMIT :n"), {"n": args.papers}).fetchall()
+        finally:
+            db.close()
+        texts = [f"{r.title}. {r.abstract or ''}" for r in rows if r.title or r.abstract]
+        if len(texts) < EMBEDDING_DIMENSIONS:
+            raise SystemExit(f"Need at least {EMBEDDING_DIMENSIONS} papers to fit, found {len(texts)}")
+        print(f"🧮 Fitting an SVD projection on {len(texts)} papers...")
+        projection = fit_svd_projection(texts, args.features)
+    else:
+        projection = random_projection(args.features)
+    save_projection(projection)
+    provider = HashedNgramProvider()
+    print(f"✅ Stored {provider.model_name} at {LOCAL_PROJECTION_PATH}; "
+          f"re-embed papers stored with a previous local projection")
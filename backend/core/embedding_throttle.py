@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+import random
+import threading
+from collections import deque
+
+# Account limits of the embeddings API (OpenAI tier 1 for text-embedding-3-small).
+# Buckets are per process: with several Celery workers, divide the limits among them.
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+# Per-request caps: texts, and estimated tokens (the API rejects more than 2048 / 300k)
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "512"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "250000"))
+# Consecutive rate-limited attempts before giving up on an encode() call
+EMBED_MAX_RATE_LIMITED = int(os.getenv("EMBED_MAX_RATE_LIMITED", "8"))
+
+# Longest wait after a 429 without a Retry-After header
+_MAX_BACKOFF = 30.0
+# Longest Retry-After honoured, so a huge or bogus header cannot stall a worker
+_MAX_RETRY_AFTER = _MAX_BACKOFF * 4
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose, without a tokenizer dependency
+    return len(str(text)) // 4 + 1
+
+
+def rate_limit_delay(exc):
+    """
+    Seconds the server asked us to wait (capped at _MAX_RETRY_AFTER; 0 if
+    unspecified) if `exc` is a rate-limit (HTTP 429) error, else None.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    try:
+        delay = float((getattr(response, "headers", None) or {}).get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+    # NaN and negative values fall back to our own backoff
+    return min(delay, _MAX_RETRY_AFTER) if delay >= 0 else 0.0
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most a minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        # Callers hold the lock
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def take(self, amount):
+        """Waits until `amount` (at most the capacity) is available and takes it. Returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                wait = (amount - self._level) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def debit(self, amount):
+        """Takes `amount` without waiting; the level may go negative, delaying later take()s."""
+        with self._lock:
+            self._refill()
+            self._level -= amount
+
+    def empty(self):
+        """After a 429 the server's window is spent, whatever our estimate says."""
+        with self._lock:
+            self._refill()
+            self._level = min(self._level, 0.0)
+
+
+class ThrottledEncoder:
+    """
+    Splits encode() input into requests of at most `batch_size` texts and
+    max_batch_tokens estimated tokens, paced by per-minute token / request
+    buckets (None = unlimited). A 429 halves the batch size, empties the
+    buckets and retries after the server's Retry-After (or a backoff); each
+    success grows the batch size back by a quarter. aencode() is the async
+    query path's single request, with the same 429 handling.
+    """
+
+    def __init__(self, embed, tokens_per_minute=None, requests_per_minute=None, max_batch=EMBED_MAX_BATCH,
+                 max_batch_tokens=EMBED_MAX_BATCH_TOKENS, max_rate_limited=EMBED_MAX_RATE_LIMITED):
+        self.embed = embed
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.max_batch = max(1, max_batch)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_rate_limited = max_rate_limited
+        self.batch_size = self.max_batch
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+
+    def _take_batch(self, pending, costs):
+        # At least one text, even one over the token cap (the API will say)
+        batch = [pending.popleft()]
+        tokens = costs[batch[0]]
+        while pending and len(batch) < self.batch_size and tokens + costs[pending[0]] <= self.max_batch_tokens:
+            tokens += costs[pending[0]]
+            batch.append(pending.popleft())
+        return batch, tokens
+
+    def _acquire(self, tokens):
+        waited = 0.0
+        if self.tokens:
+            waited += self.tokens.take(tokens)
+        if self.requests:
+            waited += self.requests.take(1)
+        return waited
+
+    def debit(self, tokens):
+        """Accounts for a call made outside encode() (the async query path), without waiting."""
+        if self.tokens:
+            self.tokens.debit(tokens)
+        if self.requests:
+            self.requests.debit(1)
+
+    def _backoff(self, exc, limited, n_texts):
+        """
+        After the (limited + 1)-th consecutive failure: None unless `exc` is a
+        429 still worth retrying, else the seconds to wait before the retry.
+        Halves the batch size and empties the buckets.
+        """
+        delay = rate_limit_delay(exc)
+        if delay is None or limited >= self.max_rate_limited:
+            return None
+        with self._lock:
+            self.rate_limited += 1
+            self.batch_size = max(1, self.batch_size // 2)
+        for bucket in (self.tokens, self.requests):
+            if bucket:
+                bucket.empty()
+        backoff = delay or min(_MAX_BACKOFF, 0.5 * 2 ** (limited + 1)) + random.uniform(0, 0.5)
+        print(f"⏳ Embeddings rate-limited, retrying {n_texts} texts in {backoff:.1f}s "
+              f"(batch size now {self.batch_size})")
+        return backoff
+
+    def encode(self, texts):
+        """Vectors aligned to `texts`; None for empty ones."""
+        out = [None] * len(texts)
+        pending = deque(i for i, t in enumerate(texts) if t and str(t).strip())
+        costs = {i: estimate_tokens(texts[i]) for i in pending}
+        limited = 0
+        while pending:
+            batch, tokens = self._take_batch(pending, costs)
+            waited = self._acquire(tokens)
+            try:
+                vectors = self.embed([texts[i] for i in batch])
+            except Exception as e:
+                backoff = self._backoff(e, limited, len(batch))
+                if backoff is None:
+                    raise
+                limited += 1
+                pending.extendleft(reversed(batch))
+                time.sleep(backoff)
+                waited += backoff
+                continue
+            finally:
+                with self._lock:
+                    self.calls += 1
+                    self.waited_seconds += waited
+            if len(vectors) != len(batch):
+                raise ValueError(f"Embeddings API returned {len(vectors)} vectors for {len(batch)} texts")
+            for i, vector in zip(batch, vectors):
+                out[i] = vector
+            limited = 0
+            with self._lock:
+                self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 4))
+        return out
+
+    async def aencode(self, aembed, texts):
+        """
+        One awaited request for the async query path: debited from the
+        buckets instead of waiting on them (queries never queue behind
+        ingestion), and retried after a 429 like encode() does, sleeping on
+        the event loop. `texts` must be non-empty.
+        """
+        tokens = sum(estimate_tokens(t) for t in texts)
+        limited = 0
+        while True:
+            self.debit(tokens)
+            waited = 0.0
+            try:
+                return await aembed(texts)
+            except Exception as e:
+                backoff = self._backoff(e, limited, len(texts))
+                if backoff is None:
+                    raise
+                limited += 1
+                await asyncio.sleep(backoff)
+                waited = backoff
+            finally:
+                with self._lock:
+                    self.calls += 1
+                    self.waited_seconds += waited
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batch_size": self.batch_size,
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
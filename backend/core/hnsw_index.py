@@ -0,0 +1,294 @@
+import os
+import math
+import heapq
+import threading
+import numpy as np
+from backend.db.database import DATA_DIR
+from backend.core.segments import file_lock
+
+HNSW_PATH = os.path.join(DATA_DIR, "hnsw", "hnsw.npz")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# Corpus size (papers) above which strategy="auto" switches from exact to HNSW
+HNSW_THRESHOLD = int(os.getenv("HNSW_THRESHOLD", "50000"))
+# Seconds between saves while a graph is being built, so a restart resumes it
+HNSW_CHECKPOINT_SECONDS = int(os.getenv("HNSW_CHECKPOINT_SECONDS", "60"))
+
+
+def build_lock(blocking=True, path=HNSW_PATH):
+    """Cross-process lock held while growing the persisted graph: one process builds, the others load its saves."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return file_lock(os.path.join(os.path.dirname(path), ".lock"), blocking)
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph over unit vectors (cosine
+    similarity), with array-backed adjacency lists:
+
+      * layer 0:  links0[node, :deg0[node]]           (up to 2*M neighbours)
+      * layer l:  links_up[up_offset[node] + l - 1]    (up to M neighbours)
+
+    Upper-layer rows are only allocated for the ~1/M of nodes that reach them.
+    Inserts are serialised by a lock; searches are lock-free and tolerate
+    concurrent inserts (degrees are published after the links are written).
+    """
+
+    def __init__(self, dim, M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, capacity=1024, seed=0):
+        self.dim = dim
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.mL = 1.0 / math.log(M)
+        self.rng = np.random.default_rng(seed)
+
+        self.count = 0
+        self.up_count = 0
+        self.entry = -1
+        self.max_level = -1
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.levels = np.zeros(capacity, dtype=np.int8)
+        self.links0 = np.full((capacity, self.M0), -1, dtype=np.int32)
+        self.deg0 = np.zeros(capacity, dtype=np.int16)
+        self.up_offset = np.full(capacity, -1, dtype=np.int64)
+        self.links_up = np.full((max(16, capacity // M), M), -1, dtype=np.int32)
+        self.deg_up = np.zeros(len(self.links_up), dtype=np.int16)
+
+        self._lock = threading.Lock()
+
+    # --- storage ---
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+
+        def grown(arr, fill):
+            out = np.full((new_capacity,) + arr.shape[1:], fill, dtype=arr.dtype)
+            out[:capacity] = arr
+            return out
+
+        self.vectors = grown(self.vectors, 0)
+        self.ids = grown(self.ids, 0)
+        self.levels = grown(self.levels, 0)
+        self.links0 = grown(self.links0, -1)
+        self.deg0 = grown(self.deg0, 0)
+        self.up_offset = grown(self.up_offset, -1)
+
+    def _grow_up(self, needed):
+        capacity = len(self.links_up)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        links = np.full((new_capacity, self.M), -1, dtype=np.int32)
+        links[:capacity] = self.links_up
+        deg = np.zeros(new_capacity, dtype=np.int16)
+        deg[:capacity] = self.deg_up
+        self.links_up = links
+        self.deg_up = deg
+
+    def _neighbors(self, node, level):
+        if level == 0:
+            return self.links0[node, :self.deg0[node]]
+        row = self.up_offset[node] + level - 1
+        return self.links_up[row, :self.deg_up[row]]
+
+    def _set_neighbors(self, node, level, neighbors):
+        n = len(neighbors)
+        if level == 0:
+            self.links0[node, :n] = neighbors
+            self.deg0[node] = n
+        else:
+            row = self.up_offset[node] + level - 1
+            self.links_up[row, :n] = neighbors
+            self.deg_up[row] = n
+
+    # --- graph search ---
+
+    def _search_layer(self, q, entries, ef, level, stats=None):
+        """Best-first search; returns up to `ef` (similarity, node) pairs."""
+        visited = set(entries)
+        sims = (self.vectors[entries] @ q).tolist()
+        candidates = [(-s, e) for s, e in zip(sims, entries)]
+        heapq.heapify(candidates)
+        results = [(s, e) for s, e in zip(sims, entries)]
+        heapq.heapify(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if len(results) >= ef and -neg_sim < results[0][0]:
+                break
+            neighbors = [n for n in self._neighbors(node, level).tolist() if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            for n, s in zip(neighbors, (self.vectors[neighbors] @ q).tolist()):
+                if len(results) < ef or s > results[0][0]:
+                    heapq.heappush(candidates, (-s, n))
+                    heapq.heappush(results, (s, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        if stats is not None:
+            stats["visited"] = stats.get("visited", 0) + len(visited)
+        return results
+
+    def _select(self, candidates, M):
+        """
+        HNSW neighbour-selection heuristic: keep a candidate only if it is closer
+        to the base vector than to any neighbour already kept, which preserves
+        links towards other clusters. Pruned candidates fill any spare slots.
+        """
+        ordered = sorted(candidates, reverse=True)
+        if len(ordered) <= M:
+            return [node for _, node in ordered]
+        nodes = [node for _, node in ordered]
+        pairwise = (self.vectors[nodes] @ self.vectors[nodes].T).tolist()
+        selected, pruned = [], []
+        for i, (sim, node) in enumerate(ordered):
+            if len(selected) >= M:
+                break
+            row = pairwise[i]
+            if selected and max(row[j] for j in selected) > sim:
+                pruned.append(i)
+                continue
+            selected.append(i)
+        for i in pruned:
+            if len(selected) >= M:
+                break
+            selected.append(i)
+        return [nodes[i] for i in selected]
+
+    # --- public API ---
+
+    def insert(self, vector, item_id):
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return
+        q = q / norm
+
+        with self._lock:
+            node = self.count
+            self._grow(node + 1)
+            level = int(-math.log(1.0 - self.rng.random()) * self.mL)
+            self.vectors[node] = q
+            self.ids[node] = item_id
+            self.levels[node] = level
+            if level > 0:
+                self._grow_up(self.up_count + level)
+                self.up_offset[node] = self.up_count
+                self.up_count += level
+
+            if self.entry < 0:
+                self.count = node + 1
+                self.entry = node
+                self.max_level = level
+                return
+
+            entries = [self.entry]
+            for l in range(self.max_level, level, -1):
+                entries = [max(self._search_layer(q, entries, 1, l))[1]]
+
+            for l in range(min(level, self.max_level), -1, -1):
+                found = self._search_layer(q, entries, self.ef_construction, l)
+                neighbors = self._select(found, self.M)
+                self._set_neighbors(node, l, neighbors)
+                max_degree = self.M0 if l == 0 else self.M
+                for n in neighbors:
+                    current = self._neighbors(n, l).tolist()
+                    if len(current) < max_degree:
+                        self._set_neighbors(n, l, current + [node])
+                    else:
+                        pool = current + [node]
+                        sims = (self.vectors[pool] @ self.vectors[n]).tolist()
+                        self._set_neighbors(n, l, self._select(list(zip(sims, pool)), max_degree))
+                entries = [n for _, n in found]
+
+            # Publish the node only once its links exist
+            self.count = node + 1
+            if level > self.max_level:
+                self.entry = node
+                self.max_level = level
+
+    def search(self, q, k, ef_search=HNSW_EF_SEARCH, stats=None):
+        """
+        Approximate top-k (ids, similarities) for a unit query vector. If a
+        `stats` dict is given, stats["visited"] counts the vectors scored.
+        """
+        if self.count == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        entries = [self.entry]
+        for l in range(self.max_level, 0, -1):
+            entries = [max(self._search_layer(q, entries, 1, l, stats))[1]]
+        found = sorted(self._search_layer(q, entries, max(ef_search, k), 0, stats), reverse=True)[:k]
+        nodes = np.fromiter((n for _, n in found), dtype=np.int64, count=len(found))
+        sims = np.fromiter((s for s, _ in found), dtype=np.float32, count=len(found))
+        return self.ids[nodes], sims
+
+    def indexed_ids(self):
+        return self.ids[:self.count]
+
+    def save(self, path=HNSW_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            n, u = self.count, self.up_count
+            arrays = dict(
+                vectors=self.vectors[:n], ids=self.ids[:n], levels=self.levels[:n],
+                links0=self.links0[:n], deg0=self.deg0[:n], up_offset=self.up_offset[:n],
+                links_up=self.links_up[:u], deg_up=self.deg_up[:u],
+                params=np.array([self.M, self.ef_construction, self.entry, self.max_level], dtype=np.int64),
+            )
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def saved_count(path=HNSW_PATH):
+        """Nodes in the saved graph (reads only its ids), or None if there is none."""
+        try:
+            with np.load(path) as data:
+                return len(data["ids"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load(cls, path=HNSW_PATH):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            M, ef_construction, entry, max_level = (int(x) for x in data["params"])
+            n = len(data["ids"])
+            index = cls(data["vectors"].shape[1], M=M, ef_construction=ef_construction, capacity=max(n, 1024))
+            index._grow_up(len(data["deg_up"]))
+            index.vectors[:n] = data["vectors"]
+            index.ids[:n] = data["ids"]
+            index.levels[:n] = data["levels"]
+            index.links0[:n] = data["links0"]
+            index.deg0[:n] = data["deg0"]
+            index.up_offset[:n] = data["up_offset"]
+            index.links_up[:len(data["links_up"])] = data["links_up"]
+            index.deg_up[:len(data["deg_up"])] = data["deg_up"]
+            index.count = n
+            index.up_count = len(data["deg_up"])
+            index.entry = entry
+            index.max_level = max_level
+        return index
+
+
+if __name__ == "__main__":
+    from backend.db.database import SessionLocal
+    from backend.core.vector_index import vector_index
+
+    # Builds (or catches up) the persisted graph synchronously, checkpointing
+    # every HNSW_CHECKPOINT_SECONDS; API workers serve it once it is complete
+    db = SessionLocal()
+    try:
+        state = vector_index.ensure_fresh(db)
+        vector_index.sync_hnsw(state)
+    finally:
+        db.close()
@@ -0,0 +1,177 @@
+import os
+import math
+import numpy as np
+from backend.db.database import DATA_DIR
+from backend.core.segments import file_lock
+
+IVF_PATH = os.path.join(DATA_DIR, "ivf", "ivf.npz")
+IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))     # 0 = derive from corpus size
+IVF_PROBES = int(os.getenv("IVF_PROBES", "8"))
+
+# Rows per chunk when assigning vectors to centroids (bounds temp memory)
+_ASSIGN_CHUNK = 65536
+
+
+def build_lock(blocking=True, path=IVF_PATH):
+    """Cross-process lock held while training: one process trains, the others load its save."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return file_lock(os.path.join(os.path.dirname(path), ".lock"), blocking)
+
+
+def default_n_lists(n_rows):
+    # ~4 * sqrt(N) lists keeps list scans and centroid scans balanced
+    if IVF_LISTS:
+        return max(1, min(IVF_LISTS, n_rows))
+    return max(1, min(n_rows, int(4 * math.sqrt(max(n_rows, 1)))))
+
+
+def _normalise(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def assign_to_centroids(vectors, centroids):
+    """Index of the most similar (cosine) centroid for every row."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = np.asarray(vectors[start:start + _ASSIGN_CHUNK], dtype=np.float32)
+        out[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(sample, n_lists, iterations=15, seed=0):
+    """
+    Lloyd's k-means on the unit sphere: dot-product assignment, normalised
+    means. Empty lists are reseeded with random sample points.
+    """
+    rng = np.random.default_rng(seed)
+    sample = _normalise(np.asarray(sample, dtype=np.float32))
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_to_centroids(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+        centroids = _normalise(sums)
+    return centroids
+
+
+def inverted_lists(assign, n_lists):
+    """CSR layout: rows of list l are rows[offsets[l]:offsets[l + 1]]."""
+    rows = np.argsort(assign, kind="stable").astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+    return offsets, rows
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index: spherical k-means centroids plus the list each
+    paper id is assigned to. Assignments are keyed by paper id (not matrix row)
+    so the persisted index survives segment appends and restarts.
+    """
+
+    def __init__(self, centroids, ids, assign, trained_on):
+        self.centroids = centroids      # (n_lists, dim) float32, unit rows
+        self.ids = ids                  # (n,) int64, sorted paper ids
+        self.assign = assign            # (n,) int32, list of each id
+        self.trained_on = trained_on    # corpus size at training time
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, gather, ids, n_lists=None, iterations=15, seed=0):
+        """
+        Trains on a random sample of at most 256 rows per list, then assigns
+        every row. `gather(rows)` returns the vectors of the given rows.
+        """
+        n = len(ids)
+        n_lists = n_lists or default_n_lists(n)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=min(n, 256 * n_lists), replace=False))
+        centroids = spherical_kmeans(gather(sample_rows), n_lists, iterations=iterations, seed=seed)
+        assign = np.concatenate([
+            assign_to_centroids(gather(np.arange(start, min(start + _ASSIGN_CHUNK, n))), centroids)
+            for start in range(0, n, _ASSIGN_CHUNK)
+        ]) if n else np.empty(0, dtype=np.int32)
+        order = np.argsort(ids, kind="stable")
+        return cls(centroids, np.asarray(ids, dtype=np.int64)[order], assign[order], n)
+
+    def add(self, vectors, ids):
+        """Assigns new ids to their nearest existing centroid (no retraining)."""
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        all_ids = np.concatenate([self.ids, ids])
+        all_assign = np.concatenate([self.assign, assign_to_centroids(vectors, self.centroids)])
+        order = np.argsort(all_ids, kind="stable")
+        self.ids = all_ids[order]
+        self.assign = all_assign[order]
+
+    def lookup(self, ids):
+        """List number for each id, or -1 if the id has not been assigned."""
+        if not len(self.ids):
+            return np.full(len(ids), -1, dtype=np.int32)
+        pos = np.searchsorted(self.ids, ids)
+        pos[pos == len(self.ids)] = 0
+        found = self.ids[pos] == ids
+        return np.where(found, self.assign[pos], -1).astype(np.int32)
+
+    def probe(self, q, n_probes):
+        n_probes = max(1, min(int(n_probes), self.n_lists))
+        sims = self.centroids @ q
+        if n_probes >= self.n_lists:
+            return np.arange(self.n_lists)
+        return np.argpartition(-sims, n_probes - 1)[:n_probes]
+
+    def save(self, path=IVF_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, centroids=self.centroids, ids=self.ids, assign=self.assign,
+                     trained_on=np.int64(self.trained_on))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=IVF_PATH):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["centroids"], data["ids"], data["assign"], int(data["trained_on"]))
+
+
+def search_lists(q, lists, offsets, rows, gather):
+    """
+    Candidate rows and their scores for the probed lists. `gather(rows)`
+    returns the unit vectors of those rows.
+    """
+    candidates = np.concatenate([rows[offsets[l]:offsets[l + 1]] for l in lists]) if len(lists) else rows[:0]
+    if not len(candidates):
+        return candidates, np.empty(0, dtype=np.float32)
+    return candidates, gather(candidates) @ q
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.db.database import SessionLocal
+    from backend.core.vector_index import vector_index
+
+    parser = argparse.ArgumentParser(description="(Re)train the standalone IVF index")
+    parser.add_argument("--lists", type=int, default=0, help="number of inverted lists (default ~4*sqrt(N))")
+    parser.add_argument("--iterations", type=int, default=15)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        state = vector_index.ensure_fresh(db)
+        vector_index.train_ivf(state, n_lists=args.lists or None, iterations=args.iterations)
+    finally:
+        db.close()
@@ -0,0 +1,169 @@
+import os
+import re
+import math
+import time
+from collections import Counter
+import numpy as np
+from sqlalchemy import text, bindparam
+from backend.db.database import SessionLocal, IS_STANDALONE, db_lock
+
+# BM25 parameters (standard defaults)
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Reciprocal rank fusion constant: score = sum(1 / (RRF_K + rank))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Lowercased alphanumeric runs: "CRISPR-Cas9" -> crispr, cas9; "BRCA1" -> brca1
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Frequent function words would only add long, near-zero-idf posting lists
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in into is it its of on or our that the their
+    this to using via was we were which with within without based new study
+""".split())
+
+
+def tokenize(value):
+    return [t for t in _TOKEN.findall(str(value or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def index_paper(db, paper_id, title, abstract):
+    """
+    Adds one paper to the inverted index in the caller's transaction (so it
+    commits with the paper insert). Terms are touched in sorted order, which
+    keeps concurrent Postgres writers from deadlocking on df updates.
+    Returns False if the paper was already indexed: the lexical_docs row is
+    claimed first, so of two workers indexing the same paper only one counts it.
+    """
+    counts = Counter(tokenize(f"{title or ''} {abstract or ''}"))
+    length = sum(counts.values())
+    claimed = db.execute(text("""
+        INSERT INTO lexical_docs (paper_id, length) VALUES (:id, :length) ON CONFLICT (paper_id) DO NOTHING
+    """), {"id": paper_id, "length": length}).rowcount
+    if not claimed:
+        return False
+
+    if counts:
+        terms = sorted(counts)
+        db.execute(text("INSERT INTO lexical_terms (term, df) VALUES (:term, 0) ON CONFLICT (term) DO NOTHING"),
+                   [{"term": t} for t in terms])
+        term_ids = dict(db.execute(
+            text("SELECT term, id FROM lexical_terms WHERE term IN :terms").bindparams(bindparam("terms", expanding=True)),
+            {"terms": terms}
+        ).fetchall())
+        db.execute(text("UPDATE lexical_terms SET df = df + 1 WHERE id = :id"), [{"id": term_ids[t]} for t in terms])
+        db.execute(text("INSERT INTO lexical_postings (term_id, paper_id, tf) VALUES (:term_id, :paper_id, :tf)"),
+                   [{"term_id": term_ids[t], "paper_id": paper_id, "tf": counts[t]} for t in terms])
+
+    db.execute(text("""
+        INSERT INTO lexical_stats (id, n_docs, total_length) VALUES (1, 1, :length)
+        ON CONFLICT (id) DO UPDATE SET n_docs = lexical_stats.n_docs + 1,
+                                       total_length = lexical_stats.total_length + excluded.total_length
+    """), {"length": length})
+    return True
+
+
+def search_papers(db, query_text, limit):
+    """
+    Top `limit` (paper_id, bm25) pairs, best first. Work is proportional to
+    the posting lists of the query's terms, not to the corpus.
+    """
+    terms = sorted(set(tokenize(query_text)))
+    if not terms or limit <= 0:
+        return []
+    stats = db.execute(text("SELECT n_docs, total_length FROM lexical_stats WHERE id = 1")).first()
+    if not stats or not stats.n_docs:
+        return []
+    n_docs = stats.n_docs
+    avgdl = max(stats.total_length / n_docs, 1.0)
+
+    term_rows = db.execute(
+        text("SELECT id, df FROM lexical_terms WHERE term IN :terms").bindparams(bindparam("terms", expanding=True)),
+        {"terms": terms}
+    ).fetchall()
+    paper_parts, score_parts = [], []
+    for term_id, df in term_rows:
+        postings = db.execute(text("""
+            SELECT p.paper_id, p.tf, d.length
+            FROM lexical_postings p JOIN lexical_docs d ON d.paper_id = p.paper_id
+            WHERE p.term_id = :term_id
+        """), {"term_id": term_id}).fetchall()
+        if not postings:
+            continue
+        papers = np.fromiter((r[0] for r in postings), dtype=np.int64, count=len(postings))
+        tf = np.fromiter((r[1] for r in postings), dtype=np.float64, count=len(postings))
+        length = np.fromiter((r[2] for r in postings), dtype=np.float64, count=len(postings))
+        idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        paper_parts.append(papers)
+        score_parts.append(idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)))
+    if not paper_parts:
+        return []
+
+    paper_ids, inverse = np.unique(np.concatenate(paper_parts), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+    k = min(limit, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(paper_ids[i]), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuses best-first key lists into {key: score}; keys absent from a list get nothing from it."""
+    fused = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def backfill(batch_size=1000):
+    """Indexes every paper not yet in the inverted index (e.g. after upgrading)."""
+    db = SessionLocal()
+    started = time.time()
+    indexed = 0
+    last_id = 0
+    try:
+        while True:
+            rows = db.execute(text("""
+                SELECT p.id, p.title, p.abstract FROM papers p
+                WHERE p.id > :last_id AND NOT EXISTS (SELECT 1 FROM lexical_docs d WHERE d.paper_id = p.id)
+                ORDER BY p.id
+                LIMIT :batch
+            """), {"last_id": last_id, "batch": batch_size}).fetchall()
+            if not rows:
+                break
+            if IS_STANDALONE:
+                with db_lock:
+                    indexed += sum(index_paper(db, r.id, r.title, r.abstract) for r in rows)
+                    db.commit()
+            else:
+                indexed += sum(index_paper(db, r.id, r.title, r.abstract) for r in rows)
+                db.commit()
+            last_id = rows[-1].id
+            print(f"   indexed {indexed} papers (last id {last_id})")
+    finally:
+        db.close()
+    print(f"✅ Indexed {indexed} papers in {time.time() - started:.1f}s")
+    return indexed
+
+
+def backfill_if_empty():
+    """
+    Runs backfill() when the inverted index is empty but papers exist: a
+    deployment upgraded from before it existed, where hybrid /match would
+    silently lose its lexical half. Called on API startup.
+    """
+    db = SessionLocal()
+    try:
+        needed = (db.execute(text("SELECT 1 FROM lexical_docs LIMIT 1")).first() is None and
+                  db.execute(text("SELECT 1 FROM papers LIMIT 1")).first() is not None)
+    finally:
+        db.close()
+    if not needed:
+        return False
+    print("⚠️ The BM25 index is empty but papers exist: backfilling it before serving /match")
+    backfill()
+    return True
+
+
+if __name__ == "__main__":
+    backfill()
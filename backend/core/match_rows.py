@@ -0,0 +1,162 @@
+import time
+import numpy as np
+from sqlalchemy import text, bindparam
+from backend.db.database import SessionLocal, IS_STANDALONE, db_lock
+from backend.models.vector import decode_vector
+from backend.core.prefilter import filter_sql
+from backend.core.nlp_core import nlp_engine
+from backend.core.result_cache import bump_index_generation
+
+# Papers per transaction when backfilling
+BACKFILL_BATCH = 2000
+
+# updated_at of serving rows. Index freshness checks compare it, so SQLite
+# (whose CURRENT_TIMESTAMP has one-second resolution, hiding an update made
+# in the same second as the indexed write) stores milliseconds
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')" if IS_STANDALONE else "CURRENT_TIMESTAMP"
+
+# (paper, professor) pairs come from a DISTINCT subquery so a professor with
+# two author records still yields one row, and only the embedding of the
+# served model version is copied. `{scope}` narrows the pairs; the WHERE also
+# disambiguates SQLite's INSERT ... SELECT ... ON CONFLICT parse.
+_UPSERT = """
+    INSERT INTO match_rows (paper_id, professor_id, embedding, title, year, citations, paper_url,
+                            prof_name, university, email, updated_at)
+    SELECT l.paper_id, l.professor_id, e.embedding, p.title, p.year, p.citations, p.paper_url,
+           prof.name, prof.university, prof.email, {now}
+    FROM (
+        SELECT DISTINCT pa.paper_id, a.professor_id
+        FROM paper_authors pa JOIN authors a ON pa.author_id = a.id
+        WHERE a.professor_id IS NOT NULL AND {scope}
+    ) l
+    JOIN paper_embeddings e ON e.paper_id = l.paper_id AND e.model_version = :model_version
+    JOIN papers p ON p.id = l.paper_id
+    JOIN professors prof ON prof.id = l.professor_id
+    WHERE true
+    ON CONFLICT (paper_id, professor_id) DO UPDATE SET
+        embedding = excluded.embedding,
+        title = excluded.title,
+        year = excluded.year,
+        citations = excluded.citations,
+        paper_url = excluded.paper_url,
+        prof_name = excluded.prof_name,
+        university = excluded.university,
+        email = excluded.email,
+        updated_at = excluded.updated_at
+"""
+
+
+def upsert_match_rows(db, paper_id=None, prof_id=None, paper_ids=None):
+    """
+    Writes the serving rows of one paper or a batch of papers (after they are
+    embedded) or one professor (after papers are linked) in the caller's
+    transaction, so they commit atomically with the change that produced
+    them. Pairs whose paper has no embedding (of the engine's model version)
+    yet are skipped; embedding it adds them later.
+    """
+    version = {"model_version": nlp_engine.model_version}
+    if paper_ids is not None:
+        stmt = text(_UPSERT.format(scope="pa.paper_id IN :paper_ids", now=_NOW)).bindparams(bindparam("paper_ids", expanding=True))
+        return db.execute(stmt, {"paper_ids": list(paper_ids), **version}).rowcount
+    if paper_id is not None:
+        return db.execute(text(_UPSERT.format(scope="pa.paper_id = :paper_id", now=_NOW)), {"paper_id": paper_id, **version}).rowcount
+    return db.execute(text(_UPSERT.format(scope="a.professor_id = :prof_id", now=_NOW)), {"prof_id": prof_id, **version}).rowcount
+
+
+def refresh_professor_rows(db, prof):
+    """Copies changed professor fields (e.g. a discovered email) onto their rows."""
+    db.execute(text(f"""
+        UPDATE match_rows
+        SET prof_name = :name, university = :university, email = :email, updated_at = {_NOW}
+        WHERE professor_id = :prof_id
+    """), {"name": prof.name, "university": prof.university, "email": prof.email, "prof_id": prof.id})
+
+
+def fetch_matches(db, paper_ids, vector, filters=None):
+    """
+    Flat matches for every serving row of the given papers (that passes the
+    /match pre-filters), scored by cosine similarity to `vector` (used for
+    lexical hits the vector search missed). Without a vector, scores are None.
+    """
+    if not paper_ids:
+        return []
+    q = np.asarray(vector, dtype=np.float32) if vector is not None else None
+    q_norm = (np.linalg.norm(q) or 1.0) if q is not None else None
+    predicates, params, binds = filter_sql(filters)
+    rows = db.execute(text(f"""
+        SELECT m.paper_id, m.professor_id, m.embedding, m.title, m.year, m.paper_url, m.prof_name, m.university, m.email
+        FROM match_rows m WHERE m.paper_id IN :paper_ids{predicates}
+    """).bindparams(bindparam("paper_ids", expanding=True), *binds), {"paper_ids": list(paper_ids), **params}).fetchall()
+
+    matches = []
+    for r in rows:
+        score = None
+        if q is not None:
+            v = decode_vector(r.embedding)
+            score = float(v @ q / ((np.linalg.norm(v) or 1.0) * q_norm))
+        matches.append({
+            "paper_id": r.paper_id,
+            "prof_id": r.professor_id,
+            "prof_name": r.prof_name,
+            "university": r.university,
+            "email": r.email,
+            "title": r.title,
+            "year": r.year,
+            "score": score,
+            "url": r.paper_url
+        })
+    return matches
+
+
+def backfill(batch_size=BACKFILL_BATCH):
+    """
+    (Re)builds match_rows for every embedded paper, in paper id ranges. Also
+    switches existing rows to the engine's model version after re-embedding.
+    """
+    db = SessionLocal()
+    started = time.time()
+    written = 0
+    try:
+        max_id = db.execute(text("SELECT MAX(paper_id) FROM paper_embeddings")).scalar() or 0
+        for start in range(0, max_id, batch_size):
+            stmt = text(_UPSERT.format(scope="pa.paper_id > :start AND pa.paper_id <= :end", now=_NOW))
+            params = {"start": start, "end": start + batch_size, "model_version": nlp_engine.model_version}
+            if IS_STANDALONE:
+                with db_lock:
+                    written += db.execute(stmt, params).rowcount
+                    db.commit()
+            else:
+                written += db.execute(stmt, params).rowcount
+                db.commit()
+            print(f"   papers <= {min(start + batch_size, max_id)}: {written} rows")
+        if written:
+            bump_index_generation(db)
+    finally:
+        db.close()
+    print(f"✅ Wrote {written} match rows in {time.time() - started:.1f}s")
+    return written
+
+
+def backfill_if_empty():
+    """
+    Runs backfill() when match_rows is empty but papers have embeddings of
+    the served model: a deployment upgraded from before the table existed,
+    where /match would otherwise return nothing. Called on API startup.
+    """
+    db = SessionLocal()
+    try:
+        needed = (db.execute(text("SELECT 1 FROM match_rows LIMIT 1")).first() is None and
+                  db.execute(text("SELECT 1 FROM paper_embeddings WHERE model_version = :v LIMIT 1"),
+                             {"v": nlp_engine.model_version}).first() is not None)
+    finally:
+        db.close()
+    if not needed:
+        return False
+    print("⚠️ match_rows is empty but papers are embedded: backfilling it before serving /match")
+    backfill()
+    return True
+
+
+if __name__ == "__main__":
+    # One-off after upgrading; ingestion keeps the table current afterwards
+    backfill()
@@ -1,42 +1,105 @@
-from openai import OpenAI
-import os
+import asyncio
+from backend.core.embedding_cache import query_cache, cache_key
+from backend.core.embedding_providers import get_provider
+from backend.core.embedding_throttle import ThrottledEncoder
 
 class NLPEngine:
-    def __init__(self):
-        print("Initializing Cloud NLPEngine (OpenAI)...")
-        # Ensure OpenAI API key is available
-        api_key = os.getenv("OPENAI_API_KEY", "DUMMY_KEY")
-        if api_key == "DUMMY_KEY":
-            print("WARNING: OPENAI_API_KEY is not set in environment.")
-            
-        self.client = OpenAI(api_key=api_key)
-        self.model_name = "text-embedding-3-small"
-        self.dimensions = 768  # Crucial: Matches your init.sql pgvector(768) schema!
+    def __init__(self, provider=None):
+        # EMBEDDING_PROVIDER picks the backend (see embedding_providers)
+        self.provider = provider or get_provider()
+        print(f"Initializing NLPEngine ({self.provider.model_name})...")
+        self.model_name = self.provider.model_name
+        self.dimensions = self.provider.dimensions
+        # Stored with every paper embedding; only vectors of the engine's own
+        # version are served or compared with its queries
+        self.model_version = f"{self.model_name}/{self.dimensions}"
+        # Token-budgeted, rate-limited requests for the synchronous paths
+        self.throttle = ThrottledEncoder(self.provider.embed, self.provider.tokens_per_minute,
+                                         self.provider.requests_per_minute)
 
     def encode(self, text):
         if not text or not str(text).strip():
             return None
-        response = self.client.embeddings.create(
-            input=[text],
-            model=self.model_name,
-            dimensions=self.dimensions
-        )
-        return response.data[0].embedding
+        return self.throttle.encode([text])[0]
+
+    def encode_query(self, text):
+        """encode() behind the two-tier query cache (repeated /match profiles)."""
+        if not text or not str(text).strip():
+            return None
+        key = cache_key(text, self.model_name, self.dimensions)
+        vector = query_cache.get(key)
+        if vector is not None:
+            return vector.tolist()
+        vector = self.encode(text)
+        if vector is not None:
+            query_cache.put(key, vector)
+        return vector
+
+    async def aencode(self, text):
+        if not text or not str(text).strip():
+            return None
+        # Queries never wait on the buckets, but count against them and
+        # back off after a 429
+        return (await self.throttle.aencode(self.provider.aembed, [text]))[0]
+
+    def cached_query(self, text):
+        """The query vector if the query cache's memory tier holds it (no I/O, no API call), else None."""
+        if not text or not str(text).strip():
+            return None
+        vector = query_cache.get_memory(cache_key(text, self.model_name, self.dimensions))
+        return vector.tolist() if vector is not None else None
+
+    async def aencode_query(self, text):
+        """encode_query() on the async client."""
+        if not text or not str(text).strip():
+            return None
+        key = cache_key(text, self.model_name, self.dimensions)
+        # The cache's disk tier is blocking SQLite I/O: keep it off the event loop
+        vector = await asyncio.to_thread(query_cache.get, key)
+        if vector is not None:
+            return vector.tolist()
+        vector = await self.aencode(text)
+        if vector is not None:
+            await asyncio.to_thread(query_cache.put, key, vector)
+        return vector
+
+    def encode_queries(self, texts):
+        """
+        encode_query() for many texts with a single embeddings call for the
+        cache misses. Output is aligned to `texts` (None for empty ones).
+        """
+        vectors = [None] * len(texts)
+        pending = {}   # cache key -> [positions]
+        for i, text in enumerate(texts):
+            if not text or not str(text).strip():
+                continue
+            key = cache_key(text, self.model_name, self.dimensions)
+            if key in pending:
+                pending[key].append(i)
+                continue
+            vector = query_cache.get(key)
+            if vector is not None:
+                vectors[i] = vector.tolist()
+            else:
+                pending[key] = [i]
+
+        if pending:
+            keys = list(pending)
+            embeddings = self.batch_encode([texts[pending[key][0]] for key in keys])
+            for key, vector in zip(keys, embeddings):
+                query_cache.put(key, vector)
+                for i in pending[key]:
+                    vectors[i] = vector
+        return vectors
 
     def batch_encode(self, texts):
+        """
+        Vectors aligned to `texts` (None for empty ones), in as many
+        token-budgeted, rate-limited requests as the provider's limits need.
+        """
         if not texts:
             return []
-            
-        valid_texts = [t for t in texts if t and str(t).strip()]
-        if not valid_texts:
-            return []
-            
-        response = self.client.embeddings.create(
-            input=valid_texts,
-            model=self.model_name,
-            dimensions=self.dimensions
-        )
-        return [item.embedding for item in response.data]
+        return self.throttle.encode(texts)
 
 # Global engine instance
 nlp_engine = NLPEngine()
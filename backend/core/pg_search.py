@@ -0,0 +1,193 @@
+import os
+from sqlalchemy import text
+from backend.core.centroids import CENTROID_PROFESSORS
+from backend.core.prefilter import filter_sql
+
+PG_IVFFLAT_PROBES = int(os.getenv("PG_IVFFLAT_PROBES", "10"))
+PG_HNSW_EF_SEARCH = int(os.getenv("PG_HNSW_EF_SEARCH", "100"))
+# pgvector's upper bound for hnsw.ef_search
+_MAX_EF_SEARCH = 1000
+
+# All queries read the denormalized match_rows table (one row per paper,
+# professor pair), so none of them joins. `{filters}` takes the /match
+# pre-filter predicates (prefilter.filter_sql), which the btree / partial
+# indexes on match_rows serve before any vector is compared.
+
+# Full scan: the threshold in WHERE keeps the planner from using the vector
+# index, but every pair is scored exactly
+_EXACT_SQL = """
+    SELECT
+        m.paper_id,
+        m.title,
+        m.year,
+        m.paper_url,
+        m.professor_id as prof_id,
+        m.prof_name,
+        m.university,
+        m.email,
+        (1 - (m.embedding <=> :vec)) as similarity
+    FROM match_rows m
+    WHERE (1 - (m.embedding <=> :vec)) >= :min_score{filters}
+    ORDER BY similarity DESC
+    LIMIT :limit
+"""
+
+# Index-friendly: a bare ORDER BY distance LIMIT (an ivfflat / hnsw index
+# scan), thresholded afterwards
+_INDEX_SQL = """
+    SELECT *
+    FROM (
+        SELECT
+            m.paper_id,
+            m.title,
+            m.year,
+            m.paper_url,
+            m.professor_id as prof_id,
+            m.prof_name,
+            m.university,
+            m.email,
+            (1 - (m.embedding <=> :vec)) as similarity
+        FROM match_rows m
+        WHERE true{filters}
+        ORDER BY m.embedding <=> :vec
+        LIMIT :limit
+    ) nearest
+    WHERE similarity >= :min_score
+    ORDER BY similarity DESC
+"""
+
+# Two-stage: best professors by centroid, then only their rows
+_CENTROID_SQL = """
+    WITH top_profs AS (
+        SELECT professor_id
+        FROM professor_centroids
+        WHERE embedding IS NOT NULL{centroid_filters}
+        ORDER BY embedding <=> :vec
+        LIMIT :n_professors
+    )
+    SELECT
+        m.paper_id,
+        m.title,
+        m.year,
+        m.paper_url,
+        m.professor_id as prof_id,
+        m.prof_name,
+        m.university,
+        m.email,
+        (1 - (m.embedding <=> :vec)) as similarity
+    FROM top_profs tp
+    JOIN match_rows m ON m.professor_id = tp.professor_id
+    WHERE (1 - (m.embedding <=> :vec)) >= :min_score{filters}
+    ORDER BY similarity DESC
+    LIMIT :limit
+"""
+
+EXACT_QUERY = text(_EXACT_SQL.format(filters=""))
+INDEX_QUERY = text(_INDEX_SQL.format(filters=""))
+CENTROID_QUERY = text(_CENTROID_SQL.format(filters="", centroid_filters=""))
+
+
+def _query(template, filters, **extra):
+    # Statement with the pre-filter predicates filled in, plus their parameters
+    predicates, params, binds = filter_sql(filters)
+    return text(template.format(filters=predicates, **extra)).bindparams(*binds), params
+
+
+def _to_matches(results):
+    return [{
+        "paper_id": row.paper_id,
+        "prof_id": row.prof_id,
+        "prof_name": row.prof_name,
+        "university": row.university,
+        "email": row.email,
+        "title": row.title,
+        "year": row.year,
+        "score": float(row.similarity),
+        "url": row.paper_url
+    } for row in results]
+
+
+def _search_params(probes=None, ef_search=None, iterative=False):
+    statements = [(text("SELECT set_config('ivfflat.probes', :probes, true), set_config('hnsw.ef_search', :ef, true)"), {
+        "probes": str(int(probes or PG_IVFFLAT_PROBES)),
+        "ef": str(min(int(ef_search or PG_HNSW_EF_SEARCH), _MAX_EF_SEARCH)),
+    })]
+    if iterative:
+        statements.append((text(
+            "SELECT set_config('hnsw.iterative_scan', 'strict_order', true), "
+            "set_config('ivfflat.iterative_scan', 'relaxed_order', true)"
+        ), {}))
+    return statements
+
+
+def set_search_params(db, probes=None, ef_search=None, iterative=False):
+    """
+    Transaction-local ivfflat.probes / hnsw.ef_search for the next index scan
+    (SET LOCAL cannot take bind parameters, set_config can). `iterative`
+    lets a filtered scan keep walking the index until `limit` rows pass the
+    filter (pgvector >= 0.8; older versions ignore the unknown setting).
+    """
+    for statement, params in _search_params(probes, ef_search, iterative):
+        db.execute(statement, params)
+
+
+def index_ef_search(limit, ef_search=None):
+    # An hnsw scan returns at most ef_search rows
+    return max(int(ef_search or PG_HNSW_EF_SEARCH), min(int(limit), _MAX_EF_SEARCH))
+
+
+# Each query is built once (statement, parameters) and run by the sync
+# helpers (ingestion, batch, CLIs) or their async twins (/match)
+
+def _exact_query(vector, limit, min_score, filters=None):
+    query, params = _query(_EXACT_SQL, filters) if filters else (EXACT_QUERY, {})
+    return query, {"vec": str(vector), "limit": limit, "min_score": min_score, **params}
+
+
+def _index_query(vector, limit, min_score, filters=None):
+    query, params = _query(_INDEX_SQL, filters) if filters else (INDEX_QUERY, {})
+    return query, {"vec": str(vector), "limit": limit, "min_score": min_score, **params}
+
+
+def _centroid_query(vector, limit, min_score, n_professors=None, filters=None):
+    if filters:
+        # Only professors at the requested universities compete in stage 1
+        centroid_filters = (" AND professor_id IN (SELECT id FROM professors WHERE university IN :universities)"
+                            if filters.get("universities") else "")
+        query, params = _query(_CENTROID_SQL, filters, centroid_filters=centroid_filters)
+    else:
+        query, params = CENTROID_QUERY, {}
+    return query, {
+        "vec": str(vector),
+        "limit": limit,
+        "min_score": min_score,
+        "n_professors": max(int(n_professors or CENTROID_PROFESSORS), -(-limit // 3)),
+        **params
+    }
+
+
+def exact_matches(db, vector, limit, min_score, filters=None):
+    return _to_matches(db.execute(*_exact_query(vector, limit, min_score, filters)).fetchall())
+
+
+def index_matches(db, vector, limit, min_score, probes=None, ef_search=None, filters=None):
+    set_search_params(db, probes, index_ef_search(limit, ef_search), iterative=bool(filters))
+    return _to_matches(db.execute(*_index_query(vector, limit, min_score, filters)).fetchall())
+
+
+def centroid_matches(db, vector, limit, min_score, n_professors=None, filters=None):
+    return _to_matches(db.execute(*_centroid_query(vector, limit, min_score, n_professors, filters)).fetchall())
+
+
+async def aexact_matches(db, vector, limit, min_score, filters=None):
+    return _to_matches((await db.execute(*_exact_query(vector, limit, min_score, filters))).fetchall())
+
+
+async def aindex_matches(db, vector, limit, min_score, probes=None, ef_search=None, filters=None):
+    for statement, params in _search_params(probes, index_ef_search(limit, ef_search), iterative=bool(filters)):
+        await db.execute(statement, params)
+    return _to_matches((await db.execute(*_index_query(vector, limit, min_score, filters))).fetchall())
+
+
+async def acentroid_matches(db, vector, limit, min_score, n_professors=None, filters=None):
+    return _to_matches((await db.execute(*_centroid_query(vector, limit, min_score, n_professors, filters))).fetchall())
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+from sqlalchemy import bindparam
+
+# Filtered standalone searches score only the surviving rows while they are at
+# most this fraction of the corpus; above it, a full scan (or the requested
+# ANN strategy) masked to the filter is cheaper than gathering rows.
+FILTER_SCAN_FRACTION = float(os.getenv("FILTER_SCAN_FRACTION", "0.3"))
+
+
+def normalize_filters(universities=None, year_min=None, year_max=None, min_citations=None):
+    """The active /match pre-filters as a dict, or None when nothing is filtered."""
+    filters = {}
+    universities = sorted({u.strip() for u in universities or [] if u and u.strip()})
+    if universities:
+        filters["universities"] = universities
+    if year_min is not None:
+        filters["year_min"] = int(year_min)
+    if year_max is not None:
+        filters["year_max"] = int(year_max)
+    if min_citations:
+        filters["min_citations"] = int(min_citations)
+    return filters or None
+
+
+def filter_sql(filters, alias="m"):
+    """
+    Predicates over match_rows for the given filters, each prefixed with AND,
+    plus their parameters and bind params. Values are compared directly (no
+    lower() etc.) so the btree and partial indexes on match_rows apply.
+    """
+    clauses, params, binds = [], {}, []
+    if not filters:
+        return "", params, binds
+    if filters.get("universities"):
+        clauses.append(f"{alias}.university IN :universities")
+        params["universities"] = list(filters["universities"])
+        binds.append(bindparam("universities", expanding=True))
+    if filters.get("year_min") is not None:
+        clauses.append(f"{alias}.year >= :year_min")
+        params["year_min"] = filters["year_min"]
+    if filters.get("year_max") is not None:
+        clauses.append(f"{alias}.year <= :year_max")
+        params["year_max"] = filters["year_max"]
+    if filters.get("min_citations"):
+        clauses.append(f"{alias}.citations >= :min_citations")
+        params["min_citations"] = filters["min_citations"]
+    return "".join(f" AND {c}" for c in clauses), params, binds
+
+
+class PairFilter:
+    """
+    Pre-filter over the (paper, professor) pairs of an index state.
+
+    Each predicate has a precomputed access path: pairs grouped by university
+    (CSR), and pairs sorted by year and by citation count, so a year range or
+    citation floor is one contiguous slice. A query starts from the smallest
+    of these candidate lists (its size is known before touching any vector)
+    and checks the remaining predicates on those pairs only.
+    """
+
+    def __init__(self, universities, years, citations):
+        names, codes = np.unique(np.asarray(universities, dtype=object).astype(str), return_inverse=True)
+        self.names = names                  # sorted university names
+        self.codes = codes                  # (n_pairs,) index into names
+        order = np.argsort(codes, kind="stable")
+        self.univ_order = order
+        self.univ_offsets = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        # Missing years are -1, so they never pass a year filter
+        self.years = np.asarray(years, dtype=np.int64)
+        self.year_order = np.argsort(self.years, kind="stable")
+        self.sorted_years = self.years[self.year_order]
+        self.citations = np.asarray(citations, dtype=np.int64)
+        self.citation_order = np.argsort(self.citations, kind="stable")
+        self.sorted_citations = self.citations[self.citation_order]
+
+    def select(self, filters):
+        """Sorted pair indices passing every filter, or None when nothing is filtered."""
+        if not filters:
+            return None
+        universities = filters.get("universities")
+        year_min = filters.get("year_min")
+        year_max = filters.get("year_max")
+        min_citations = filters.get("min_citations")
+
+        candidates = []
+        if universities:
+            codes = np.asarray([c for c in (self._code(u) for u in universities) if c is not None], dtype=np.int64)
+            candidates.append(np.concatenate([self.univ_order[self.univ_offsets[c]:self.univ_offsets[c + 1]]
+                                              for c in codes]) if len(codes) else np.empty(0, dtype=np.int64))
+        if year_min is not None or year_max is not None:
+            lo = np.searchsorted(self.sorted_years, max(year_min if year_min is not None else 0, 0), side="left")
+            hi = np.searchsorted(self.sorted_years, year_max, side="right") if year_max is not None else len(self.years)
+            candidates.append(self.year_order[lo:hi])
+        if min_citations:
+            lo = np.searchsorted(self.sorted_citations, min_citations, side="left")
+            candidates.append(self.citation_order[lo:])
+        if not candidates:
+            return None
+
+        pairs = min(candidates, key=len)
+        if universities and len(pairs):
+            pairs = pairs[np.isin(self.codes[pairs], codes)]
+        if year_min is not None:
+            pairs = pairs[self.years[pairs] >= year_min]
+        if year_max is not None:
+            pairs = pairs[(self.years[pairs] >= 0) & (self.years[pairs] <= year_max)]
+        if min_citations:
+            pairs = pairs[self.citations[pairs] >= min_citations]
+        return np.sort(pairs)
+
+    def _code(self, university):
+        pos = int(np.searchsorted(self.names, university))
+        return pos if pos < len(self.names) and self.names[pos] == university else None
@@ -0,0 +1,272 @@
+import os
+import numpy as np
+from backend.db.database import DATA_DIR
+from backend.core.segments import file_lock
+
+QUANT_DIR = os.path.join(DATA_DIR, "quantized")
+# Product-quantization subspaces: 768 dims / 192 = 4 dims per 1-byte code,
+# i.e. 192 bytes per paper instead of 3072 (16x). int8 is a fixed 4x.
+PQ_M = int(os.getenv("PQ_M", "192"))
+# Candidates re-ranked with exact float32 vectors after the compressed scan
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "200"))
+# Rows used to fit int8 scales / PQ codebooks
+TRAIN_SAMPLE = int(os.getenv("QUANT_TRAIN_SAMPLE", "20000"))
+
+# Rows per chunk when scanning PQ codes (bounds the float32 temporaries)
+_SCAN_CHUNK = 65536
+# Rows per chunk when scanning int8 codes: the chunk's float32 copy stays in
+# the L2 cache between the conversion and the product
+_INT8_CHUNK = 512
+
+
+def build_lock(kind, blocking=True):
+    """Cross-process lock held while training / encoding `kind`: one process does it, the others load its save."""
+    os.makedirs(QUANT_DIR, exist_ok=True)
+    return file_lock(os.path.join(QUANT_DIR, f".{kind}.lock"), blocking)
+
+
+def kmeans(x, k, iterations=20, seed=0):
+    """Euclidean Lloyd's k-means; returns (k, d) centroids."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    x_sq = (x ** 2).sum(axis=1, keepdims=True)
+    for _ in range(iterations):
+        dists = x_sq - 2 * x @ centroids.T + (centroids ** 2).sum(axis=1)
+        assign = np.argmin(dists, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        # Per-dimension bincount is far faster than np.add.at for the low
+        # dimensional PQ subspaces this is used for
+        sums = np.stack([np.bincount(assign, weights=x[:, d], minlength=k) for d in range(x.shape[1])], axis=1)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty), replace=False)]
+    return centroids
+
+
+class ScalarQuantizer:
+    """Symmetric per-dimension int8 quantization (4x smaller than float32)."""
+
+    kind = "int8"
+
+    def __init__(self, scale):
+        self.scale = np.asarray(scale, dtype=np.float32)   # (dim,)
+
+    @property
+    def dim(self):
+        return len(self.scale)
+
+    @property
+    def bytes_per_vector(self):
+        return self.dim
+
+    @classmethod
+    def train(cls, sample):
+        scale = np.abs(np.asarray(sample, dtype=np.float32)).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return cls(scale)
+
+    def encode(self, vectors):
+        return np.clip(np.rint(np.asarray(vectors, dtype=np.float32) / self.scale), -127, 127).astype(np.int8)
+
+    def layout(self, codes):
+        """Codes as scan() reads them: row-major, one vector per row."""
+        return np.ascontiguousarray(codes)
+
+    def scan(self, codes, q):
+        # (codes * scale) . q == codes . (q * scale)
+        qs = (q * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _INT8_CHUNK):
+            out[start:start + _INT8_CHUNK] = codes[start:start + _INT8_CHUNK].astype(np.float32) @ qs
+        return out
+
+    def params(self):
+        return {"scale": self.scale}
+
+    @classmethod
+    def from_params(cls, data):
+        return cls(data["scale"])
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `m` subspaces, each encoded
+    as the 1-byte id of its nearest of 256 trained sub-centroids. Scans use
+    asymmetric distance computation (exact query, quantized corpus) through a
+    per-query (m, 256) lookup table, folded into one 65536-entry table per
+    pair of subspaces: a scan is m / 2 gather-accumulate passes over the
+    codes, read as one uint16 per pair and stored pair-major so each pass
+    reads contiguous memory.
+    """
+
+    kind = "pq"
+
+    def __init__(self, codebooks):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)   # (m, 256, dsub)
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @property
+    def dim(self):
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    @property
+    def bytes_per_vector(self):
+        return self.m
+
+    @classmethod
+    def train(cls, sample, m=PQ_M, iterations=10):
+        sample = np.asarray(sample, dtype=np.float32)
+        dim = sample.shape[1]
+        if dim % m:
+            raise ValueError(f"PQ_M={m} must divide the embedding dimension {dim}")
+        dsub = dim // m
+        codebooks = np.zeros((m, 256, dsub), dtype=np.float32)
+        for j in range(m):
+            centroids = kmeans(sample[:, j * dsub:(j + 1) * dsub], 256, iterations=iterations, seed=j)
+            codebooks[j, :len(centroids)] = centroids
+            # Small samples: pad unused codes with copies so argmin stays valid
+            codebooks[j, len(centroids):] = centroids[0]
+        return cls(codebooks)
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vectors[:, j * dsub:(j + 1) * dsub]
+            book = self.codebooks[j]
+            dists = (sub ** 2).sum(axis=1, keepdims=True) - 2 * sub @ book.T + (book ** 2).sum(axis=1)
+            codes[:, j] = np.argmin(dists, axis=1)
+        return codes
+
+    def layout(self, codes):
+        """Codes as scan() reads them: (ceil(m / 2), n) uint16, subspace pair (2j, 2j + 1) in row j."""
+        codes = np.asarray(codes, dtype=np.uint8)
+        if self.m % 2:
+            codes = np.concatenate([codes, np.zeros((len(codes), 1), dtype=np.uint8)], axis=1)
+        # Little-endian: the pair's value is code[2j] + 256 * code[2j + 1]
+        return np.ascontiguousarray(np.ascontiguousarray(codes).view("<u2").T)
+
+    def scan(self, codes, q):
+        lut = np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.m, -1).astype(np.float32))
+        if self.m % 2:
+            lut = np.concatenate([lut, np.zeros((1, 256), dtype=np.float32)])
+        # pair_lut[j, a + 256 * b] = lut[2j, a] + lut[2j + 1, b]
+        pair_lut = (lut[1::2, :, None] + lut[0::2, None, :]).reshape(len(lut) // 2, 65536)
+        n = codes.shape[1]
+        out = np.zeros(n, dtype=np.float32)
+        gathered = np.empty(min(n, _SCAN_CHUNK), dtype=np.float32)
+        for start in range(0, n, _SCAN_CHUNK):
+            acc = out[start:start + _SCAN_CHUNK]
+            part = gathered[:len(acc)]
+            for j in range(len(pair_lut)):
+                np.take(pair_lut[j], codes[j, start:start + _SCAN_CHUNK], out=part)
+                acc += part
+        return out
+
+    def params(self):
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_params(cls, data):
+        return cls(data["codebooks"])
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+class QuantizedIndex:
+    """
+    Compressed codes for every paper, keyed by paper id so the persisted file
+    survives segment appends and restarts. New papers are encoded
+    incrementally with the existing scales / codebooks.
+    """
+
+    def __init__(self, quantizer, ids, codes):
+        self.quantizer = quantizer
+        self.ids = ids          # (n,) int64, sorted paper ids
+        self.codes = codes      # (n, bytes_per_vector)
+
+    @classmethod
+    def path(cls, kind):
+        return os.path.join(QUANT_DIR, f"{kind}.npz")
+
+    @classmethod
+    def train(cls, kind, sample):
+        quantizer = QUANTIZERS[kind].train(sample)
+        empty = np.empty((0, quantizer.bytes_per_vector), dtype=quantizer.encode(sample[:1]).dtype)
+        return cls(quantizer, np.empty(0, dtype=np.int64), empty)
+
+    def add(self, vectors, ids):
+        if not len(ids):
+            return
+        all_ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        all_codes = np.concatenate([self.codes, self.quantizer.encode(vectors)])
+        order = np.argsort(all_ids, kind="stable")
+        self.ids = all_ids[order]
+        self.codes = all_codes[order]
+
+    def missing(self, ids):
+        """Mask of ids that have no codes yet."""
+        return ~np.isin(ids, self.ids)
+
+    def codes_for(self, ids):
+        """Codes aligned to `ids` (all of which must be encoded)."""
+        return self.codes[np.searchsorted(self.ids, ids)]
+
+    def save(self):
+        path = self.path(self.quantizer.kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, ids=self.ids, codes=self.codes, **self.quantizer.params())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, kind):
+        path = cls.path(kind)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(QUANTIZERS[kind].from_params(data), data["ids"], data["codes"])
+
+
+def rerank(q, approx_scores, k, gather, n_candidates=RERANK_CANDIDATES):
+    """
+    Takes the best `max(n_candidates, k)` positions by compressed score and
+    re-scores them exactly. Returns (positions, exact scores).
+    """
+    n = min(len(approx_scores), max(int(n_candidates), int(k)))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if n < len(approx_scores):
+        candidates = np.argpartition(-approx_scores, n - 1)[:n]
+    else:
+        candidates = np.arange(len(approx_scores))
+    return candidates, gather(candidates) @ q
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.db.database import SessionLocal
+    from backend.core.vector_index import vector_index
+
+    parser = argparse.ArgumentParser(description="Train int8 / PQ quantizers and encode every indexed paper")
+    parser.add_argument("--kinds", default="int8,pq")
+    parser.add_argument("--retrain", action="store_true", help="fit new scales / codebooks instead of the saved ones")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        state = vector_index.ensure_fresh(db)
+        for kind in args.kinds.split(","):
+            vector_index.train_quantized(state, kind, retrain=args.retrain)
+    finally:
+        db.close()
@@ -0,0 +1,134 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import update, select
+from backend.db.database import IS_STANDALONE, db_lock
+from backend.models.models import IndexState
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+# Ranked matches kept per query. Covers the UI's largest `limit` (200), so
+# slider changes are answered by slicing the cached ranking.
+RESULT_CACHE_DEPTH = int(os.getenv("RESULT_CACHE_DEPTH", "200"))
+
+
+def get_index_generation(db):
+    state = db.query(IndexState.generation).filter(IndexState.id == 1).first()
+    return state[0] if state else 0
+
+
+async def aget_index_generation(db):
+    state = (await db.execute(select(IndexState.generation).where(IndexState.id == 1))).first()
+    return state[0] if state else 0
+
+
+def bump_index_generation(db):
+    """
+    Atomically increments the index generation (SQL-level, so concurrent
+    workers never lose a bump). Call after committing new vectors or links.
+    """
+    stmt = (
+        update(IndexState)
+        .where(IndexState.id == 1)
+        .values(generation=IndexState.generation + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    def _bump():
+        if db.execute(stmt).rowcount == 0:
+            db.add(IndexState(id=1, generation=1))
+        db.commit()
+
+    if IS_STANDALONE:
+        with db_lock:
+            _bump()
+    else:
+        _bump()
+
+
+def query_key(vector, **params):
+    """Cache key for a query vector plus every parameter that affects ranking."""
+    digest = hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes())
+    digest.update(repr(sorted(params.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MatchResultCache:
+    """
+    LRU of full rankings (flat matches, best first, no score threshold) per
+    query, valid for a single index generation. `limit` and `min_score` are
+    applied by slicing/filtering the cached ranking; the whole cache drops
+    itself as soon as a request observes a newer generation.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, depth=RESULT_CACHE_DEPTH):
+        self.max_entries = max_entries
+        self.depth = depth
+        self.generation = None
+        self._entries = OrderedDict()   # key -> (ranking, complete)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, generation, key, limit):
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            # A ranking shorter than the depth it was computed at is the
+            # whole result set, so it answers any limit.
+            if entry is not None and (entry[1] or len(entry[0]) >= limit):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, generation, key, ranking, depth):
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = (ranking, len(ranking) < depth)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def dump(self):
+        """JSON-serialisable copy of the entries (for snapshots)."""
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "entries": [[key, ranking, complete] for key, (ranking, complete) in self._entries.items()],
+            }
+
+    def restore(self, data):
+        """Loads entries from dump() unless the cache is already in use."""
+        with self._lock:
+            if self.generation is not None or self._entries:
+                return False
+            self.generation = data["generation"]
+            self._entries = OrderedDict((key, (ranking, complete)) for key, ranking, complete in data["entries"])
+            return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": self.generation,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+# Global cache instance
+result_cache = MatchResultCache()
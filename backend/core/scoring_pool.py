@@ -0,0 +1,25 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads for CPU-bound /match work (numpy releases the GIL while scoring).
+# A dedicated pool bounds how many rankings run at once, so a burst of
+# queries queues here instead of filling the server's shared threadpool.
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(min(8, os.cpu_count() or 4))))
+
+
+class ScoringPool:
+    """Bounded executor that async handlers await for CPU-bound scoring."""
+
+    def __init__(self, workers=SCORING_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+
+# Global pool instance
+scoring_pool = ScoringPool()
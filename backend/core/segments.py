@@ -0,0 +1,210 @@
+import os
+import re
+import struct
+import contextlib
+import numpy as np
+from backend.db.database import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (run_local.bat)
+    fcntl = None
+    import msvcrt
+
+# Segment file layout (all little-endian):
+#   header  (64 bytes)  magic, format version, dim, row count, watermark
+#   rows    (count * dim * float32)  L2-normalised embeddings, row-major
+#   ids     (count * int64)          paper id of each row
+# Segments are immutable once written; new embeddings are appended as new
+# segment files, so every process can map the same pages read-only. A run of
+# small trailing segments is occasionally rewritten as one (rows in order).
+SEGMENT_MAGIC = b"SRMESEG1"
+# v2: watermarks are match_rows ids (v1 used paper_embeddings ids)
+SEGMENT_VERSION = 2
+HEADER_FORMAT = "<8sIIQQ"
+HEADER_SIZE = 64
+SEGMENT_DIR = os.path.join(DATA_DIR, "segments")
+
+_SEGMENT_NAME = re.compile(r"^seg-(\d{6})\.seg$")
+
+
+@contextlib.contextmanager
+def file_lock(path, blocking=True):
+    """
+    Cross-process exclusive lock so only one worker appends at a time. Yields
+    True once held; with blocking=False, yields False at once if another
+    process holds it.
+    """
+    with open(path, "a+b") as fh:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_header(path):
+    with open(path, "rb") as fh:
+        magic, version, dim, count, watermark = struct.unpack(
+            HEADER_FORMAT, fh.read(struct.calcsize(HEADER_FORMAT))
+        )
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        raise ValueError(f"{path} is not a v{SEGMENT_VERSION} vector segment")
+    return dim, count, watermark
+
+
+class VectorSegment:
+    """Read-only, memory-mapped view over one segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        dim, count, watermark = _read_header(path)
+        self.dim = dim
+        self.count = count
+        self.watermark = watermark
+
+        if count:
+            self.matrix = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=(count, dim))
+            self.ids = np.memmap(path, dtype="<i8", mode="r", offset=HEADER_SIZE + count * dim * 4, shape=(count,))
+        else:
+            self.matrix = np.empty((0, dim), dtype=np.float32)
+            self.ids = np.empty(0, dtype=np.int64)
+
+
+class SegmentStore:
+    """
+    Append-only directory of vector segments, e.g. data/segments/seg-000001.seg.
+
+    The watermark stored in each header is the highest match_rows.id it
+    covers, so exporting only ever reads rows beyond the newest segment.
+    Readers list and open segments under lock(), as merges remove files.
+    """
+
+    def __init__(self, directory=SEGMENT_DIR):
+        self.directory = directory
+
+    def _paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if _SEGMENT_NAME.match(n))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def open_segments(self):
+        segments = []
+        for path in self._paths():
+            try:
+                segments.append(VectorSegment(path))
+            except (ValueError, struct.error) as e:
+                print(f"⚠️ Ignoring unreadable segment {path}: {e}")
+        return segments
+
+    def watermark(self):
+        watermark = 0
+        for path in self._paths():
+            try:
+                watermark = max(watermark, _read_header(path)[2])
+            except (ValueError, struct.error):
+                continue
+        return watermark
+
+    def discard_stale(self):
+        """Deletes segments written in another format version. Callers must hold lock()."""
+        for path in self._paths():
+            try:
+                _read_header(path)
+            except ValueError:
+                try:
+                    os.remove(path)
+                    print(f"🗑️ Removed outdated segment {path}")
+                except OSError:
+                    pass
+            except struct.error:
+                continue
+
+    def clear(self):
+        """
+        Deletes every segment, e.g. after the served embeddings were replaced
+        (exports never revisit rows below the watermark). Callers must hold lock().
+        """
+        for path in self._paths():
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"⚠️ Could not remove segment {path}: {e}")
+
+    def lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return file_lock(os.path.join(self.directory, ".lock"))
+
+    def _next_path(self):
+        paths = self._paths()
+        last = int(_SEGMENT_NAME.match(os.path.basename(paths[-1])).group(1)) if paths else 0
+        return os.path.join(self.directory, f"seg-{last + 1:06d}.seg")
+
+    @staticmethod
+    def _write(path, dim, count, watermark, matrices, id_arrays):
+        # Written under a temporary name and renamed, so readers never observe
+        # a partially written segment
+        tmp_path = path + ".tmp"
+        header = struct.pack(HEADER_FORMAT, SEGMENT_MAGIC, SEGMENT_VERSION, dim, count, watermark)
+        with open(tmp_path, "wb") as fh:
+            fh.write(header.ljust(HEADER_SIZE, b"\0"))
+            for matrix in matrices:
+                fh.write(np.ascontiguousarray(matrix, dtype="<f4").tobytes())
+            for ids in id_arrays:
+                fh.write(np.ascontiguousarray(ids, dtype="<i8").tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    def append(self, ids, matrix, watermark):
+        """Writes a new immutable segment. Callers must hold lock()."""
+        count, dim = matrix.shape if matrix.size else (0, 0)
+        path = self._next_path()
+        self._write(path, dim, count, watermark, [matrix], [ids])
+        return path
+
+    def merge_tail(self, max_count, min_segments):
+        """
+        Rewrites the trailing run of segments smaller than `max_count` rows
+        (e.g. flushed deltas) as a single segment once the run is longer than
+        `min_segments`. Rows keep their order, so global row numbers stay
+        valid. Callers must hold lock(). Returns (path, segments merged) or None.
+        """
+        segments = self.open_segments()
+        start = len(segments)
+        while start > 0 and segments[start - 1].count < max_count:
+            start -= 1
+        run = segments[start:]
+        if len(run) <= min_segments:
+            return None
+        path = self._next_path()
+        self._write(path, max(s.dim for s in run), sum(s.count for s in run), max(s.watermark for s in run),
+                    [s.matrix for s in run if s.count], [s.ids for s in run if s.count])
+        for segment in run:
+            try:
+                os.remove(segment.path)
+            except OSError as e:
+                # Still mapped on Windows: its rows are duplicated in the merged
+                # segment, where the newest copy of each paper wins
+                print(f"⚠️ Could not remove merged segment {segment.path}: {e}")
+        return path, len(run)
+
+
+# Global store instance
+segment_store = SegmentStore()
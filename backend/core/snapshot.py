@@ -0,0 +1,181 @@
+"""
+Snapshots of the API's derived serving state, for warm restarts.
+
+    data/snapshots/snap-000042/
+        manifest.json        format version, index signature, segment names, shard signatures
+        pair_*.npy           pair arrays of every shard (memory-mapped on load)
+        shards.json          paper / professor metadata per shard
+        centroids.npz        professor centroids
+        result_cache.json    cached /match rankings and their index generation
+
+Vectors are not copied: the manifest names the segments (already persisted
+and memory-mapped) the pair rows point into. A snapshot is written on
+graceful shutdown and every SNAPSHOT_INTERVAL seconds when the state
+changed; on boot the newest one is loaded and compared with the database's
+row counts / max ids, so only university shards that changed since are
+re-read.
+
+    python -m backend.core.snapshot     # build the index from the database and snapshot it
+"""
+import os
+import re
+import json
+import time
+import shutil
+import tempfile
+import threading
+from backend.db.database import DATA_DIR, IS_STANDALONE, SessionLocal
+from backend.core.vector_index import vector_index
+from backend.core.result_cache import result_cache
+
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+# Bumped whenever the snapshot layout changes; other versions are ignored
+SNAPSHOT_VERSION = 2
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "600"))  # seconds between checkpoints, 0 disables
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))            # newest snapshots kept on disk
+
+_SNAPSHOT_NAME = re.compile(r"^snap-(\d{6})$")
+
+
+def _snapshots():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    found = sorted((int(m.group(1)), n) for n in os.listdir(SNAPSHOT_DIR) if (m := _SNAPSHOT_NAME.match(n)))
+    return [(seq, os.path.join(SNAPSHOT_DIR, name)) for seq, name in found]
+
+
+def save_snapshot():
+    """
+    Writes a new snapshot. Files go to a temporary directory that is renamed
+    into place once complete, so readers never see a partial snapshot.
+    """
+    started = time.time()
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=SNAPSHOT_DIR)
+    try:
+        index = vector_index.save_snapshot(tmp_dir)
+        with open(os.path.join(tmp_dir, "result_cache.json"), "w") as fh:
+            json.dump(result_cache.dump(), fh)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as fh:
+            json.dump({"version": SNAPSHOT_VERSION, "created_at": time.time(), "index": index}, fh)
+
+        # Another API worker may claim the same number first; take the next
+        for _ in range(5):
+            existing = _snapshots()
+            path = os.path.join(SNAPSHOT_DIR, f"snap-{(existing[-1][0] if existing else 0) + 1:06d}")
+            try:
+                os.rename(tmp_dir, path)
+                break
+            except OSError:
+                continue
+        else:
+            raise OSError("could not claim a snapshot name")
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    for _, old in _snapshots()[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(old, ignore_errors=True)
+    print(f"📸 Snapshot written to {path} in {time.time() - started:.1f}s")
+    return path
+
+
+def load_snapshot():
+    """Installs the newest readable snapshot of this version. Returns its path, or None."""
+    for _, path in reversed(_snapshots()):
+        try:
+            with open(os.path.join(path, "manifest.json")) as fh:
+                manifest = json.load(fh)
+            if manifest.get("version") != SNAPSHOT_VERSION:
+                continue
+            if manifest["index"] is not None and not vector_index.load_snapshot(path, manifest["index"]):
+                print(f"⚠️ Snapshot {path} refers to segments that no longer exist, skipping")
+                continue
+            with open(os.path.join(path, "result_cache.json")) as fh:
+                result_cache.restore(json.load(fh))
+            return path
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable snapshot {path}: {e}")
+    return None
+
+
+def warm_start():
+    """
+    API boot: load the newest snapshot, then check it against the database
+    (row counts / max ids). A matching snapshot is served as is; otherwise
+    only the changed university shards are rebuilt. Returns True if the
+    loaded snapshot was current (nothing new to checkpoint).
+    """
+    started = time.time()
+    path = load_snapshot()
+    if IS_STANDALONE:
+        loaded = vector_index.state
+        db = SessionLocal()
+        try:
+            state = vector_index.ensure_fresh(db)
+        finally:
+            db.close()
+        if path and state is loaded:
+            print(f"♨️ Warm start from {path}: snapshot is current ({time.time() - started:.1f}s)")
+            return True
+        if path:
+            print(f"♨️ Warm start from {path}: caught up with the database ({time.time() - started:.1f}s)")
+        else:
+            print(f"🧊 Cold start: index built from the database ({time.time() - started:.1f}s)")
+        return False
+    if path:
+        print(f"♨️ Restored cached results from {path}")
+    return path is not None
+
+
+class SnapshotCheckpointer:
+    """Background thread writing a snapshot every `interval` seconds if the serving state changed."""
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def _marker(self):
+        # Changes whenever the index is rebuilt or a ranking is computed
+        state = vector_index.state
+        return (state.signature if state is not None else None, result_cache.generation, result_cache.misses)
+
+    def mark_current(self):
+        self._last = self._marker()
+
+    def checkpoint(self):
+        marker = self._marker()
+        if marker != self._last:
+            save_snapshot()
+            self._last = marker
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"⚠️ Snapshot checkpoint failed: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="snapshot")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+# Global checkpointer instance
+snapshot_checkpointer = SnapshotCheckpointer()
+
+
+if __name__ == "__main__":
+    if IS_STANDALONE:
+        db = SessionLocal()
+        try:
+            vector_index.ensure_fresh(db)
+        finally:
+            db.close()
+    save_snapshot()
@@ -0,0 +1,1217 @@
+import os
+import copy
+import json
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sqlalchemy import text
+from backend.db.database import SessionLocal
+from backend.core.result_cache import get_index_generation
+from backend.models.vector import decode_vector
+from backend.core.segments import segment_store
+from backend.core.ivf_index import IVFIndex, IVF_PROBES, inverted_lists, search_lists, build_lock as ivf_build_lock
+from backend.core.hnsw_index import (HNSWIndex, HNSW_PATH, HNSW_EF_SEARCH, HNSW_THRESHOLD, HNSW_CHECKPOINT_SECONDS,
+                                     build_lock as hnsw_build_lock)
+from backend.core.quantization import (QuantizedIndex, RERANK_CANDIDATES, TRAIN_SAMPLE, rerank,
+                                       build_lock as quant_build_lock)
+from backend.core.centroids import CENTROID_PROFESSORS
+from backend.core.prefilter import FILTER_SCAN_FRACTION, PairFilter
+
+
+# Rows exported per segment file when syncing from the database
+EXPORT_BATCH = 20000
+# float32 cells in one (rows x queries) block of a batched search (~128 MiB)
+_SCORE_BLOCK = 32 * 1024 * 1024
+# Rows gathered per chunk when scoring a filtered subset
+_GATHER_CHUNK = 65536
+# Threads an exact search fans out to (row blocks, then university shards)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(min(8, os.cpu_count() or 4))))
+# Below this many rows per task, fanning out costs more than it saves
+_MIN_ROWS_PER_TASK = 50000
+# Serving rows held in the in-memory delta before it is compacted into the
+# segments and shards (searching the delta is a brute-force scan)
+DELTA_MAX_ROWS = int(os.getenv("DELTA_MAX_ROWS", "5000"))
+# Papers the HNSW graph may lack and still answer queries: rows compacted
+# out of the delta are scored exactly next to the graph until the background
+# sync inserts them (a compaction folds at most 2 * DELTA_MAX_ROWS rows)
+HNSW_EXACT_MAX = int(os.getenv("HNSW_EXACT_MAX", str(2 * DELTA_MAX_ROWS)))
+# Seconds before a background build that found another process building
+# (holding its lock) tries again, picking up that process' save
+BUILD_RETRY_SECONDS = int(os.getenv("BUILD_RETRY_SECONDS", "30"))
+# Small trailing segments (flushed deltas) tolerated before they are merged
+SEGMENT_MERGE_AT = int(os.getenv("SEGMENT_MERGE_AT", "8"))
+
+
+class _Shard:
+    """
+    One university's serving rows: its (paper, professor) pairs mapped onto
+    global vector rows, plus their display metadata. Shards are built and
+    replaced independently, so re-ingesting a university only re-reads that
+    university's rows. Vectors are not sharded: a paper co-authored across
+    universities keeps a single row in the shared segments.
+    """
+
+    def __init__(self, university, signature, pair_rows, pair_prof_ids, years, citations, papers, professors):
+        self.university = university        # None for professors without one
+        self.signature = signature          # (rows, max id, max updated_at) of its match_rows
+        self.pair_rows = pair_rows          # (n_pairs,) int64 -> global row, sorted
+        self.pair_prof_ids = pair_prof_ids
+        self.years = years                  # -1 where unknown
+        self.citations = citations
+        self.papers = papers                # paper_id -> (title, year, url)
+        self.professors = professors        # prof_id -> (name, university, email)
+
+
+class _Delta:
+    """
+    Serving rows added past the main state's high-water mark (match_rows.id),
+    polled on every query and searched by brute force next to the immutable
+    segments until compaction folds them into a rebuilt state. Deltas are
+    replaced, never mutated, so a query keeps a consistent view.
+    """
+
+    def __init__(self, marker=None, records=None, vectors=None, seen_id=0, updated=None):
+        self.marker = marker                # (rows, max id, max updated_at) of match_rows past the mark
+        self.records = records or {}        # match_rows id -> (paper_id, prof_id, title, year, citations, url, name, university, email)
+        self.vectors = vectors or {}        # paper_id -> unit vector
+        self.seen_id = seen_id              # highest match_rows id read
+        self.updated = updated              # newest updated_at read
+
+        items = list(self.records.values())
+        self.items = items
+        paper_ids = np.asarray(sorted(self.vectors), dtype=np.int64)
+        self.matrix = (np.stack([self.vectors[p] for p in paper_ids.tolist()]) if len(paper_ids)
+                       else np.empty((0, 0), dtype=np.float32))
+        self.pair_vectors = np.searchsorted(paper_ids, np.asarray([r[0] for r in items], dtype=np.int64))
+        self.years = np.asarray([r[3] if r[3] is not None else -1 for r in items], dtype=np.int64)
+        self.citations = np.asarray([r[4] or 0 for r in items], dtype=np.int64)
+        self.universities = np.asarray([r[7] or "" for r in items], dtype=object)
+
+    def __len__(self):
+        return len(self.items)
+
+    def scores(self, q):
+        return (self.matrix @ q)[self.pair_vectors]
+
+    def select(self, filters):
+        """Indices of the rows passing the /match pre-filters (same rules as PairFilter)."""
+        keep = np.ones(len(self.items), dtype=bool)
+        if filters:
+            if filters.get("universities"):
+                keep &= np.isin(self.universities, np.asarray(filters["universities"], dtype=object))
+            if filters.get("year_min") is not None:
+                keep &= self.years >= filters["year_min"]
+            if filters.get("year_max") is not None:
+                keep &= (self.years >= 0) & (self.years <= filters["year_max"])
+            if filters.get("min_citations"):
+                keep &= self.citations >= filters["min_citations"]
+        return np.flatnonzero(keep)
+
+
+class _IndexState:
+    """
+    Immutable view of the embedded corpus. A new state is built on reload and
+    swapped in atomically, so in-flight queries never see a half-built index.
+
+    Vectors stay in the memory-mapped segments (shared by every worker through
+    the page cache); only ids, links and metadata are held per process.
+    """
+
+    def __init__(self, segments, paper_ids, lookup_ids, lookup_rows, shards, centroid_ids, centroids, signature):
+        self.segments = segments            # [VectorSegment], L2-normalised float32 rows
+        self.paper_ids = paper_ids          # (n_rows,) int64, global row -> paper id
+        self.lookup_ids = lookup_ids        # (n_papers,) int64, sorted unique paper ids
+        self.lookup_rows = lookup_rows      # (n_papers,) int64, current row of each paper
+        self.shards = shards                # [_Shard], one per university
+        self.centroid_ids = centroid_ids    # (n_profs,) int64 professor ids
+        self.centroids = centroids          # (n_profs, dim) unit professor centroids
+        self.signature = signature          # see VectorIndex._signature(); [:5] rows, [5:] centroids
+        self.delta = _Delta()               # rows past the high-water mark, replaced on every poll
+        self.generation = None              # index generation the state was last checked against
+        self.offsets = np.cumsum([0] + [s.count for s in segments])
+        self.dim = segments[0].dim if segments else 0
+
+        # Pairs of every shard, concatenated: shard i owns pairs
+        # [shard_offsets[i], shard_offsets[i + 1])
+        self.shard_offsets = np.cumsum([0] + [len(sh.pair_rows) for sh in shards])
+        self.pair_rows = self._concat([sh.pair_rows for sh in shards])          # (n_pairs,) int64 -> global row
+        self.pair_prof_ids = self._concat([sh.pair_prof_ids for sh in shards])  # (n_pairs,) int64
+        self.pair_shard = np.repeat(np.arange(len(shards)), np.diff(self.shard_offsets))
+
+        self.ivf = None                     # (IVFIndex, offsets, rows), attached in the background
+        self.hnsw = None                    # (graph, its node count, rows it lacks), refreshed as it grows
+        self.quantized = {}                 # kind -> (quantizer, codes aligned to lookup_ids in its scan layout), attached in the background
+        self.prof_pairs = None              # (prof_keys, offsets, pair order), built on first use
+        self.pair_filter = None             # PairFilter, built on the first filtered query
+        self.shard_groups = None            # shards balanced into fan-out tasks, built on first use
+
+    @staticmethod
+    def _concat(parts):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    @property
+    def pair_attrs(self):
+        # (universities, years, citations) parallel to pair_rows, for PairFilter
+        universities = np.repeat(np.asarray([sh.university or "" for sh in self.shards], dtype=object),
+                                 np.diff(self.shard_offsets))
+        return (universities, self._concat([sh.years for sh in self.shards]),
+                self._concat([sh.citations for sh in self.shards]))
+
+    def metadata(self, pair):
+        """(paper metadata, professor metadata) of a global pair index."""
+        shard = self.shards[self.pair_shard[pair]]
+        paper_id = int(self.paper_ids[self.pair_rows[pair]])
+        return shard.papers[paper_id], shard.professors.get(int(self.pair_prof_ids[pair]), ("", "", None))
+
+    @property
+    def hwm(self):
+        # match_rows ids up to here are in the shards; later ones in the delta
+        return self.signature[1]
+
+    def rows_for(self, ids):
+        """Current global row of each paper id (ids must be indexed)."""
+        return self.lookup_rows[np.searchsorted(self.lookup_ids, ids)]
+
+    @property
+    def pair_paper_ids(self):
+        return self.paper_ids[self.pair_rows]
+
+    def score(self, q):
+        """Cosine similarity of a unit query against every global row."""
+        if not self.segments:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate([s.matrix @ q for s in self.segments])
+
+    def score_rows(self, rows, q):
+        """Cosine similarity of a unit query against the given (sorted, unique) global rows only."""
+        if len(rows) and len(rows) * 2 >= rows[-1] - rows[0] + 1:
+            # Dense run (e.g. one university's papers, exported together):
+            # scoring the whole span beats gathering the rows one by one
+            return self.score_span(int(rows[0]), int(rows[-1]) + 1, q)[rows - rows[0]]
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), _GATHER_CHUNK):
+            chunk = rows[start:start + _GATHER_CHUNK]
+            scores[start:start + len(chunk)] = self.vectors(chunk) @ q
+        return scores
+
+    def score_span(self, start, end, q):
+        """Cosine similarity of a unit query against global rows [start, end)."""
+        parts = []
+        for i, segment in enumerate(self.segments):
+            lo, hi = max(start, self.offsets[i]), min(end, self.offsets[i + 1])
+            if lo < hi:
+                parts.append(segment.matrix[lo - self.offsets[i]:hi - self.offsets[i]] @ q)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+
+    def vectors(self, rows):
+        """Unit vectors of the given global rows, gathered across segments."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(self.segments) == 1:
+            return np.asarray(self.segments[0].matrix[rows])
+        seg_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for seg in np.unique(seg_of):
+            mask = seg_of == seg
+            out[mask] = self.segments[seg].matrix[rows[mask] - self.offsets[seg]]
+        return out
+
+
+class VectorIndex:
+    """
+    Process-wide exact index for standalone (SQLite) matching.
+
+    Embeddings are exported once into append-only, memory-mapped segment files
+    of pre-normalised float32 rows (see backend/core/segments.py), so a query is
+    a matrix-vector product per segment plus an argpartition top-k. Professor
+    and paper metadata live in compact side tables instead of being re-joined
+    on every request, partitioned into per-university shards that are rebuilt
+    only when that university's rows change.
+
+    Rows inserted after a state was built do not rebuild it: they are polled
+    by match_rows.id into a small in-memory delta searched alongside the
+    segments (fresh on the next query), and a background compaction folds the
+    delta into the segments and shards once it holds DELTA_MAX_ROWS rows. The
+    HNSW graph scores the folded rows exactly until it has inserted them.
+    """
+
+    def __init__(self, store=segment_store):
+        self.store = store
+        self._state = None
+        self._lock = threading.Lock()
+        self._delta_lock = threading.Lock()
+        self._compacting = False
+        self._ivf = None
+        self._ivf_lock = threading.Lock()
+        self._hnsw = None
+        self._hnsw_lock = threading.Lock()
+        self._hnsw_seen = None              # (mtime, nodes) of the saved graph last looked at
+        self._quantized = {}
+        self._quant_lock = threading.Lock()
+        self._shard_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+        self._jobs = set()                  # background builds running
+        self._job_retry_at = {}             # job -> no attempt before this (another process is building)
+        self._jobs_lock = threading.Lock()
+
+    @property
+    def state(self):
+        """The loaded _IndexState (None before the first query or warm start)."""
+        return self._state
+
+    def _signature(self, db, hwm, updated):
+        # Aggregates over match_rows (the only table /match reads), each served
+        # by an index so a check stays cheap at any corpus size. Rows up to the
+        # high-water mark `hwm` belong to the state: their count (the covering
+        # count of the table minus the tail's) and the number / newest of those
+        # updated at or after `updated` (the newest updated_at when the state
+        # was built) detect deletes and updates, which rebuild it. Rows past
+        # `hwm` are the delta's, summarised by the second tuple (rows, max id,
+        # max updated_at) from a primary key range.
+        total = db.execute(text("SELECT COUNT(*) FROM match_rows")).scalar()
+        tail = db.execute(text("SELECT COUNT(*), MAX(id), MAX(updated_at) FROM match_rows WHERE id > :hwm"), {"hwm": hwm}).first()
+        changed = db.execute(text(
+            "SELECT COUNT(*), MAX(updated_at) FROM match_rows WHERE updated_at >= :updated AND id <= :hwm"
+        ), {"updated": updated, "hwm": hwm}).first()
+        # Centroids are recomputed just after the commit that changed the
+        # rows above, so they need their own term
+        centroids = db.execute(text("SELECT COUNT(*), SUM(paper_count) FROM professor_centroids")).first()
+        return ((total - tail[0], hwm, updated, changed[0], str(changed[1]), centroids[0], centroids[1]),
+                (tail[0], tail[1], str(tail[2])))
+
+    def _sync_segments(self, db):
+        # Export the vectors of papers first seen beyond the store's watermark
+        # (a paper's later rows, one per extra professor, share its vector).
+        # The file lock makes concurrent API workers agree on a single copy.
+        with self.store.lock():
+            self.store.discard_stale()
+            watermark = self.store.watermark()
+            while True:
+                rows = db.execute(text("""
+                    SELECT m.id, m.paper_id, m.embedding FROM match_rows m
+                    WHERE m.id > :watermark
+                      AND m.id = (SELECT MIN(f.id) FROM match_rows f WHERE f.paper_id = m.paper_id)
+                    ORDER BY m.id
+                    LIMIT :batch
+                """), {"watermark": watermark, "batch": EXPORT_BATCH}).fetchall()
+                if not rows:
+                    break
+                first = decode_vector(rows[0].embedding)
+                matrix = np.empty((len(rows), first.shape[0]), dtype=np.float32)
+                for i, r in enumerate(rows):
+                    matrix[i] = decode_vector(r.embedding)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                matrix /= norms
+                ids = np.fromiter((r.paper_id for r in rows), dtype=np.int64, count=len(rows))
+                watermark = rows[-1].id
+                path = self.store.append(ids, matrix, watermark)
+                print(f"💾 Exported {len(rows)} embeddings to {path}")
+            merged = self.store.merge_tail(EXPORT_BATCH, SEGMENT_MERGE_AT)
+            if merged:
+                print(f"🧱 Merged {merged[1]} small segments into {merged[0]}")
+            return self.store.open_segments()
+
+    def _shard_signatures(self, db, hwm):
+        # Per-university aggregates: a shard is rebuilt only when its own changed
+        return {r[0]: (r[1], r[2], str(r[3])) for r in db.execute(text(
+            "SELECT university, COUNT(*), MAX(id), MAX(updated_at) FROM match_rows WHERE id <= :hwm GROUP BY university"
+        ), {"hwm": hwm})}
+
+    def _build_shard(self, db, university, signature, lookup_ids, lookup_rows, hwm):
+        papers = {}
+        professors = {}
+        link_papers = []
+        link_profs = []
+        link_years = []
+        link_citations = []
+        where = "university = :university" if university is not None else "university IS NULL"
+        for r in db.execute(text(f"""
+            SELECT paper_id, professor_id, title, year, citations, paper_url, prof_name, university, email
+            FROM match_rows WHERE {where} AND id <= :hwm
+        """), {"university": university, "hwm": hwm}):
+            link_papers.append(r.paper_id)
+            link_profs.append(r.professor_id)
+            link_years.append(r.year if r.year is not None else -1)
+            link_citations.append(r.citations or 0)
+            papers[r.paper_id] = (r.title, r.year, r.paper_url)
+            professors[r.professor_id] = (r.prof_name, r.university, r.email)
+        link_papers = np.asarray(link_papers, dtype=np.int64)
+
+        # Map each (paper, professor) link onto its global row; drop links whose
+        # vector has not been exported yet.
+        if len(lookup_ids):
+            pos = np.searchsorted(lookup_ids, link_papers)
+            pos[pos == len(lookup_ids)] = 0
+            valid = lookup_ids[pos] == link_papers
+        else:
+            pos = np.zeros(len(link_papers), dtype=np.int64)
+            valid = np.zeros(len(link_papers), dtype=bool)
+        pair_rows = lookup_rows[pos[valid]].astype(np.int64) if len(lookup_rows) else np.empty(0, dtype=np.int64)
+        # Keep links grouped by row so per-paper lookups stay cache friendly
+        order = np.argsort(pair_rows, kind="stable")
+        pair_rows = pair_rows[order]
+        pair_prof_ids, years, citations = (np.asarray(values, dtype=np.int64)[valid][order]
+                                           for values in (link_profs, link_years, link_citations))
+        return _Shard(university, signature, pair_rows, pair_prof_ids, years, citations, papers, professors)
+
+    def _load_centroids(self, db):
+        centroid_rows = db.execute(text(
+            "SELECT professor_id, embedding FROM professor_centroids WHERE embedding IS NOT NULL ORDER BY professor_id"
+        )).fetchall()
+        centroid_ids = np.fromiter((r.professor_id for r in centroid_rows), dtype=np.int64, count=len(centroid_rows))
+        if centroid_rows:
+            centroids = np.stack([decode_vector(r.embedding) for r in centroid_rows]).astype(np.float32)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+        else:
+            centroids = np.empty((0, 0), dtype=np.float32)
+        return centroid_ids, centroids
+
+    @staticmethod
+    def _lookup(segments):
+        paper_ids = np.concatenate([np.asarray(s.ids) for s in segments]) if segments else np.empty(0, dtype=np.int64)
+        # Paper id -> global row lookup. If a paper was re-embedded, the row in
+        # the newest segment wins.
+        order = np.argsort(paper_ids, kind="stable")
+        sorted_ids = paper_ids[order]
+        keep = np.ones(len(sorted_ids), dtype=bool)
+        keep[:-1] = sorted_ids[:-1] != sorted_ids[1:]
+        return paper_ids, sorted_ids[keep], order[keep]
+
+    @staticmethod
+    def _extends(old_segments, segments):
+        # (path, count) pairs; True if `segments` starts with `old_segments`
+        old_segments = [(os.path.basename(s[0]), s[1]) for s in old_segments]
+        segments = [(os.path.basename(s.path), s.count) for s in segments]
+        return len(old_segments) <= len(segments) and segments[:len(old_segments)] == old_segments
+
+    def _build(self, db, previous=None):
+        # Shards cover rows up to the current high-water mark; rows that land
+        # mid-build are past it and go to the delta
+        hwm = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM match_rows")).scalar()
+        shard_signatures = self._shard_signatures(db, hwm)
+        updated = max((sig[2] for sig in shard_signatures.values()), default=None)
+        signature = self._signature(db, hwm, updated)[0]
+        segments = self._sync_segments(db)
+        paper_ids, lookup_ids, lookup_rows = self._lookup(segments)
+
+        # Rows are only ever appended (merges keep their order), so the
+        # previous state's rows stay valid while its row -> paper ids are a
+        # prefix of the current ones; its unchanged shards are then reused.
+        reusable = {}
+        n_previous = len(previous.paper_ids) if previous is not None else 0
+        if previous is not None and n_previous <= len(paper_ids) and np.array_equal(previous.paper_ids, paper_ids[:n_previous]):
+            reusable = {sh.university: sh for sh in previous.shards}
+        shards = []
+        rebuilt = 0
+        for university in sorted(shard_signatures, key=lambda u: (u is None, u or "")):
+            shard = reusable.get(university)
+            if shard is None or shard.signature != shard_signatures[university]:
+                shard = self._build_shard(db, university, shard_signatures[university], lookup_ids, lookup_rows, hwm)
+                rebuilt += 1
+            shards.append(shard)
+        if previous is not None:
+            print(f"🧩 Rebuilt {rebuilt} of {len(shards)} university shards")
+
+        if previous is not None and previous.signature[5:] == signature[5:]:
+            centroid_ids, centroids = previous.centroid_ids, previous.centroids
+        else:
+            centroid_ids, centroids = self._load_centroids(db)
+
+        return _IndexState(segments, paper_ids, lookup_ids, lookup_rows, shards, centroid_ids, centroids, signature)
+
+    def ensure_fresh(self, db):
+        # Writers bump the index generation after committing serving rows or
+        # centroids, so while it is unchanged there is nothing to check and a
+        # query costs one primary key read. It is read before the signature:
+        # a commit the signature misses is followed by a bump the next query sees.
+        generation = get_index_generation(db)
+        state = self._state
+        if state is not None and state.generation == generation:
+            return state
+        if state is not None:
+            signature, tail = self._signature(db, state.hwm, state.signature[2])
+            if signature[:5] == state.signature[:5] and tail[0] <= 2 * DELTA_MAX_ROWS:
+                if signature[5:] != state.signature[5:]:
+                    state = self._reload_centroids(db, state, signature)
+                self._poll_delta(db, state, tail)
+                state.generation = generation
+                return state
+        # First load, a change to rows the state already covers (updates,
+        # deletes), or a backlog too large for the delta: rebuild
+        with self._lock:
+            if self._state is state:
+                self._state = self._build(db, state)
+                print(f"🧮 Vector index loaded: {len(self._state.paper_ids)} vectors in {len(self._state.segments)} segments, {len(self._state.pair_rows)} links in {len(self._state.shards)} shards")
+            state = self._state
+        self._poll_delta(db, state, self._signature(db, state.hwm, state.signature[2])[1])
+        state.generation = generation
+        return state
+
+    def _reload_centroids(self, db, state, signature):
+        # Centroids change after every embedded paper; swap them into a copy
+        # of the state instead of rebuilding it
+        with self._lock:
+            if self._state is not state:
+                return self._state
+            centroid_ids, centroids = self._load_centroids(db)
+            fresh = copy.copy(state)
+            fresh.centroid_ids, fresh.centroids, fresh.signature = centroid_ids, centroids, signature
+            self._state = fresh
+            return fresh
+
+    def _poll_delta(self, db, state, tail):
+        """
+        Brings state.delta up to date with the rows past the state's
+        high-water mark: only rows with a new id or a newer updated_at are read.
+        """
+        if state.delta.marker == tail:
+            return state.delta
+        with self._delta_lock:
+            delta = state.delta
+            if delta.marker == tail:
+                return delta
+            records, vectors = dict(delta.records), dict(delta.vectors)
+            seen_id, updated = delta.seen_id, delta.updated
+            if tail[0] < len(records) or seen_id < state.hwm:
+                # Rows were deleted (or first poll): re-read the whole tail
+                records, vectors, seen_id, updated = {}, {}, state.hwm, None
+            where = "id > :seen" if updated is None else "(id > :seen OR updated_at >= :updated)"
+            for r in db.execute(text(f"""
+                SELECT id, paper_id, professor_id, embedding, title, year, citations, paper_url,
+                       prof_name, university, email, updated_at
+                FROM match_rows WHERE id > :hwm AND {where}
+            """), {"hwm": state.hwm, "seen": seen_id, "updated": updated}):
+                records[r.id] = (r.paper_id, r.professor_id, r.title, r.year, r.citations, r.paper_url,
+                                 r.prof_name, r.university, r.email)
+                vector = decode_vector(r.embedding).astype(np.float32)
+                norm = np.linalg.norm(vector)
+                vectors[r.paper_id] = vector / norm if norm else vector
+                seen_id = max(seen_id, r.id)
+                updated = max(updated, str(r.updated_at)) if updated is not None else str(r.updated_at)
+            state.delta = _Delta(tail, records, vectors, seen_id, updated)
+
+        if len(state.delta) >= DELTA_MAX_ROWS and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_background, daemon=True, name="delta-compaction").start()
+        return state.delta
+
+    def compact(self, db):
+        """Folds the delta into the segments and shards (a rebuild at the current high-water mark)."""
+        started = time.time()
+        with self._lock:
+            previous = self._state
+            state = self._build(db, previous)
+            if previous is not None:
+                self._carry_over(previous, state)
+            self._state = state
+        merged = len(previous.delta) if previous is not None else 0
+        print(f"🗜️ Compacted {merged} delta rows into {len(self._state.segments)} segments in {time.time() - started:.1f}s")
+        return self._state
+
+    def _carry_over(self, previous, state):
+        # Prepared ANN structures follow the state across a compaction: only
+        # the folded rows are assigned / encoded here, off the query path
+        if previous.ivf is not None and self._usable_ivf(previous.ivf[0], state):
+            self._attach_ivf(state, previous.ivf[0])
+        for kind in list(previous.quantized):
+            index = self._quantized.get(kind)
+            if self._usable_quantized(index, state):
+                self._attach_quantized(state, kind, index)
+
+    def _compact_background(self):
+        db = SessionLocal()
+        try:
+            self.compact(db)
+        except Exception as e:
+            print(f"⚠️ Delta compaction failed: {e}")
+        finally:
+            db.close()
+            self._compacting = False
+
+    def save_snapshot(self, directory):
+        """
+        Writes the serving state (pair arrays, shard metadata, centroids) into
+        `directory`; vectors are not copied, the snapshot refers to the
+        segments by name. Returns the manifest entry, or None if nothing is loaded.
+        """
+        state = self._state
+        if state is None:
+            return None
+        universities, years, citations = state.pair_attrs
+        np.save(os.path.join(directory, "pair_rows.npy"), state.pair_rows)
+        np.save(os.path.join(directory, "pair_prof_ids.npy"), state.pair_prof_ids)
+        np.save(os.path.join(directory, "pair_years.npy"), years)
+        np.save(os.path.join(directory, "pair_citations.npy"), citations)
+        np.savez(os.path.join(directory, "centroids.npz"), ids=state.centroid_ids, centroids=state.centroids)
+        with open(os.path.join(directory, "shards.json"), "w") as fh:
+            json.dump([{
+                "papers": [[k, *v] for k, v in sh.papers.items()],
+                "professors": [[k, *v] for k, v in sh.professors.items()],
+            } for sh in state.shards], fh)
+        return {
+            "signature": list(state.signature),
+            "segments": [[os.path.basename(s.path), s.count] for s in state.segments],
+            "shards": [{"university": sh.university, "signature": list(sh.signature)} for sh in state.shards],
+            "shard_offsets": state.shard_offsets.tolist(),
+        }
+
+    def load_snapshot(self, directory, manifest):
+        """
+        Installs the state saved by save_snapshot() (arrays memory-mapped) if
+        the segments it refers to are still a prefix of the store's. Rows
+        added since are picked up by the next ensure_fresh(), which rebuilds
+        only the shards whose signature changed. Returns True if installed.
+        """
+        with self.store.lock():
+            segments = self.store.open_segments()
+        if not self._extends(manifest["segments"], segments):
+            return False
+        paper_ids, lookup_ids, lookup_rows = self._lookup(segments)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                  for name in ("pair_rows", "pair_prof_ids", "pair_years", "pair_citations")}
+        with open(os.path.join(directory, "shards.json")) as fh:
+            metadata = json.load(fh)
+        offsets = manifest["shard_offsets"]
+        shards = []
+        for i, (entry, meta) in enumerate(zip(manifest["shards"], metadata)):
+            part = slice(offsets[i], offsets[i + 1])
+            shards.append(_Shard(
+                entry["university"], tuple(entry["signature"]),
+                arrays["pair_rows"][part], arrays["pair_prof_ids"][part],
+                arrays["pair_years"][part], arrays["pair_citations"][part],
+                {r[0]: tuple(r[1:]) for r in meta["papers"]},
+                {r[0]: tuple(r[1:]) for r in meta["professors"]},
+            ))
+        with np.load(os.path.join(directory, "centroids.npz")) as data:
+            centroid_ids, centroids = data["ids"], data["centroids"]
+        state = _IndexState(segments, paper_ids, lookup_ids, lookup_rows, shards, centroid_ids, centroids,
+                            tuple(manifest["signature"]))
+        with self._lock:
+            if self._state is not None:
+                return False
+            self._state = state
+        return True
+
+    def _start_job(self, name, target, *args):
+        """
+        Runs target(*args) on a daemon thread unless job `name` is already
+        running or backing off. A target returns a number of seconds to back
+        off for when another process holds its build lock, else None.
+        """
+        with self._jobs_lock:
+            if name in self._jobs or time.monotonic() < self._job_retry_at.get(name, 0.0):
+                return
+            self._jobs.add(name)
+
+        def run():
+            try:
+                backoff = target(*args)
+                if backoff:
+                    self._job_retry_at[name] = time.monotonic() + backoff
+            except Exception as e:
+                print(f"⚠️ Background {name} failed: {e}")
+            finally:
+                with self._jobs_lock:
+                    self._jobs.discard(name)
+
+        threading.Thread(target=run, daemon=True, name=name).start()
+
+    def _train_ivf(self, state, n_lists=None, iterations=15):
+        started = time.time()
+        ivf = IVFIndex.train(state.vectors, state.paper_ids, n_lists=n_lists, iterations=iterations)
+        ivf.save()
+        print(f"🗂️ IVF index trained: {ivf.n_lists} lists over {len(state.paper_ids)} vectors in {time.time() - started:.1f}s")
+        return ivf
+
+    def train_ivf(self, state, n_lists=None, iterations=15):
+        """Trains and saves the IVF index (under the build lock) and attaches it to `state`."""
+        with ivf_build_lock():
+            ivf = self._train_ivf(state, n_lists, iterations)
+        self._attach_ivf(state, ivf, force=True)
+        return ivf
+
+    @staticmethod
+    def _usable_ivf(ivf, state):
+        # Retrain when the embedding dimension changed or the corpus has
+        # more than doubled since the centroids were fitted
+        return ivf is not None and ivf.centroids.shape[1] == state.dim and len(state.paper_ids) <= 2 * ivf.trained_on
+
+    def _attach_ivf(self, state, ivf, force=False):
+        # Assigns the state's papers the index lacks and installs its lists
+        with self._ivf_lock:
+            if state.ivf is not None and not force:
+                return state.ivf
+            assign = ivf.lookup(state.paper_ids)
+            missing = np.flatnonzero(assign < 0)
+            if len(missing):
+                ivf.add(state.vectors(missing), state.paper_ids[missing])
+                with ivf_build_lock(blocking=False) as acquired:
+                    # A process training a new index saves that instead
+                    if acquired:
+                        ivf.save()
+                assign = ivf.lookup(state.paper_ids)
+            self._ivf = ivf
+            offsets, rows = inverted_lists(assign, ivf.n_lists)
+            state.ivf = (ivf, offsets, rows)
+            return state.ivf
+
+    def _prepare_ivf(self, state):
+        # Background job: attaches this process' or the saved IVF index,
+        # training one first if neither is usable and no other process is
+        ivf = self._ivf if self._usable_ivf(self._ivf, state) else IVFIndex.load()
+        if not self._usable_ivf(ivf, state):
+            with ivf_build_lock(blocking=False) as acquired:
+                if not acquired:
+                    return BUILD_RETRY_SECONDS
+                # Another process may have saved one since
+                ivf = IVFIndex.load()
+                if not self._usable_ivf(ivf, state):
+                    ivf = self._train_ivf(state)
+        self._attach_ivf(state, ivf)
+
+    def _ensure_ivf(self, state):
+        """
+        state.ivf if it is ready, else None after starting its preparation
+        in the background: training (minutes on a large corpus) never runs
+        inside a query, which is served exactly meanwhile.
+        """
+        if state.ivf is None:
+            self._start_job("ivf-prepare", self._prepare_ivf, state)
+        return state.ivf
+
+    @staticmethod
+    def _hnsw_mtime():
+        try:
+            return os.stat(HNSW_PATH).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_hnsw(self, state, latest=False):
+        """
+        This process' copy of the graph. A newer save (by the process holding
+        the build lock) is loaded once it can serve `state` (see _ensure_hnsw),
+        or whenever latest=True: partial checkpoints of a build still in
+        progress elsewhere could not be served anyway.
+        """
+        with self._hnsw_lock:
+            hnsw = self._hnsw if self._hnsw is not None and self._hnsw.dim == state.dim else None
+            mtime = self._hnsw_mtime()
+            if not (latest or self._hnsw_seen is None or self._hnsw_seen[0] != mtime):
+                mtime = None
+        if mtime is not None:
+            # Only the saved ids are read to decide; the graph itself is
+            # loaded outside the lock
+            saved = HNSWIndex.saved_count()
+            current = hnsw.count if hnsw is not None else -1
+            if saved is not None and saved > current and (latest or saved >= len(state.lookup_ids) - HNSW_EXACT_MAX):
+                loaded = HNSWIndex.load()
+                if loaded is not None and loaded.dim == state.dim:
+                    hnsw = loaded
+            with self._hnsw_lock:
+                self._hnsw_seen = (mtime, saved)
+        with self._hnsw_lock:
+            current = self._hnsw if self._hnsw is not None and self._hnsw.dim == state.dim else None
+            if current is None or (hnsw is not None and hnsw.count > current.count):
+                self._hnsw = hnsw if hnsw is not None else HNSWIndex(state.dim)
+            return self._hnsw
+
+    def _save_hnsw(self, hnsw):
+        hnsw.save()
+        with self._hnsw_lock:
+            # Our own save: nothing for this process to reload
+            self._hnsw_seen = (self._hnsw_mtime(), hnsw.count)
+
+    def _hnsw_missing(self, state, hnsw):
+        # Rows of the state's papers the graph lacks (None while it lacks more
+        # than HNSW_EXACT_MAX: too far behind to serve), cached per graph size
+        cached = state.hnsw
+        count = hnsw.count
+        if cached is not None and cached[0] is hnsw and cached[1] == count:
+            return cached[2]
+        missing = None
+        if count >= len(state.lookup_ids) - HNSW_EXACT_MAX:
+            missing = state.lookup_rows[~np.isin(state.lookup_ids, hnsw.ids[:count])]
+            if len(missing) > HNSW_EXACT_MAX:
+                missing = None
+        state.hnsw = (hnsw, count, missing)
+        return missing
+
+    def sync_hnsw(self, state, blocking=True):
+        """
+        Inserts every paper of `state` that the graph does not contain yet,
+        saving it every HNSW_CHECKPOINT_SECONDS and at the end, so a restart
+        resumes the build. Runs under the cross-process build lock; with
+        blocking=False, returns None at once if another process holds it.
+        """
+        with hnsw_build_lock(blocking) as acquired:
+            if not acquired:
+                return None
+            hnsw = self._load_hnsw(state, latest=True)
+            missing = state.lookup_rows[~np.isin(state.lookup_ids, hnsw.indexed_ids())]
+            started = saved = time.time()
+            for start in range(0, len(missing), 1024):
+                rows = missing[start:start + 1024]
+                for vector, paper_id in zip(state.vectors(rows), state.paper_ids[rows]):
+                    hnsw.insert(vector, paper_id)
+                if time.time() - saved >= HNSW_CHECKPOINT_SECONDS and start + len(rows) < len(missing):
+                    self._save_hnsw(hnsw)
+                    saved = time.time()
+                    print(f"🕸️ HNSW graph checkpoint: {start + len(rows)} of {len(missing)} vectors inserted ({hnsw.count} total)")
+            if len(missing):
+                self._save_hnsw(hnsw)
+                print(f"🕸️ HNSW graph: inserted {len(missing)} vectors in {time.time() - started:.1f}s ({hnsw.count} total)")
+            return hnsw
+
+    def _sync_hnsw_job(self, state):
+        if self.sync_hnsw(state, blocking=False) is None:
+            # Another process is building the graph; its saves are picked up
+            return HNSW_CHECKPOINT_SECONDS
+
+    def _ensure_hnsw(self, state):
+        """
+        (graph, rows of `state` it lacks) if the graph can serve the state,
+        else None: queries then fall back to IVF / exact instead of searching
+        a partial graph. The lacking rows (at most HNSW_EXACT_MAX, e.g. just
+        compacted from the delta) are scored exactly next to the graph while a
+        background thread (in the process holding the build lock) inserts them.
+        """
+        hnsw = self._load_hnsw(state)
+        missing = self._hnsw_missing(state, hnsw)
+        if missing is None or len(missing):
+            self._start_job("hnsw-sync", self._sync_hnsw_job, state)
+        return (hnsw, missing) if missing is not None else None
+
+    @staticmethod
+    def _usable_quantized(index, state):
+        return index is not None and index.quantizer.dim == state.dim
+
+    @staticmethod
+    def _encode_missing(state, index):
+        # Encodes papers of the state that entered the index since the codes were saved
+        missing = np.flatnonzero(index.missing(state.lookup_ids))
+        for start in range(0, len(missing), 65536):
+            chunk = missing[start:start + 65536]
+            index.add(state.vectors(state.lookup_rows[chunk]), state.lookup_ids[chunk])
+        return len(missing)
+
+    def _train_quantized(self, state, kind, retrain=False):
+        # Under the build lock: fits the quantizer on a sample unless one is
+        # saved, encodes every paper and saves the codes
+        index = None if retrain else QuantizedIndex.load(kind)
+        if not self._usable_quantized(index, state):
+            rng = np.random.default_rng(0)
+            n = len(state.lookup_rows)
+            sample_rows = state.lookup_rows[np.sort(rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False))]
+            started = time.time()
+            index = QuantizedIndex.train(kind, state.vectors(sample_rows))
+            print(f"🗜️ {kind} quantizer trained on {len(sample_rows)} vectors in {time.time() - started:.1f}s")
+        started = time.time()
+        encoded = self._encode_missing(state, index)
+        if encoded:
+            print(f"🗜️ {kind}: encoded {encoded} papers in {time.time() - started:.1f}s")
+        index.save()
+        return index
+
+    def train_quantized(self, state, kind, retrain=False):
+        """Trains / encodes and saves the `kind` codes (under the build lock) and attaches them to `state`."""
+        with quant_build_lock(kind):
+            index = self._train_quantized(state, kind, retrain)
+        self._attach_quantized(state, kind, index, force=True)
+        return index
+
+    def _attach_quantized(self, state, kind, index, force=False):
+        # Encodes the state's papers the index lacks and installs their codes
+        with self._quant_lock:
+            if kind in state.quantized and not force:
+                return state.quantized[kind]
+            if self._encode_missing(state, index):
+                with quant_build_lock(kind, blocking=False) as acquired:
+                    # A process training new codebooks saves those instead
+                    if acquired:
+                        index.save()
+            self._quantized[kind] = index
+            state.quantized[kind] = (index.quantizer, index.quantizer.layout(index.codes_for(state.lookup_ids)))
+            return state.quantized[kind]
+
+    def _prepare_quantized(self, state, kind):
+        # Background job: attaches this process' or the saved codes, training
+        # and encoding first if there are none and no other process is
+        index = self._quantized.get(kind)
+        if not self._usable_quantized(index, state):
+            index = QuantizedIndex.load(kind)
+        if not self._usable_quantized(index, state):
+            with quant_build_lock(kind, blocking=False) as acquired:
+                if not acquired:
+                    return BUILD_RETRY_SECONDS
+                index = self._train_quantized(state, kind)
+        self._attach_quantized(state, kind, index)
+
+    def _ensure_quantized(self, state, kind):
+        """
+        (quantizer, codes) of `kind` if they are ready, else None after
+        starting their preparation in the background (queries are answered
+        exactly meanwhile).
+        """
+        if kind not in state.quantized:
+            self._start_job(f"{kind}-prepare", self._prepare_quantized, state, kind)
+        return state.quantized.get(kind)
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        q = np.asarray(vector, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return None
+        return q / q_norm
+
+    def ready_strategies(self):
+        """
+        Approximate strategies that can answer right away, without training a
+        quantizer / IVF or building the HNSW graph first.
+        """
+        state = self._state
+        if state is None:
+            return set()
+        ready = {kind for kind in state.quantized}
+        hnsw = self._hnsw
+        if hnsw is not None and hnsw.dim == state.dim:
+            if self._hnsw_missing(state, hnsw) is not None:
+                ready.add("hnsw")
+        if state.ivf is not None:
+            ready.add("ivf")
+        if len(state.centroid_ids) and state.centroids.shape[1] == state.dim:
+            ready.add("centroid")
+        return ready
+
+    def resolve_strategy(self, state, strategy):
+        if strategy == "auto":
+            return "hnsw" if len(state.lookup_ids) >= HNSW_THRESHOLD else "exact"
+        return strategy
+
+    def _prof_pairs(self, state):
+        # Pair indices grouped by professor (CSR), for scoring chosen professors
+        if state.prof_pairs is None:
+            order = np.argsort(state.pair_prof_ids, kind="stable")
+            prof_keys, starts = np.unique(state.pair_prof_ids[order], return_index=True)
+            offsets = np.append(starts, len(order))
+            state.prof_pairs = (prof_keys, offsets, order)
+        return state.prof_pairs
+
+    def _pair_filter(self, state):
+        if state.pair_filter is None:
+            state.pair_filter = PairFilter(*state.pair_attrs)
+        return state.pair_filter
+
+    def _row_scores(self, state, q, k, strategy, n_probes, ef_search, n_rerank=None, n_professors=None, stats=None):
+        # Scores for every global row; rows the strategy did not visit are -inf.
+        # stats["rows"] counts the vectors compared with the query.
+        stats = stats if stats is not None else {}
+        if strategy == "centroid" and len(state.centroid_ids) and state.centroids.shape[1] == state.dim:
+            # Stage 1: rank professors by centroid. Stage 2: score only the
+            # papers of the best ones (enough for k pairs at 3 papers each).
+            # Without centroids (not backfilled yet) this falls through to exact.
+            prof_sims = state.centroids @ q
+            n = min(len(prof_sims), max(int(n_professors or CENTROID_PROFESSORS), -(-k // 3)))
+            top = np.argpartition(-prof_sims, n - 1)[:n] if n < len(prof_sims) else np.arange(len(prof_sims))
+            prof_keys, offsets, order = self._prof_pairs(state)
+            chosen = state.centroid_ids[top]
+            pos = np.searchsorted(prof_keys, chosen)
+            pos = pos[(pos < len(prof_keys)) & (prof_keys[np.minimum(pos, len(prof_keys) - 1)] == chosen)]
+            pairs = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in pos]) if len(pos) else np.empty(0, dtype=np.int64)
+            rows = np.unique(state.pair_rows[pairs])
+            scores = np.full(len(state.paper_ids), -np.inf, dtype=np.float32)
+            scores[rows] = state.vectors(rows) @ q
+            stats["rows"] = len(rows)
+            return scores
+        if strategy in ("int8", "pq") and self._ensure_quantized(state, strategy) is not None:
+            # Compressed first pass over every paper, exact float32 re-rank of
+            # the best candidates (only their pages of the segments are read)
+            quantizer, codes = state.quantized[strategy]
+            approx = quantizer.scan(codes, q)
+            positions, exact = rerank(q, approx, k, lambda p: state.vectors(state.lookup_rows[p]),
+                                      n_rerank or RERANK_CANDIDATES)
+            scores = np.full(len(state.paper_ids), -np.inf, dtype=np.float32)
+            scores[state.lookup_rows[positions]] = exact
+            stats["rows"] = len(state.lookup_ids)
+            return scores
+        if strategy == "hnsw":
+            served = self._ensure_hnsw(state)
+            if served is not None:
+                hnsw, missing = served
+                visited = {}
+                ids, sims = hnsw.search(q, k, ef_search or HNSW_EF_SEARCH, stats=visited)
+                # Papers since dropped from the corpus may linger in the graph
+                pos = np.minimum(np.searchsorted(state.lookup_ids, ids), max(len(state.lookup_ids) - 1, 0))
+                known = state.lookup_ids[pos] == ids
+                scores = np.full(len(state.paper_ids), -np.inf, dtype=np.float32)
+                scores[state.lookup_rows[pos[known]]] = sims[known]
+                # Papers not inserted yet are scored exactly
+                if len(missing):
+                    scores[missing] = state.vectors(missing) @ q
+                stats["rows"] = min(visited.get("visited", 0) + len(missing), len(state.paper_ids))
+                return scores
+            strategy = "exact"
+        if strategy == "ivf" and self._ensure_ivf(state) is not None:
+            ivf, offsets, rows = state.ivf
+            lists = ivf.probe(q, n_probes or IVF_PROBES)
+            candidates, candidate_scores = search_lists(q, lists, offsets, rows, state.vectors)
+            scores = np.full(len(state.paper_ids), -np.inf, dtype=np.float32)
+            scores[candidates] = candidate_scores
+            stats["rows"] = len(candidates)
+            return scores
+        stats["rows"] = len(state.paper_ids)
+        return state.score(q)
+
+    def search(self, db, vector, limit, min_score, strategy="exact", n_probes=None, ef_search=None, n_rerank=None,
+               n_professors=None, filters=None, stats=None):
+        """
+        Returns up to `limit` (paper, professor) matches with cosine similarity
+        >= min_score, best first, in the flat shape used by /match grouping.
+
+        strategy="exact" scans every vector; "ivf" only scans the `n_probes`
+        inverted lists closest to the query; "hnsw" walks the graph with
+        `ef_search` candidates; "int8" / "pq" scan compressed codes and re-rank
+        `n_rerank` candidates exactly; "centroid" ranks professors by their
+        centroid and scores only the papers of the best `n_professors`;
+        "auto" picks hnsw above HNSW_THRESHOLD papers. HNSW only answers once
+        its graph lacks at most HNSW_EXACT_MAX papers (scored exactly beside
+        it); until then IVF (if built) or exact does. IVF and the int8 / PQ
+        codes are prepared in the background on first use (or by their CLIs)
+        and answered exactly until then.
+
+        `filters` (see prefilter.normalize_filters) restrict the pairs before
+        scoring: when few rows survive, only those are scored, exactly. Rows
+        in the delta are always scored exactly and merged into the results.
+
+        If a `stats` dict is given, it receives the strategy that ran and the
+        fraction of the corpus' vectors compared with the query ("scanned").
+        """
+        state = self.ensure_fresh(db)
+        q = self._unit(vector)
+        if int(limit) <= 0 or q is None:
+            return []
+        stats = stats if stats is not None else {}
+        matches = self._search_state(state, q, int(limit), min_score, strategy, n_probes, ef_search, n_rerank,
+                                     n_professors, filters, stats)
+        matches = self._merge(matches, self._delta_matches(state, q, int(limit), min_score, filters), int(limit))
+        delta_rows = len(state.delta.vectors)
+        total = len(state.paper_ids) + delta_rows
+        stats["scanned"] = (stats.pop("rows", 0) + delta_rows) / total if total else 0.0
+        return matches
+
+    def _search_state(self, state, q, limit, min_score, strategy, n_probes, ef_search, n_rerank, n_professors,
+                      filters, stats):
+        # search() over the state's shards, without the delta
+        strategy = self.resolve_strategy(state, strategy)
+        if strategy == "hnsw" and self._ensure_hnsw(state) is None:
+            # Graph not built / behind the state: never answer from a partial
+            # graph, serve IVF if it is ready, else exact
+            strategy = "ivf" if state.ivf is not None else "exact"
+        elif ((strategy == "ivf" and self._ensure_ivf(state) is None)
+              or (strategy in ("int8", "pq") and self._ensure_quantized(state, strategy) is None)):
+            # Still training / encoding in the background
+            strategy = "exact"
+        stats["strategy"] = strategy
+        n_pairs = len(state.pair_rows)
+        k = min(limit, n_pairs)
+        if k <= 0:
+            return []
+
+        pairs = self._pair_filter(state).select(filters) if filters else None
+        if pairs is None and strategy == "exact" and len(state.shards) > 1:
+            stats["rows"] = len(state.paper_ids)
+            return self._search_shards(state, q, k, min_score)
+        if pairs is None:
+            pair_scores = self._row_scores(state, q, k, strategy, n_probes, ef_search, n_rerank, n_professors,
+                                           stats)[state.pair_rows]
+            return self._top_matches(state, pair_scores, k, min_score)
+
+        k = min(k, len(pairs))
+        if k <= 0:
+            return []
+        pair_rows = state.pair_rows[pairs]
+        rows = np.unique(pair_rows)
+        if len(rows) <= FILTER_SCAN_FRACTION * len(state.paper_ids):
+            pair_scores = state.score_rows(rows, q)[np.searchsorted(rows, pair_rows)]
+            stats["strategy"], stats["rows"] = "exact", len(rows)
+        else:
+            # Most of the corpus passes: run the strategy as usual, asking for
+            # proportionally more candidates since some fall outside the filter
+            k_scan = min(n_pairs, -(-k * n_pairs // len(pairs)))
+            pair_scores = self._row_scores(state, q, k_scan, strategy, n_probes, ef_search, n_rerank, n_professors,
+                                           stats)[pair_rows]
+        return self._top_matches(state, pair_scores, k, min_score, pairs)
+
+    def search_many(self, db, vectors, limit, min_score):
+        """
+        Exact search for a batch of query vectors: each block of queries is
+        scored against every segment with one matrix-matrix product. Returns
+        one flat match list per input vector ([] for missing / zero vectors).
+        """
+        state = self.ensure_fresh(db)
+        results = [[] for _ in vectors]
+        n_pairs = len(state.pair_rows)
+        k = min(int(limit), n_pairs)
+        units = [(i, q) for i, q in ((i, self._unit(v)) for i, v in enumerate(vectors)) if q is not None]
+        if int(limit) <= 0 or not units:
+            return results
+        if len(state.delta):
+            for i, q in units:
+                results[i] = self._delta_matches(state, q, int(limit), min_score)
+        if k <= 0:
+            return results
+
+        # Bound the (rows x queries) score block to ~128 MiB of float32
+        n_rows = max(len(state.paper_ids), 1)
+        block = max(1, _SCORE_BLOCK // n_rows)
+        for start in range(0, len(units), block):
+            chunk = units[start:start + block]
+            Q = np.stack([q for _, q in chunk], axis=1)      # (dim, b)
+            scores = np.concatenate([s.matrix @ Q for s in state.segments], axis=0)
+            pair_scores = scores[state.pair_rows]             # (n_pairs, b)
+            for j, (i, _) in enumerate(chunk):
+                matches = self._top_matches(state, np.ascontiguousarray(pair_scores[:, j]), k, min_score)
+                results[i] = self._merge(matches, results[i], int(limit))
+        return results
+
+    def _delta_matches(self, state, q, k, min_score, filters=None):
+        # Exact top-k over the delta's rows, best first
+        delta = state.delta
+        if not len(delta) or delta.matrix.shape[1] != len(q):
+            return []
+        rows = delta.select(filters)
+        scores = delta.scores(q)[rows]
+        keep = np.flatnonzero(scores >= min_score)
+        if len(keep) > k:
+            keep = keep[np.argpartition(-scores[keep], k - 1)[:k]]
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        matches = []
+        for row, score in zip(rows[keep].tolist(), scores[keep].tolist()):
+            paper_id, prof_id, title, year, _, url, name, university, email = delta.items[row]
+            matches.append({
+                "paper_id": paper_id,
+                "prof_id": prof_id,
+                "prof_name": name,
+                "university": university,
+                "email": email,
+                "title": title,
+                "year": year,
+                "score": float(score),
+                "url": url
+            })
+        return matches
+
+    @staticmethod
+    def _merge(matches, delta_matches, limit):
+        # Both lists are best first and hold disjoint pairs
+        if not delta_matches:
+            return matches
+        return list(itertools.islice(heapq.merge(matches, delta_matches, key=lambda m: -m["score"]), limit))
+
+    def _shard_groups(self, state):
+        # Shards balanced by pair count into at most SHARD_WORKERS tasks
+        # (largest first onto the lightest task)
+        if state.shard_groups is None:
+            sizes = [len(sh.pair_rows) for sh in state.shards]
+            n_tasks = max(1, min(SHARD_WORKERS, len(state.shards), sum(sizes) // _MIN_ROWS_PER_TASK))
+            groups = [[] for _ in range(n_tasks)]
+            loads = [(0, i) for i in range(n_tasks)]
+            for index in sorted(range(len(state.shards)), key=lambda i: -sizes[i]):
+                load, task = heapq.heappop(loads)
+                groups[task].append(index)
+                heapq.heappush(loads, (load + sizes[index], task))
+            state.shard_groups = [g for g in groups if g]
+        return state.shard_groups
+
+    def _score_blocks(self, state, q):
+        """
+        Cosine similarity of a unit query against every global row, fanned
+        out over contiguous row blocks: each task multiplies slices of the
+        memory-mapped segments in place, so no vector is copied.
+        """
+        n_rows = len(state.paper_ids)
+        n_tasks = max(1, min(SHARD_WORKERS, n_rows // _MIN_ROWS_PER_TASK))
+        if n_tasks == 1:
+            return state.score(q)
+        bounds = np.linspace(0, n_rows, n_tasks + 1).astype(np.int64).tolist()
+        return np.concatenate(list(self._shard_pool.map(
+            lambda i: state.score_span(bounds[i], bounds[i + 1], q), range(n_tasks))))
+
+    def _score_shards(self, state, shard_indices, row_scores, k, min_score):
+        # Local top-k of some shards, best first, as (score, global pair) lists
+        scores, pairs = [], []
+        for index in shard_indices:
+            shard = state.shards[index]
+            if not len(shard.pair_rows):
+                continue
+            pair_scores = row_scores[shard.pair_rows]
+            keep = np.flatnonzero(pair_scores >= min_score)
+            if len(keep) > k:
+                keep = keep[np.argpartition(-pair_scores[keep], k - 1)[:k]]
+            scores.append(pair_scores[keep])
+            pairs.append(keep + state.shard_offsets[index])
+        if not scores:
+            return []
+        scores, pairs = np.concatenate(scores), np.concatenate(pairs)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return list(zip(scores[top].tolist(), pairs[top].tolist()))
+
+    def _search_shards(self, state, q, k, min_score):
+        """
+        Exact search split by university shard. Every row is scored once, in
+        contiguous blocks on the pool (numpy releases the GIL); the scores are
+        then split by shard, each task keeping a local top-k of its shards'
+        pairs, and the sorted partial lists are heap-merged into the global
+        top-k. Shards interleave in the segments, so scoring them one by one
+        would gather (copy) their rows out of the mapped files on every query.
+        """
+        row_scores = self._score_blocks(state, q)
+        groups = self._shard_groups(state)
+        if len(groups) == 1:
+            partials = [self._score_shards(state, groups[0], row_scores, k, min_score)]
+        else:
+            partials = list(self._shard_pool.map(
+                lambda group: self._score_shards(state, group, row_scores, k, min_score), groups))
+        top = list(itertools.islice(heapq.merge(*partials, key=lambda item: -item[0]), k))
+        return self._matches(state, [pair for _, pair in top], [score for score, _ in top])
+
+    def _top_matches(self, state, pair_scores, k, min_score, pairs=None):
+        # pair_scores are aligned to `pairs` (pair indices) when given
+        n_pairs = len(pair_scores)
+        if k < n_pairs:
+            top = np.argpartition(-pair_scores, k - 1)[:k]
+        else:
+            top = np.arange(n_pairs)
+        top = top[np.argsort(-pair_scores[top], kind="stable")]
+        top = top[pair_scores[top] >= min_score]
+
+        scores = pair_scores[top]
+        if pairs is not None:
+            top = pairs[top]
+        return self._matches(state, top, scores)
+
+    def _matches(self, state, pairs, scores):
+        matches = []
+        for i, score in zip(pairs, scores):
+            (title, year, url), (name, university, email) = state.metadata(i)
+            matches.append({
+                "paper_id": int(state.paper_ids[state.pair_rows[i]]),
+                "prof_id": int(state.pair_prof_ids[i]),
+                "prof_name": name,
+                "university": university,
+                "email": email,
+                "title": title,
+                "year": year,
+                "score": float(score),
+                "url": url
+            })
+        return matches
+
+# Global index instance
+vector_index = VectorIndex()
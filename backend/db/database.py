@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -9,10 +10,14 @@ load_dotenv()
 # Check if we should use SQLite (Standalone) or Postgres (Production)
 IS_STANDALONE = os.getenv("POSTGRES_HOST") is None or os.getenv("POSTGRES_HOST") == ""
 
+# Local state (SQLite DB, vector segments, caches) lives under <repo>/data
+# unless SRME_DATA_DIR points elsewhere (e.g. a throwaway directory for tests)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.getenv("SRME_DATA_DIR") or os.path.join(BASE_DIR, "data")
+
 if IS_STANDALONE:
     print("🚀 SRME: Standalone Mode (SQLite/Threading) Active")
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    DB_PATH = os.path.join(BASE_DIR, "data", "srme.db")
+    DB_PATH = os.path.join(DATA_DIR, "srme.db")
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
     
@@ -29,6 +34,10 @@ if IS_STANDALONE:
         cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("PRAGMA synchronous=NORMAL")
         cursor.close()
+
+    # Async engine for the /match and /ingest request path (aiosqlite)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}")
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
 else:
     POSTGRES_USER = os.getenv("POSTGRES_USER", "srme_user")
     POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "srme_password")
@@ -41,9 +50,16 @@ else:
         pool_size=20,
         max_overflow=10
     )
+    # Async engine for the /match and /ingest request path (asyncpg)
+    async_engine = create_async_engine(
+        f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+        pool_size=20,
+        max_overflow=10
+    )
 import threading
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 db_lock = threading.Lock() # Global lock for SQLite standalone mode
 
 Base = declarative_base()
@@ -54,3 +70,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
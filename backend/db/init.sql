@@ -41,13 +41,82 @@ CREATE TABLE IF NOT EXISTS paper_authors (
     PRIMARY KEY (paper_id, author_id)
 );
 
--- Embeddings Table (pgvector)
+-- Embeddings Table (pgvector); one row per paper and embedding model version
 CREATE TABLE IF NOT EXISTS paper_embeddings (
     id SERIAL PRIMARY KEY,
-    paper_id INTEGER REFERENCES papers(id) ON DELETE CASCADE UNIQUE,
+    paper_id INTEGER REFERENCES papers(id) ON DELETE CASCADE,
     embedding vector(768),
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    model_version TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT unique_paper_embedding_version UNIQUE(paper_id, model_version)
 );
+CREATE INDEX IF NOT EXISTS ix_paper_embeddings_paper_id ON paper_embeddings (paper_id);
 
 -- Index for fast vector similarity search
 CREATE INDEX ON paper_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+
+-- Denormalized (paper, professor) rows read by /match (maintained by ingestion)
+CREATE TABLE IF NOT EXISTS match_rows (
+    id SERIAL PRIMARY KEY,
+    paper_id INTEGER NOT NULL REFERENCES papers(id) ON DELETE CASCADE,
+    professor_id INTEGER NOT NULL REFERENCES professors(id) ON DELETE CASCADE,
+    embedding vector(768),
+    title TEXT NOT NULL,
+    year INTEGER,
+    citations INTEGER DEFAULT 0,
+    paper_url TEXT,
+    prof_name TEXT NOT NULL,
+    university TEXT,
+    email TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT unique_match_row UNIQUE(paper_id, professor_id)
+);
+CREATE INDEX IF NOT EXISTS ix_match_rows_paper_id ON match_rows (paper_id);
+CREATE INDEX IF NOT EXISTS ix_match_rows_professor_id ON match_rows (professor_id);
+CREATE INDEX IF NOT EXISTS ix_match_rows_updated_at ON match_rows (updated_at);
+-- /match pre-filters (university, year range, citation floor)
+CREATE INDEX IF NOT EXISTS ix_match_rows_university ON match_rows (university);
+CREATE INDEX IF NOT EXISTS ix_match_rows_year ON match_rows (year);
+CREATE INDEX IF NOT EXISTS ix_match_rows_citations ON match_rows (citations);
+-- HNSW needs no training data, so it can be created on the empty table
+CREATE INDEX IF NOT EXISTS ix_match_rows_hnsw ON match_rows USING hnsw (embedding vector_cosine_ops);
+
+-- Per-professor citation-weighted centroids (first stage of strategy "centroid")
+CREATE TABLE IF NOT EXISTS professor_centroids (
+    professor_id INTEGER PRIMARY KEY REFERENCES professors(id) ON DELETE CASCADE,
+    embedding vector(768),
+    weight DOUBLE PRECISION NOT NULL DEFAULT 0,
+    paper_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- BM25 inverted index over paper titles + abstracts (mode=hybrid)
+CREATE TABLE IF NOT EXISTS lexical_terms (
+    id SERIAL PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    df INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS lexical_postings (
+    term_id INTEGER REFERENCES lexical_terms(id) ON DELETE CASCADE,
+    paper_id INTEGER REFERENCES papers(id) ON DELETE CASCADE,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term_id, paper_id)
+);
+CREATE TABLE IF NOT EXISTS lexical_docs (
+    paper_id INTEGER PRIMARY KEY REFERENCES papers(id) ON DELETE CASCADE,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lexical_stats (
+    id INTEGER PRIMARY KEY,
+    n_docs INTEGER NOT NULL DEFAULT 0,
+    total_length BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO lexical_stats (id, n_docs, total_length) VALUES (1, 0, 0) ON CONFLICT (id) DO NOTHING;
+
+-- Index generation counter (bumped by ingestion, used to invalidate match caches)
+CREATE TABLE IF NOT EXISTS index_state (
+    id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO index_state (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,177 @@
+"""
+Online migration of standalone (SQLite) embeddings from JSON text to packed
+float32 BLOBs, in paper_embeddings and in the match_rows copies. Also adds
+the model_version column to a paper_embeddings table that predates it, and
+the embedding counters to an ingestion_jobs table that predates them (any
+mode; the API and Celery workers do both on startup too).
+
+Safe to run while the API and workers are live: rows are converted in small
+batches, each committed under db_lock. The run is resumable because converted
+rows no longer match `typeof(embedding) = 'text'`, so an interrupted migration
+simply picks up the remaining rows next time.
+
+    python -m backend.db.migrate_embeddings [--batch-size 500] [--vacuum]
+"""
+import argparse
+import json
+import time
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from backend.db.database import SessionLocal, IS_STANDALONE, engine, db_lock
+from backend.models.models import PaperEmbedding
+from backend.models.vector import encode_vector
+
+
+EMBEDDING_TABLES = ("paper_embeddings", "match_rows")
+# Every embedding stored before versions were recorded came from this model
+LEGACY_MODEL_VERSION = "text-embedding-3-small/768"
+# Per-job embedding counters added to ingestion_jobs after it first shipped
+JOB_COUNTER_COLUMNS = ("papers_embedded", "embedding_cache_hits", "embedding_calls")
+
+
+def _has_model_version():
+    return "model_version" in {c["name"] for c in inspect(engine).get_columns("paper_embeddings")}
+
+
+def add_model_versions(legacy_version=LEGACY_MODEL_VERSION):
+    """
+    Upgrades a paper_embeddings table created before embeddings carried a
+    model_version: adds the column, labels existing rows `legacy_version` and
+    moves uniqueness from paper_id to (paper_id, model_version). A no-op once
+    done. SQLite cannot drop a constraint, so there the table is rebuilt.
+    """
+    if _has_model_version():
+        return False
+    print(f"🔁 Adding model_version to paper_embeddings (existing rows: {legacy_version})")
+    try:
+        if IS_STANDALONE:
+            with db_lock, engine.begin() as conn:
+                conn.execute(text("ALTER TABLE paper_embeddings RENAME TO paper_embeddings_legacy"))
+                # Explicit indexes keep their names through the rename
+                for (name,) in conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'paper_embeddings_legacy' AND sql IS NOT NULL"
+                )).fetchall():
+                    conn.execute(text(f'DROP INDEX "{name}"'))
+                PaperEmbedding.__table__.create(conn)
+                conn.execute(text("""
+                    INSERT INTO paper_embeddings (id, paper_id, embedding, model_version, created_at)
+                    SELECT id, paper_id, embedding, :version, created_at FROM paper_embeddings_legacy
+                """), {"version": legacy_version})
+                conn.execute(text("DROP TABLE paper_embeddings_legacy"))
+        else:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE paper_embeddings ADD COLUMN model_version TEXT"))
+                conn.execute(text("UPDATE paper_embeddings SET model_version = :version"), {"version": legacy_version})
+                conn.execute(text("ALTER TABLE paper_embeddings ALTER COLUMN model_version SET NOT NULL"))
+                conn.execute(text("ALTER TABLE paper_embeddings DROP CONSTRAINT IF EXISTS paper_embeddings_paper_id_key"))
+                conn.execute(text("""
+                    ALTER TABLE paper_embeddings
+                    ADD CONSTRAINT unique_paper_embedding_version UNIQUE (paper_id, model_version)
+                """))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_paper_embeddings_paper_id ON paper_embeddings (paper_id)"))
+    except SQLAlchemyError:
+        # Another API worker upgraded the table first
+        if not _has_model_version():
+            raise
+    return True
+
+
+def _missing_job_counters():
+    if not inspect(engine).has_table("ingestion_jobs"):
+        return []
+    existing = {c["name"] for c in inspect(engine).get_columns("ingestion_jobs")}
+    return [name for name in JOB_COUNTER_COLUMNS if name not in existing]
+
+
+def add_job_counters():
+    """
+    Adds the embedding counter columns (JOB_COUNTER_COLUMNS) to an
+    ingestion_jobs table created before they existed; create_all() never
+    alters an existing table. A no-op once done.
+    """
+    missing = _missing_job_counters()
+    if not missing:
+        return False
+    print(f"🔁 Adding {', '.join(missing)} to ingestion_jobs")
+    try:
+        if IS_STANDALONE:
+            with db_lock, engine.begin() as conn:
+                for name in missing:
+                    conn.execute(text(f"ALTER TABLE ingestion_jobs ADD COLUMN {name} INTEGER DEFAULT 0"))
+        else:
+            with engine.begin() as conn:
+                for name in missing:
+                    conn.execute(text(f"ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS {name} INTEGER DEFAULT 0"))
+    except SQLAlchemyError:
+        # Another process upgraded the table first
+        if _missing_job_counters():
+            raise
+    return True
+
+
+def migrate_json_embeddings(batch_size=500, table="paper_embeddings"):
+    db = SessionLocal()
+    converted = 0
+    skipped = 0
+    last_id = 0
+    started = time.time()
+    try:
+        remaining = db.execute(text(
+            f"SELECT COUNT(*) FROM {table} WHERE typeof(embedding) = 'text'"
+        )).scalar()
+        print(f"🔁 {remaining} JSON embeddings to convert in {table}")
+
+        while True:
+            rows = db.execute(text(f"""
+                SELECT id, embedding FROM {table}
+                WHERE typeof(embedding) = 'text' AND id > :last_id
+                ORDER BY id
+                LIMIT :batch
+            """), {"last_id": last_id, "batch": batch_size}).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row in rows:
+                try:
+                    updates.append({"id": row.id, "blob": encode_vector(row.embedding)})
+                except (ValueError, TypeError, json.JSONDecodeError) as e:
+                    skipped += 1
+                    print(f"⚠️ Skipping embedding {row.id}: {e}")
+            last_id = rows[-1].id
+
+            if updates:
+                with db_lock:
+                    db.execute(text(f"UPDATE {table} SET embedding = :blob WHERE id = :id"), updates)
+                    db.commit()
+            converted += len(updates)
+            print(f"   converted {converted}/{remaining} (last id {last_id})")
+    finally:
+        db.close()
+
+    print(f"✅ Converted {converted} embeddings in {time.time() - started:.1f}s ({skipped} skipped)")
+    return converted
+
+
+def vacuum():
+    # Reclaims the pages freed by the (roughly 3x smaller) BLOBs
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+    print("🧹 Database vacuumed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON embeddings to float32 BLOBs")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards to shrink the file")
+    args = parser.parse_args()
+
+    add_model_versions()
+    add_job_counters()
+    if not IS_STANDALONE:
+        print("Postgres mode: embeddings are stored natively by pgvector, nothing to migrate.")
+    else:
+        for table in EMBEDDING_TABLES:
+            migrate_json_embeddings(batch_size=args.batch_size, table=table)
+        if args.vacuum:
+            vacuum()
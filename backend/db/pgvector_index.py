@@ -0,0 +1,108 @@
+"""
+(Re)builds the pgvector index on match_rows, the table /match reads (Postgres mode only).
+
+init.sql creates an HNSW index, which needs no training. An ivfflat index
+trains its lists on the rows present at build time, so build it (or rebuild
+it after large ingests) once the corpus is loaded.
+
+    python -m backend.db.pgvector_index --kind hnsw [--m 16] [--ef-construction 64] [--drop-others]
+    python -m backend.db.pgvector_index --kind ivfflat [--lists N]
+
+Filtered /match queries (university, year range) can be served by partial
+indexes over just the matching rows, which stay small and are scanned
+without post-filtering:
+
+    python -m backend.db.pgvector_index --kind hnsw --university "TU Munich" --min-year 2020
+
+builds one index per university (WHERE university = ...) and one WHERE
+year >= 2020 (used by any query with year_min >= 2020).
+
+Indexes are built CONCURRENTLY, so /match keeps serving during the build.
+"""
+import argparse
+import math
+import re
+import time
+from sqlalchemy import text
+from backend.db.database import IS_STANDALONE, engine
+
+INDEX_NAMES = {
+    "ivfflat": "ix_match_rows_ivfflat",
+    "hnsw": "ix_match_rows_hnsw",
+}
+
+
+def vector_indexes(conn):
+    """Names and access methods of the vector indexes on match_rows."""
+    return conn.execute(text("""
+        SELECT i.relname AS name, am.amname AS method, x.indpred IS NOT NULL AS partial
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE t.relname = 'match_rows' AND am.amname IN ('ivfflat', 'hnsw')
+    """)).fetchall()
+
+
+def partial_indexes(kind, universities=(), min_year=None):
+    """(name, predicate) of the partial indexes for the given filters."""
+    indexes = []
+    for university in universities:
+        slug = re.sub(r"[^a-z0-9]+", "_", university.lower()).strip("_")[:40]
+        indexes.append((f"{INDEX_NAMES[kind]}_u_{slug}", "university = '{}'".format(university.replace("'", "''"))))
+    if min_year is not None:
+        indexes.append((f"{INDEX_NAMES[kind]}_y{int(min_year)}", f"year >= {int(min_year)}"))
+    return indexes
+
+
+def build_index(kind, lists=None, m=16, ef_construction=64, drop_others=False, where=None, name=None):
+    name = name or INDEX_NAMES[kind]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM match_rows WHERE {where or 'true'}")).scalar()
+        if kind == "ivfflat":
+            # pgvector guidance: rows / 1000 lists up to 1M rows, sqrt(rows) above
+            lists = lists or max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+            params = f"lists = {int(lists)}"
+        else:
+            params = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+
+        started = time.time()
+        print(f"🏗️ Building {kind} index {name} over {rows} match rows ({params}){f' WHERE {where}' if where else ''}")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY {name} ON match_rows "
+            f"USING {kind} (embedding vector_cosine_ops) WITH ({params})"
+            + (f" WHERE {where}" if where else "")
+        ))
+        print(f"✅ Built {name} in {time.time() - started:.1f}s")
+
+        if drop_others:
+            # Partial indexes are kept: they serve filtered queries
+            for index in vector_indexes(conn):
+                if index.name != name and not index.partial:
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                    print(f"🗑️ Dropped {index.method} index {index.name}")
+        conn.execute(text("ANALYZE match_rows"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pgvector index used by /match")
+    parser.add_argument("--kind", choices=sorted(INDEX_NAMES), default="hnsw")
+    parser.add_argument("--lists", type=int, default=None, help="ivfflat lists (default rows/1000 or sqrt(rows))")
+    parser.add_argument("--m", type=int, default=16, help="hnsw max links per node")
+    parser.add_argument("--ef-construction", type=int, default=64, help="hnsw build candidate list size")
+    parser.add_argument("--drop-others", action="store_true", help="drop other full vector indexes on match_rows")
+    parser.add_argument("--university", action="append", default=[],
+                        help="build a partial index for this university instead (repeatable)")
+    parser.add_argument("--min-year", type=int, default=None, help="build a partial index for year >= MIN_YEAR instead")
+    args = parser.parse_args()
+
+    if IS_STANDALONE:
+        print("Standalone mode: vectors are searched by the in-process index, nothing to build.")
+    elif args.university or args.min_year is not None:
+        for index_name, predicate in partial_indexes(args.kind, args.university, args.min_year):
+            build_index(args.kind, lists=args.lists, m=args.m, ef_construction=args.ef_construction,
+                        where=predicate, name=index_name)
+    else:
+        build_index(args.kind, lists=args.lists, m=args.m, ef_construction=args.ef_construction,
+                    drop_others=args.drop_others)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Table, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, Text, DateTime, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import os
@@ -10,8 +10,8 @@ IS_STANDALONE = os.getenv("POSTGRES_HOST") is None or os.getenv("POSTGRES_HOST")
 if not IS_STANDALONE:
     from pgvector.sqlalchemy import Vector
 else:
-    # Polyfill or fallback for SQLite
-    from sqlalchemy import Text as Vector
+    # SQLite fallback: packed float32 BLOBs (see backend/models/vector.py)
+    from backend.models.vector import Float32Vector as Vector
 
 from backend.db.database import Base
 
@@ -63,17 +63,81 @@ class Paper(Base):
     __table_args__ = (UniqueConstraint('title', 'year', name='unique_paper_title_year'),)
 
     authors = relationship("Author", secondary=paper_authors, back_populates="papers")
-    embedding = relationship("PaperEmbedding", back_populates="paper", uselist=False, cascade="all, delete-orphan")
+    embeddings = relationship("PaperEmbedding", back_populates="paper", cascade="all, delete-orphan")
 
 class PaperEmbedding(Base):
     __tablename__ = "paper_embeddings"
 
     id = Column(Integer, primary_key=True, index=True)
-    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), unique=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), index=True)
     embedding = Column(Vector(768))
+    # NLPEngine.model_version that produced the vector; a paper has one row per
+    # version, so a re-embedding backfill runs alongside the served vectors
+    model_version = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    paper = relationship("Paper", back_populates="embedding")
+    __table_args__ = (UniqueConstraint('paper_id', 'model_version', name='unique_paper_embedding_version'),)
+
+    paper = relationship("Paper", back_populates="embeddings")
+
+class MatchRow(Base):
+    __tablename__ = "match_rows"
+
+    # Denormalized (paper, professor) serving row: everything /match returns,
+    # so queries never join. Kept in sync by ingestion (backend/core/match_rows.py).
+    id = Column(Integer, primary_key=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False, index=True)
+    professor_id = Column(Integer, ForeignKey("professors.id", ondelete="CASCADE"), nullable=False, index=True)
+    embedding = Column(Vector(768))
+    title = Column(Text, nullable=False)
+    year = Column(Integer, index=True)
+    citations = Column(Integer, default=0, index=True)
+    paper_url = Column(Text)
+    prof_name = Column(String, nullable=False)
+    university = Column(String, index=True)
+    email = Column(String)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (UniqueConstraint('paper_id', 'professor_id', name='unique_match_row'),)
+
+class ProfessorCentroid(Base):
+    __tablename__ = "professor_centroids"
+
+    professor_id = Column(Integer, ForeignKey("professors.id", ondelete="CASCADE"), primary_key=True)
+    # Citation-weighted sum of the professor's unit paper vectors. Cosine
+    # similarity ignores scale, so the sum ranks exactly like the centroid.
+    embedding = Column(Vector(768))
+    weight = Column(Float, nullable=False, default=0.0)
+    paper_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+class LexicalTerm(Base):
+    __tablename__ = "lexical_terms"
+
+    id = Column(Integer, primary_key=True)
+    term = Column(String, nullable=False, unique=True, index=True)
+    df = Column(Integer, nullable=False, default=0)  # papers containing the term
+
+class LexicalPosting(Base):
+    __tablename__ = "lexical_postings"
+
+    # Inverted index over title + abstract: (term, paper) -> term frequency
+    term_id = Column(Integer, ForeignKey("lexical_terms.id", ondelete="CASCADE"), primary_key=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True)
+    tf = Column(Integer, nullable=False)
+
+class LexicalDoc(Base):
+    __tablename__ = "lexical_docs"
+
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True)
+    length = Column(Integer, nullable=False)  # tokens, for BM25 length normalisation
+
+class LexicalStats(Base):
+    __tablename__ = "lexical_stats"
+
+    id = Column(Integer, primary_key=True)  # single row, id = 1
+    n_docs = Column(Integer, nullable=False, default=0)
+    total_length = Column(Integer, nullable=False, default=0)
 
 class IngestionJob(Base):
     __tablename__ = "ingestion_jobs"
@@ -83,5 +147,21 @@ class IngestionJob(Base):
     total_faculty = Column(Integer, default=0)
     processed_faculty = Column(Integer, default=0)
     status = Column(String, default="queued") # queued, processing, completed, failed
+    # Embedding throughput: papers embedded for this job, how many of them the
+    # document cache served, and the embeddings API calls the rest took
+    papers_embedded = Column(Integer, default=0)
+    embedding_cache_hits = Column(Integer, default=0)
+    embedding_calls = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+class IndexState(Base):
+    __tablename__ = "index_state"
+
+    id = Column(Integer, primary_key=True)  # single row, id = 1
+    # Bumped whenever ingestion changes what /match can return (new vectors,
+    # authorship links or professor fields); result caches are only valid for
+    # one generation, and the standalone index only re-checks match_rows
+    # when it moves.
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
@@ -0,0 +1,52 @@
+import json
+import numpy as np
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+# Packed little-endian float32, independent of host byte order
+FLOAT32_LE = np.dtype("<f4")
+
+
+def encode_vector(value, dim=None):
+    """Packs a vector (list, ndarray or legacy JSON string) into float32 bytes."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        value = json.loads(value)
+    arr = np.asarray(value, dtype=FLOAT32_LE).ravel()
+    if dim is not None and arr.shape[0] != dim:
+        raise ValueError(f"Expected a {dim}-dim vector, got {arr.shape[0]}")
+    return arr.tobytes()
+
+
+def decode_vector(value):
+    """
+    Decodes a stored vector. BLOBs are viewed zero-copy (read-only) with
+    np.frombuffer; legacy JSON text rows are still accepted during migration.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    return np.frombuffer(value, dtype=FLOAT32_LE)
+
+
+class Float32Vector(TypeDecorator):
+    """
+    SQLite stand-in for pgvector's Vector: stores packed float32 bytes in a BLOB
+    (4 bytes per dimension instead of ~12 for JSON text).
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dim = dim
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_vector(value, self.dim)
+
+    def process_result_value(self, value, dialect):
+        return decode_vector(value)
@@ -0,0 +1,232 @@
+"""
+Resumable (re-)embedding of papers: ones ingestion missed, or every paper
+for a new embedding model (EMBEDDING_PROVIDER, model or dimensions changed).
+
+    python -m backend.workers.embedding_backfill [--provider local] [--batch 256] [--workers 4]
+
+Papers without an embedding of the target model version are read in paper id
+order (keyset pagination), embedded in parallel batches and bulk-inserted.
+Progress is checkpointed under data/backfill/, so an interrupted run resumes
+where it stopped. Embeddings of other versions stay in place and the API
+keeps serving the configured one, so a new model is backfilled alongside it.
+To switch the served model afterwards:
+
+    1. stop ingestion and set the new EMBEDDING_PROVIDER
+    2. python -m backend.workers.embedding_backfill --activate [--prune]
+       (catches up papers ingested since, then rebuilds the serving rows,
+       centroids and, in standalone mode, the derived vector files)
+    3. restart the API and workers
+"""
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+from collections import deque
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from backend.db.database import DATA_DIR, SessionLocal, IS_STANDALONE, db_lock
+from backend.db.migrate_embeddings import add_model_versions
+from backend.core.nlp_core import NLPEngine, nlp_engine
+from backend.core.embedding_providers import PROVIDERS, get_provider
+from backend.core.match_rows import backfill as backfill_match_rows
+from backend.core.centroids import update_professor_centroids
+from backend.core.result_cache import bump_index_generation
+from backend.core.segments import segment_store
+from backend.core.ivf_index import IVF_PATH
+from backend.core.hnsw_index import HNSW_PATH
+from backend.core.quantization import QUANT_DIR
+from backend.core.snapshot import SNAPSHOT_DIR
+from backend.workers.tasks import embed_papers
+
+BACKFILL_DIR = os.path.join(DATA_DIR, "backfill")
+BACKFILL_BATCH = int(os.getenv("BACKFILL_BATCH", "256"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+
+_MISSING = """
+    FROM papers p
+    WHERE p.id > :after AND NOT EXISTS (
+        SELECT 1 FROM paper_embeddings e WHERE e.paper_id = p.id AND e.model_version = :version
+    )
+"""
+
+
+def _checkpoint_path(version):
+    return os.path.join(BACKFILL_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", version) + ".json")
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(checkpoint, fh)
+    os.replace(tmp_path, path)
+
+
+def _embed_batch(paper_ids, engine):
+    db = SessionLocal()
+    try:
+        return embed_papers(db, paper_ids, engine=engine)
+    finally:
+        db.close()
+
+
+def backfill(engine=nlp_engine, batch_size=BACKFILL_BATCH, workers=BACKFILL_WORKERS, restart=False):
+    """
+    Embeds every paper lacking an `engine.model_version` embedding. Batches
+    run on `workers` threads (sharing the engine's rate limits); the
+    checkpoint only advances past batches that, with all before them, are
+    committed. Returns the number of papers embedded by this run.
+    """
+    version = engine.model_version
+    path = _checkpoint_path(version)
+    checkpoint = {} if restart else _load_checkpoint(path)
+    after = checkpoint.get("after", 0)
+    embedded_total = checkpoint.get("embedded", 0)
+
+    db = SessionLocal()
+    try:
+        total = db.execute(text(f"SELECT COUNT(*) {_MISSING}"), {"after": after, "version": version}).scalar()
+        resume = f" (resuming after paper {after})" if after else ""
+        print(f"🔁 {total} papers to embed with {version}{resume}")
+
+        started = time.time()
+        done = embedded = 0
+        in_flight = deque()   # (last paper id, future), in paper id order
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+
+        def settle_oldest():
+            nonlocal after, done, embedded, embedded_total
+            last_id, future = in_flight.popleft()
+            n_papers, n_embedded = future.result()
+            after = last_id
+            done += n_papers
+            embedded += n_embedded
+            embedded_total += n_embedded
+            _save_checkpoint(path, {"model_version": version, "after": after, "embedded": embedded_total,
+                                    "updated_at": time.time()})
+            rate = done / max(time.time() - started, 1e-9)
+            eta = timedelta(seconds=int(max(total - done, 0) / rate)) if rate else "?"
+            print(f"   {done}/{total} papers (last id {after}): {rate:.1f} papers/s, ETA {eta}")
+
+        try:
+            cursor = after
+            while True:
+                ids = [r[0] for r in db.execute(text(f"SELECT p.id {_MISSING} ORDER BY p.id LIMIT :limit"),
+                                                 {"after": cursor, "version": version, "limit": batch_size})]
+                if not ids:
+                    break
+                cursor = ids[-1]
+                in_flight.append((cursor, pool.submit(lambda ids=ids: (len(ids), _embed_batch(ids, engine)))))
+                # Bounded read-ahead; settle finished batches in order
+                while in_flight and (len(in_flight) >= 2 * workers or in_flight[0][1].done()):
+                    settle_oldest()
+            while in_flight:
+                settle_oldest()
+        except Exception as e:
+            print(f"❌ Backfill stopped: {e}. Re-run to resume after paper {after}.")
+            raise
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        db.close()
+
+    elapsed = time.time() - started
+    print(f"✅ Embedded {embedded} papers with {version} in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f} papers/s)")
+    return embedded
+
+
+def _reset_vector_files():
+    # Segments, ANN structures, quantized codes and snapshots all hold copies
+    # of the old vectors (segments are never re-exported below their
+    # watermark), so they are dropped and rebuilt from match_rows
+    with segment_store.lock():
+        segment_store.clear()
+    for path in (os.path.dirname(IVF_PATH), os.path.dirname(HNSW_PATH), QUANT_DIR, SNAPSHOT_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+    print("🗑️ Removed segments, IVF / HNSW / quantized indexes and snapshots; the API rebuilds them on start")
+
+
+def activate(prune=False, batch_size=BACKFILL_BATCH, workers=BACKFILL_WORKERS):
+    """
+    Makes the configured engine's model version the served one: catches up
+    its backfill, rewrites match_rows and centroids from its vectors, and
+    drops serving rows of papers that have none. `prune` deletes the
+    embeddings of every other version.
+    """
+    version = nlp_engine.model_version
+    backfill(nlp_engine, batch_size, workers)
+
+    backfill_match_rows()
+    db = SessionLocal()
+    try:
+        stale = text("""
+            DELETE FROM match_rows WHERE NOT EXISTS (
+                SELECT 1 FROM paper_embeddings e
+                WHERE e.paper_id = match_rows.paper_id AND e.model_version = :version
+            )
+        """)
+        if IS_STANDALONE:
+            with db_lock:
+                removed = db.execute(stale, {"version": version}).rowcount
+                db.commit()
+        else:
+            removed = db.execute(stale, {"version": version}).rowcount
+            db.commit()
+        if removed:
+            print(f"🗑️ Removed {removed} match rows of papers without a {version} embedding")
+
+        prof_ids = [r[0] for r in db.execute(text("SELECT id FROM professors"))]
+        update_professor_centroids(db, prof_ids)
+        print(f"✅ Recomputed centroids for {len(prof_ids)} professors")
+
+        if prune:
+            old = text("DELETE FROM paper_embeddings WHERE model_version != :version")
+            if IS_STANDALONE:
+                with db_lock:
+                    pruned = db.execute(old, {"version": version}).rowcount
+                    db.commit()
+            else:
+                pruned = db.execute(old, {"version": version}).rowcount
+                db.commit()
+            print(f"🧹 Pruned {pruned} embeddings of other model versions")
+        bump_index_generation(db)
+    finally:
+        db.close()
+
+    if IS_STANDALONE:
+        _reset_vector_files()
+    else:
+        print("ℹ️ Rebuild the pgvector index for the new vectors: python -m backend.db.pgvector_index --kind hnsw --drop-others")
+    print(f"✅ {version} is now served; restart the API and workers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumable paper embedding backfill / re-embedding")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default=None,
+                        help="embed with this provider instead of EMBEDDING_PROVIDER (not served until activated)")
+    parser.add_argument("--batch", type=int, default=BACKFILL_BATCH, help="papers per batch")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="batches embedded in parallel")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and rescan from the first paper")
+    parser.add_argument("--activate", action="store_true", help="serve the configured EMBEDDING_PROVIDER's vectors")
+    parser.add_argument("--prune", action="store_true", help="with --activate, delete embeddings of other versions")
+    args = parser.parse_args()
+
+    add_model_versions()
+    if args.activate:
+        if args.provider:
+            parser.error("--activate serves the configured EMBEDDING_PROVIDER; set it instead of --provider")
+        activate(args.prune, args.batch, args.workers)
+    else:
+        engine = NLPEngine(get_provider(args.provider)) if args.provider else nlp_engine
+        backfill(engine, args.batch, args.workers, args.restart)
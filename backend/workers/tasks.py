@@ -1,17 +1,24 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 import os
-import json
 import time
 import random
 import functools
 from datetime import datetime
-from sqlalchemy import update
+from sqlalchemy import update, text, bindparam
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from backend.db.database import SessionLocal, IS_STANDALONE, db_lock
+from backend.db.migrate_embeddings import add_model_versions, add_job_counters
 from backend.models.models import Professor, Author, Paper, PaperEmbedding, paper_authors, IngestionJob
 from backend.core.scraper import scraper
 from backend.core.semantic_scholar import ss_client
 from backend.core.nlp_core import nlp_engine
+from backend.core.result_cache import bump_index_generation
+from backend.core.centroids import update_professor_centroids, professors_of_papers
+from backend.core.match_rows import upsert_match_rows, refresh_professor_rows
+from backend.core.lexical import index_paper
+from backend.core.embedding_batcher import EmbeddingBatcher, ingest_metrics
+from backend.core.embedding_cache import document_cache, cache_key
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,6 +27,12 @@ load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL")
 if REDIS_URL:
     celery_app = Celery("srme_tasks", broker=REDIS_URL)
+
+    @worker_init.connect
+    def _upgrade_schema(**kwargs):
+        # Workers may start before the API has upgraded an existing database
+        add_model_versions()
+        add_job_counters()
 else:
     # Threaded fallback for standalone (no Redis)
     from concurrent.futures import ThreadPoolExecutor
@@ -105,7 +118,9 @@ def get_or_create_professor(db, name, university, profile_url, email=None):
             prof.email = email
             updated = True
         if updated:
+            refresh_professor_rows(db, prof)
             db.commit()
+            bump_index_generation(db)
             db.refresh(prof)
         return prof
 
@@ -130,6 +145,112 @@ def get_or_create_professor(db, name, university, profile_url, email=None):
 def _ss_search_author(name, affiliation, limit=50):
     return ss_client.get_author_papers(name, affiliation, limit=limit)
 
+@retry_with_backoff(retries=3, base=1.0)
+def _batch_encode(texts, engine=nlp_engine):
+    vectors = engine.batch_encode(texts)
+    if len(vectors) != len(texts):
+        raise ValueError(f"Embeddings API returned {len(vectors)} vectors for {len(texts)} texts")
+    return vectors
+
+def _as_floats(vector):
+    # Plain python floats: Float32Vector packs them (SQLite), pgvector takes the list
+    return [float(x) for x in (vector.tolist() if hasattr(vector, 'tolist') else vector)]
+
+# Another worker may embed the same paper concurrently; the first insert wins
+_INSERT_EMBEDDINGS = text("""
+    INSERT INTO paper_embeddings (paper_id, embedding, model_version) VALUES (:paper_id, :embedding, :model_version)
+    ON CONFLICT (paper_id, model_version) DO NOTHING
+""").bindparams(bindparam("embedding", type_=PaperEmbedding.embedding.type))
+
+def _record_job_embeddings(db, job_stats):
+    # SQL-level increments, like _update_job_progress
+    for job_id, (papers, hits, calls) in job_stats.items():
+        stmt = (
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(papers_embedded=IngestionJob.papers_embedded + papers,
+                    embedding_cache_hits=IngestionJob.embedding_cache_hits + hits,
+                    embedding_calls=IngestionJob.embedding_calls + calls)
+        )
+        if IS_STANDALONE:
+            with db_lock:
+                db.execute(stmt)
+                db.commit()
+        else:
+            db.execute(stmt)
+            db.commit()
+
+def _encode_cached(texts, engine=nlp_engine):
+    """
+    Vectors for texts, looking them up in the document cache first; only the
+    distinct texts it misses go to the embeddings API (in one call). Returns
+    (vectors, hit flags, whether the API was called).
+    """
+    keys = [cache_key(t, engine.model_name, engine.dimensions) for t in texts]
+    found = document_cache.get_many(keys)
+    hits = [k in found for k in keys]
+    missing = {k: t for k, t in zip(keys, texts) if k not in found}
+    if missing:
+        fresh = _batch_encode(list(missing.values()), engine)
+        document_cache.put_many(zip(missing, fresh))
+        found.update(zip(missing, fresh))
+    return [found[k] for k in keys], hits, bool(missing)
+
+def embed_papers(db, paper_ids, job_ids=None, engine=nlp_engine):
+    """
+    Embeds the given papers (those not embedded yet) with at most one
+    embeddings call, skipping texts already in the document cache, writes
+    them with one bulk insert plus their serving rows, then refreshes the
+    affected centroids. `job_ids` (aligned to paper_ids) attributes the work
+    to ingestion jobs. Returns the number of papers embedded.
+
+    With another `engine` (a re-embedding backfill) only its model version's
+    embeddings are written; serving rows keep the configured engine's.
+    """
+    started = time.time()
+    existing = {r[0] for r in db.query(PaperEmbedding.paper_id).filter(
+        PaperEmbedding.paper_id.in_(paper_ids), PaperEmbedding.model_version == engine.model_version)}
+    papers = [p for p in db.query(Paper).filter(Paper.id.in_(paper_ids)).all()
+              if p.id not in existing and (p.title or p.abstract)]
+    if not papers:
+        return 0
+
+    vectors, hits, called = _encode_cached([f"{p.title}. {p.abstract or ''}" for p in papers], engine)
+    encoded = time.time()
+    rows = [{"paper_id": p.id, "embedding": _as_floats(v), "model_version": engine.model_version}
+            for p, v in zip(papers, vectors)]
+    ids = [p.id for p in papers]
+    served = engine.model_version == nlp_engine.model_version
+    # Serving rows commit atomically with the embeddings
+    if IS_STANDALONE:
+        with db_lock:
+            db.execute(_INSERT_EMBEDDINGS, rows)
+            if served:
+                upsert_match_rows(db, paper_ids=ids)
+            db.commit()
+    else:
+        db.execute(_INSERT_EMBEDDINGS, rows)
+        if served:
+            upsert_match_rows(db, paper_ids=ids)
+        db.commit()
+    if served:
+        update_professor_centroids(db, professors_of_papers(db, ids))
+        bump_index_generation(db)
+    ingest_metrics.record(len(papers), int(called), encoded - started, time.time() - encoded, cache_hits=sum(hits))
+
+    if job_ids:
+        job_of = dict(zip(paper_ids, job_ids))
+        job_stats = {}
+        for paper_id, hit in zip(ids, hits):
+            if job_of.get(paper_id):
+                stats = job_stats.setdefault(job_of[paper_id], [0, 0, 0])
+                stats[0] += 1
+                stats[1] += hit
+                # A job is charged the call if any of its papers needed it
+                stats[2] = stats[2] or int(not hit)
+        _record_job_embeddings(db, job_stats)
+    return len(papers)
+
 # --- Tasks ---
 
 @celery_app.task
@@ -291,6 +412,9 @@ def fetch_papers_for_professor(prof_id, job_id=None):
                         paper_url=p.get('url')
                     )
                     db.add(paper_obj)
+                    db.flush()
+                    # Inverted-index postings commit with the paper itself
+                    index_paper(db, paper_obj.id, paper_obj.title, paper_obj.abstract)
                     db.commit()
                     created += 1
                 except IntegrityError:
@@ -299,6 +423,7 @@ def fetch_papers_for_professor(prof_id, job_id=None):
                     pass
         
         # Now ensure mapping author <-> paper exists
+        linked = 0
         for p in papers_to_ingest:
             # resolve current paper id (again safe)
             ss_id = p.get('paperId')
@@ -321,9 +446,19 @@ def fetch_papers_for_professor(prof_id, job_id=None):
             ).first()
             if not exists:
                 db.execute(paper_authors.insert().values(paper_id=paper.id, author_id=author.id))
+                linked += 1
+        if linked:
+            # Serving rows for newly linked, already-embedded papers commit with the links
+            upsert_match_rows(db, prof_id=prof.id)
         db.commit()
+        if linked:
+            # Links to already-embedded papers change /match results immediately
+            update_professor_centroids(db, [prof.id])
+            bump_index_generation(db)
 
-        # Kick off embeddings
+        # Queue embeddings: the batcher groups them with other professors'
+        # papers into one embeddings call per batch
+        paper_ids = []
         for p in papers_to_ingest:
             paper = None
             ss_id = p.get('paperId')
@@ -334,7 +469,8 @@ def fetch_papers_for_professor(prof_id, job_id=None):
             if not paper:
                 paper = db.query(Paper).filter(Paper.title == title, Paper.year == year).first()
             if paper:
-                generate_paper_embedding.delay(paper.id)
+                paper_ids.append(paper.id)
+        embedding_batcher.submit(paper_ids, job_id)
 
         if job_id:
             _update_job_progress(db, job_id)
@@ -349,36 +485,27 @@ def fetch_papers_for_professor(prof_id, job_id=None):
         db.close()
 
 @celery_app.task
-def generate_paper_embedding(paper_id):
+def generate_paper_embeddings(items):
+    """Embeds one batch of [paper_id, job_id] pairs collected by the embedding batcher."""
     db = SessionLocal()
     try:
-        paper = db.query(Paper).filter(Paper.id == paper_id).first()
-        if not paper or not (paper.title or paper.abstract):
-            return
-
-        # Idempotent: skip if embedding exists
-        existing_emb = db.query(PaperEmbedding).filter(PaperEmbedding.paper_id == paper_id).first()
-        if existing_emb:
-            return
-
-        text = f"{paper.title}. {paper.abstract or ''}"
-        vector = nlp_engine.encode(text)  # assume numpy array or list
-        
-        # convert to plain list of python floats for standardizing storage
-        try:
-            vector_list = [float(x) for x in vector.tolist()] if hasattr(vector, 'tolist') else [float(x) for x in vector]
-        except Exception:
-            vector_list = [float(x) for x in vector]
-
-        # If IS_STANDALONE, we mock the Vector type with Text/JSON
-        # If Postgres, pgvector handles List[float] automatically
-        db_vector = json.dumps(vector_list) if IS_STANDALONE else vector_list
+        embed_papers(db, [paper_id for paper_id, _ in items], [job_id for _, job_id in items])
+    finally:
+        db.close()
 
-        embedding = PaperEmbedding(
-            paper_id=paper.id,
-            embedding=db_vector
-        )
-        db.add(embedding)
-        db.commit()
+@celery_app.task
+def generate_paper_embedding(paper_id):
+    db = SessionLocal()
+    try:
+        embed_papers(db, [paper_id])
     finally:
         db.close()
+
+# Global batcher instance: batches become generate_paper_embeddings tasks
+embedding_batcher = EmbeddingBatcher(lambda items: generate_paper_embeddings.delay(items))
+if REDIS_URL:
+    # Pool processes are recycled without running atexit: hand over what is
+    # still pending when one shuts down
+    @worker_process_shutdown.connect
+    def _drain_embeddings(**kwargs):
+        embedding_batcher.drain()
@@ -52,16 +52,20 @@ searchBtn.addEventListener('click', async () => {
             body: JSON.stringify({
                 profile_text: text,
                 limit: parseInt(limitRange.value),
-                min_score: parseFloat((scoreThreshold.value / 100).toFixed(2))
+                min_score: parseFloat((scoreThreshold.value / 100).toFixed(2)),
+                stream: true
             })
         });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
-        const data = await response.json();
+        // NDJSON: one professor per line, rendered as soon as it arrives
+        const count = await streamResults(response, match => {
+            searchLoading.style.display = 'none';
+            resultsContainer.insertAdjacentHTML('beforeend', renderMatch(match));
+        });
 
-        if (!data || data.length === 0) {
+        if (count === 0) {
             resultsContainer.innerHTML = '<div class="card" style="text-align: center;">No matches found. Try ingesting more data.</div>';
-        } else {
-            renderResults(data);
         }
     } catch (error) {
         console.error("Search failed:", error);
@@ -71,8 +75,33 @@ searchBtn.addEventListener('click', async () => {
     }
 });
 
-function renderResults(matches) {
-    resultsContainer.innerHTML = matches.map(match => `
+async function streamResults(response, onMatch) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let count = 0;
+
+    const flush = (lines) => {
+        lines.filter(line => line.trim()).forEach(line => {
+            onMatch(JSON.parse(line));
+            count++;
+        });
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        flush(lines);
+    }
+    flush([buffer + decoder.decode()]);
+    return count;
+}
+
+function renderMatch(match) {
+    return `
         <div class="match-item">
             <div class="match-header">
                 <div class="prof-info">
@@ -97,7 +126,7 @@ function renderResults(matches) {
                 Full LLM justification is being computed in the background.
             </div>
         </div>
-    `).join('');
+    `;
 }
 
 // Ingest Logic
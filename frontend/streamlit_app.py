@@ -1,4 +1,5 @@
 import streamlit as st
+import json
 import requests
 import pandas as pd
 
@@ -49,23 +50,30 @@ with tab1:
                     response = requests.post(f"{API_URL}/match", json={
                         "profile_text": profile_text,
                         "limit": limit,
-                        "min_score": min_score
-                    })
-                    data = response.json()
-                    
-                    if not data:
-                        st.warning("No matches found above threshold. Try ingesting more data!")
-                    else:
-                        st.success(f"Found {len(data)} potential collaborators.")
-                        
-                        for prof in data:
-                            with st.expander(f"👤 {prof['professor']} ({prof['university']}) — Match Score: {prof['max_score']}"):
-                                st.markdown("### Top Matching Papers")
-                                for p in prof['papers']:
-                                    st.markdown(f"- **{p['title']}** ({p['year']})")
-                                    st.caption(f"Score: {round(p['score'], 4)}")
-                                
-                                st.info("Match Explanation: Generating via LLM reasoning engine...")
+                        "min_score": min_score,
+                        "stream": True
+                    }, stream=True)
+                    response.raise_for_status()
+
+                    # NDJSON: render each professor as soon as its line arrives
+                    summary = st.empty()
+                    found = 0
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        prof = json.loads(line)
+                        found += 1
+                        summary.success(f"Found {found} potential collaborators.")
+                        with st.expander(f"👤 {prof['professor']} ({prof['university']}) — Match Score: {prof['max_score']}"):
+                            st.markdown("### Top Matching Papers")
+                            for p in prof['papers']:
+                                st.markdown(f"- **{p['title']}** ({p['year']})")
+                                st.caption(f"Score: {round(p['score'], 4)}")
+
+                            st.info("Match Explanation: Generating via LLM reasoning engine...")
+
+                    if not found:
+                        summary.warning("No matches found above threshold. Try ingesting more data!")
                 except Exception as e:
                     st.error(f"Error connecting to API: {e}")
         else:
@@ -0,0 +1,144 @@
+"""
+Shared fixtures: every test runs in standalone mode (SQLite) against a
+throwaway data directory, with the offline local embedding provider.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import itertools
+
+DATA_DIR = tempfile.mkdtemp(prefix="srme-tests-")
+os.environ["SRME_DATA_DIR"] = DATA_DIR
+os.environ["POSTGRES_HOST"] = ""
+os.environ["EMBEDDING_PROVIDER"] = "local"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+from backend.db.database import engine, SessionLocal
+from backend.models.models import Base, Professor, Author, Paper, PaperEmbedding, paper_authors
+from backend.core.nlp_core import nlp_engine
+from backend.core.match_rows import upsert_match_rows
+from backend.core.result_cache import bump_index_generation
+from backend.core.vector_index import VectorIndex
+
+DIM = 768
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _remove_data_dir():
+    yield
+    engine.dispose()
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on an empty schema; segments, snapshots etc. from earlier tests are removed."""
+    engine.dispose()
+    Base.metadata.drop_all(bind=engine)
+    for name in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def index():
+    return VectorIndex()
+
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    """
+    TestClient for the API (no lifespan: no warm start or snapshots) with a
+    fresh vector index, result cache, query cache and latency model.
+    """
+    from fastapi.testclient import TestClient
+    from backend.api import main
+    from backend.core import nlp_core
+    from backend.core.result_cache import MatchResultCache
+    from backend.core.embedding_cache import EmbeddingCache
+    from backend.core.deadline import LatencyModel
+
+    query_cache = EmbeddingCache(str(tmp_path / "queries.db"), 64, 3600, 1000)
+    monkeypatch.setattr(nlp_core, "query_cache", query_cache)
+    monkeypatch.setattr(main, "query_cache", query_cache)
+    monkeypatch.setattr(main, "vector_index", VectorIndex())
+    monkeypatch.setattr(main, "result_cache", MatchResultCache())
+    monkeypatch.setattr(main, "latency_model", LatencyModel())
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def add_professor(db):
+    """
+    add_professor(university, vectors, years=None, citations=None) adds a
+    professor with one embedded paper per vector, writes their serving rows
+    and bumps the index generation, as ingestion does. Returns (prof id, paper ids).
+    """
+    counter = itertools.count(1)
+
+    def add(university, vectors, years=None, citations=None):
+        n = next(counter)
+        prof = Professor(name=f"Prof {n}", university=university, profile_url=f"https://example.org/{n}",
+                         email=f"p{n}@example.org")
+        db.add(prof)
+        db.flush()
+        author = Author(name=prof.name, professor_id=prof.id, semantic_scholar_id=f"author-{n}")
+        db.add(author)
+        db.flush()
+        paper_ids = []
+        for i, vector in enumerate(vectors):
+            paper = Paper(semantic_scholar_id=f"paper-{n}-{i}", title=f"Paper {i} of {prof.name}",
+                          abstract="abstract", year=years[i] if years else 2020,
+                          citations=citations[i] if citations else 0, paper_url=None)
+            db.add(paper)
+            db.flush()
+            db.execute(paper_authors.insert().values(paper_id=paper.id, author_id=author.id))
+            db.add(PaperEmbedding(paper_id=paper.id, embedding=np.asarray(vector, dtype=np.float32).tolist(),
+                                  model_version=nlp_engine.model_version))
+            paper_ids.append(paper.id)
+        db.flush()
+        upsert_match_rows(db, paper_ids=paper_ids)
+        db.commit()
+        bump_index_generation(db)
+        return prof.id, paper_ids
+
+    return add
+
+
+def brute_force(db, q, k, filters=None):
+    """(paper id, professor id) of the top-k match_rows by cosine similarity, best first."""
+    from sqlalchemy import text
+    from backend.models.vector import decode_vector
+    q = np.asarray(q, dtype=np.float32) / np.linalg.norm(q)
+    scored = []
+    for r in db.execute(text("SELECT paper_id, professor_id, embedding, university, year, citations FROM match_rows")):
+        if filters:
+            if filters.get("universities") and r.university not in filters["universities"]:
+                continue
+            if filters.get("year_min") is not None and (r.year is None or r.year < filters["year_min"]):
+                continue
+            if filters.get("year_max") is not None and (r.year is None or r.year > filters["year_max"]):
+                continue
+            if filters.get("min_citations") and (r.citations or 0) < filters["min_citations"]:
+                continue
+        v = decode_vector(r.embedding)
+        scored.append((float(v @ q / np.linalg.norm(v)), r.paper_id, r.professor_id))
+    scored.sort(reverse=True)
+    return [(p, f) for _, p, f in scored[:k]]
+
+
+def pairs(matches):
+    return [(m["paper_id"], m["prof_id"]) for m in matches]
@@ -0,0 +1,54 @@
+"""
+/match/batch: one embeddings call for the batch's cache misses, one ranking
+per profile in request order, and the batch size limit.
+"""
+from backend.api import main
+from backend.core.nlp_core import nlp_engine
+
+TOPICS = ["graph neural networks", "protein folding", "glacier melt models"]
+
+
+def titles(groups):
+    return [(g["professor"], [p["title"] for p in g["papers"]]) for g in groups]
+
+
+def test_batch_ranks_every_profile_in_order(client, add_professor, monkeypatch):
+    for topic in TOPICS:
+        add_professor("EPFL", nlp_engine.batch_encode([f"{topic} part {i}" for i in range(3)]))
+    calls = []
+    embed = nlp_engine.throttle.embed
+    monkeypatch.setattr(nlp_engine.throttle, "embed", lambda texts: calls.append(texts) or embed(texts))
+
+    profiles = ["glacier melt models", "", "graph neural networks", "glacier  melt models"]
+    response = client.post("/match/batch", json={"profiles": profiles, "min_score": -1.0, "limit": 6})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[1]["matches"] == []
+    assert results[0]["matches"][0]["professor"] == "Prof 3"
+    assert results[2]["matches"][0]["professor"] == "Prof 1"
+    # Whitespace variants share a cache key: embedded once
+    assert results[3] == {**results[0], "index": 3}
+    assert calls == [["glacier melt models", "graph neural networks"]]
+
+    # Each entry is grouped like /match
+    single = client.post("/match", json={"profile_text": "graph neural networks", "min_score": -1.0, "limit": 6})
+    assert titles(results[2]["matches"]) == titles(single.json())
+
+
+def test_batch_applies_limit_and_min_score(client, add_professor):
+    add_professor("MIT", nlp_engine.batch_encode(["graph neural networks"] + [f"unrelated {i}" for i in range(5)]))
+    response = client.post("/match/batch", json={"profiles": ["graph neural networks"], "limit": 2, "min_score": 0.99})
+    (result,) = response.json()
+    assert titles(result["matches"]) == [("Prof 1", ["Paper 0 of Prof 1"])]
+    response = client.post("/match/batch", json={"profiles": ["graph neural networks"], "limit": 2, "min_score": -1.0})
+    (result,) = response.json()
+    assert len(result["matches"][0]["papers"]) == 2
+
+
+def test_batch_size_is_limited(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_PROFILES", 2)
+    response = client.post("/match/batch", json={"profiles": ["a", "b", "c"]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "At most 2 profiles per batch"
+    assert client.post("/match/batch", json={"profiles": []}).json() == []
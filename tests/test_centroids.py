@@ -0,0 +1,81 @@
+"""
+Professor centroids: citation-weighted, conflict-tolerant updates, and
+two-stage centroid retrieval ranking the right professor first.
+"""
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from backend.models.models import ProfessorCentroid
+from backend.core import centroids
+from backend.core.centroids import update_professor_centroids, paper_weight, backfill_if_empty
+from conftest import DIM
+
+
+def unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def topic_corpus(add_professor, rng, n_topics=6, papers=5):
+    topics = unit(rng.standard_normal((n_topics, DIM)))
+    prof_ids = [add_professor(("MIT", "ETH")[t % 2], topics[t] + 0.02 * rng.standard_normal((papers, DIM)))[0]
+                for t in range(n_topics)]
+    return topics, prof_ids
+
+
+def test_centroid_is_citation_weighted_mean(db, add_professor, rng):
+    vectors = rng.standard_normal((3, DIM))
+    citations = [0, 10, 100]
+    prof_id, _ = add_professor("MIT", vectors, citations=citations)
+    update_professor_centroids(db, [prof_id])
+
+    row = db.get(ProfessorCentroid, prof_id)
+    expected = sum(paper_weight(c) * v / np.linalg.norm(v) for v, c in zip(vectors, citations))
+    np.testing.assert_allclose(row.embedding, expected, rtol=1e-5, atol=1e-6)
+    assert row.paper_count == 3
+    assert abs(row.weight - sum(paper_weight(c) for c in citations)) < 1e-6
+
+
+def test_centroid_search_ranks_the_right_professor(db, index, add_professor, rng):
+    topics, prof_ids = topic_corpus(add_professor, rng)
+    update_professor_centroids(db, prof_ids)
+    for t in (1, 4):
+        q = topics[t] + 0.05 * rng.standard_normal(DIM)
+        stats = {}
+        matches = index.search(db, q, 5, -1.0, "centroid", n_professors=1, stats=stats)
+        assert stats["strategy"] == "centroid"
+        assert {m["prof_id"] for m in matches} == {prof_ids[t]}
+        # Same top professor as the exact scan
+        assert index.search(db, q, 1, -1.0, "exact")[0]["prof_id"] == prof_ids[t]
+
+
+def test_conflicting_insert_is_retried(db, add_professor, rng, monkeypatch):
+    prof_id, _ = add_professor("MIT", rng.standard_normal((2, DIM)))
+    recompute = centroids._recompute
+    calls = []
+
+    def conflict_once(db, prof_id):
+        calls.append(prof_id)
+        if len(calls) == 1:
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        recompute(db, prof_id)
+
+    monkeypatch.setattr(centroids, "_recompute", conflict_once)
+    update_professor_centroids(db, [prof_id])
+    assert len(calls) == 2
+    assert db.get(ProfessorCentroid, prof_id).paper_count == 2
+
+
+def test_persistent_conflicts_are_logged(db, monkeypatch, capsys):
+    def conflict(db, prof_id):
+        raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+    monkeypatch.setattr(centroids, "_recompute", conflict)
+    update_professor_centroids(db, [42])
+    assert "Centroid of professor 42 not updated" in capsys.readouterr().out
+
+
+def test_missing_centroids_are_backfilled(db, add_professor, rng):
+    _, prof_ids = topic_corpus(add_professor, rng, n_topics=3)
+    assert backfill_if_empty() is True
+    assert db.execute(text("SELECT COUNT(*) FROM professor_centroids")).scalar() == 3
+    assert backfill_if_empty() is False
@@ -0,0 +1,138 @@
+"""
+/match deadlines: the fallback ladder, latency-based planning, and which
+path serves the request (X-Match-Path) when the budget is tight.
+"""
+import asyncio
+import pytest
+from backend.api import main
+from backend.api.main import MatchRequest
+from backend.core.nlp_core import nlp_engine
+from backend.core.centroids import update_professor_centroids
+from backend.core.deadline import LatencyModel, fallback_paths, path_name, FAST_EF_SEARCH
+
+TOPICS = ["graph neural networks", "protein folding", "quantum error correction", "glacier melt models"]
+
+
+def labels(paths):
+    return [path_name(p) for p in paths]
+
+
+@pytest.fixture
+def corpus(db, add_professor):
+    prof_ids = []
+    for topic in TOPICS:
+        texts = [f"{topic} part {i}" for i in range(4)]
+        prof_id, _ = add_professor("EPFL", nlp_engine.batch_encode(texts))
+        prof_ids.append(prof_id)
+    update_professor_centroids(db, prof_ids)
+    return prof_ids
+
+
+def match(client, **body):
+    response = client.post("/match", json={"profile_text": "protein folding", "min_score": -1.0, **body})
+    assert response.status_code == 200
+    return response
+
+
+def test_fallback_ladder_gets_cheaper():
+    request = MatchRequest(profile_text="x", strategy="exact")
+    assert labels(fallback_paths(request, {"hnsw", "ivf", "centroid"})) == [
+        "exact", "hnsw", "ivf", "centroid", "ivf probes=1"]
+    assert labels(fallback_paths(request, {"hnsw", "centroid"})) == [
+        "exact", "hnsw", "centroid", f"hnsw ef_search={FAST_EF_SEARCH}"]
+    # Unbuilt structures are never fallbacks
+    assert labels(fallback_paths(request, set())) == ["exact"]
+    assert labels(fallback_paths(MatchRequest(profile_text="x", strategy="centroid"), {"centroid"})) == ["centroid"]
+
+
+def test_plan_picks_first_path_expected_to_fit():
+    model = LatencyModel()
+    paths = fallback_paths(MatchRequest(profile_text="x", strategy="exact"), {"ivf", "centroid"})
+    model.observe(model.key(paths[0], False), 200.0)
+    model.observe(model.key(paths[1], False), 40.0)
+
+    # 80% of the remaining budget is available to the ranking
+    assert path_name(model.plan(paths, False, 300)) == "exact"
+    assert path_name(model.plan(paths, False, 100)) == "ivf"
+    # centroid was never timed, so it is assumed to fit
+    assert path_name(model.plan(paths, False, 10)) == "centroid"
+    # Filtered rankings are timed separately
+    assert path_name(model.plan(paths, True, 10)) == "exact"
+
+
+def test_plan_falls_back_to_cheapest_when_nothing_fits():
+    model = LatencyModel()
+    paths = fallback_paths(MatchRequest(profile_text="x", strategy="exact"), {"centroid"})
+    for path in paths:
+        model.observe(model.key(path, False), 500.0)
+    assert model.plan(paths, False, 50) is paths[-1]
+
+
+def test_latency_model_moving_average():
+    model = LatencyModel(alpha=0.5)
+    model.observe("exact", 100.0)
+    model.observe("exact", 200.0)
+    assert model.expected("exact") == 150.0
+    assert model.expected("ivf") is None
+
+
+def test_without_deadline_requested_path_serves(client, corpus):
+    response = match(client, strategy="exact")
+    assert response.headers["X-Match-Path"] == "exact"
+    assert response.json()[0]["max_score"] > 0.5
+    # Repeated: the cached ranking
+    assert match(client, strategy="exact").headers["X-Match-Path"] == "cache"
+
+
+def test_slow_requested_path_is_planned_away(client, corpus):
+    match(client, strategy="exact")   # builds the index and centroids, embeds the profile
+    # Averaged in, exact is now expected to take ~2s
+    main.latency_model.observe(main.latency_model.key(MatchRequest(profile_text="x", strategy="exact"), False), 10_000)
+
+    response = match(client, strategy="exact", profile_text="protein folding part", deadline_ms=1000)
+    assert response.headers["X-Match-Path"] == "centroid"
+    assert response.json()[0]["professor"] == "Prof 2"
+
+
+def test_planned_path_cache_lookup_is_not_repeated(client, corpus):
+    match(client, strategy="exact")
+    misses = main.result_cache.stats()["misses"]
+    # The plan keeps the requested path: one result cache lookup, not two
+    response = match(client, strategy="exact", profile_text="protein folding part", deadline_ms=5000)
+    assert response.headers["X-Match-Path"] == "exact"
+    assert main.result_cache.stats()["misses"] == misses + 1
+
+
+def test_spent_budget_still_uses_cached_query_vector(client, corpus, monkeypatch):
+    match(client, strategy="exact")
+    original = nlp_engine.aencode_query
+
+    async def slow_encode(text):
+        await asyncio.sleep(0.5)
+        return await original(text)
+
+    # Awaiting the embedding would overrun the budget; the in-memory query
+    # cache still provides the vector, so the cached ranking serves, not BM25
+    monkeypatch.setattr(nlp_engine, "aencode_query", slow_encode)
+    response = match(client, strategy="exact", deadline_ms=50)
+    assert response.headers["X-Match-Path"] == "cache"
+
+    # An uncached profile does fall back to BM25
+    response = match(client, strategy="exact", profile_text="glacier melt", deadline_ms=50)
+    assert response.headers["X-Match-Path"] == "lexical"
+
+
+def test_overrunning_path_races_the_cheapest(client, corpus, monkeypatch):
+    match(client, strategy="exact")
+    original = main._arank_matches
+
+    async def slow_exact(db, vector, request, *args, **kwargs):
+        if request.strategy == "exact":
+            await asyncio.sleep(1.0)
+        return await original(db, vector, request, *args, **kwargs)
+
+    monkeypatch.setattr(main, "_arank_matches", slow_exact)
+    # exact was fast so far, so it is planned, overruns and races centroid
+    response = match(client, strategy="exact", profile_text="protein folding part", deadline_ms=200)
+    assert response.headers["X-Match-Path"] == "centroid"
+    assert response.json()[0]["professor"] == "Prof 2"
@@ -0,0 +1,114 @@
+import time
+from sqlalchemy import text
+from backend.models.models import Professor
+from backend.core import vector_index as vector_index_module
+from backend.core.match_rows import refresh_professor_rows
+from backend.core.hnsw_index import build_lock as hnsw_build_lock
+from backend.core.result_cache import bump_index_generation
+from conftest import DIM, brute_force, pairs
+
+
+def _near(q, rng, n):
+    return [q + 0.05 * rng.standard_normal(DIM) for _ in range(n)]
+
+
+def test_new_rows_are_served_from_the_delta_without_a_rebuild(db, index, add_professor, rng):
+    for university in ("MIT", "ETH"):
+        add_professor(university, rng.standard_normal((10, DIM)))
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+    state, hwm = index.state, index.state.hwm
+
+    _, new_ids = add_professor("ETH", _near(q, rng, 3))
+    matches = index.search(db, q, 10, -1.0, "exact")
+    assert index.state is state and state.hwm == hwm
+    assert len(state.delta) == 3
+    assert {m["paper_id"] for m in matches[:3]} == set(new_ids)
+    assert pairs(matches) == brute_force(db, q, 10)
+
+
+def test_compaction_folds_the_delta_into_the_segments(db, index, add_professor, rng):
+    add_professor("MIT", rng.standard_normal((10, DIM)))
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+    add_professor("Oxford", _near(q, rng, 4))
+    index.search(db, q, 10, -1.0, "exact")
+
+    state = index.compact(db)
+    assert len(state.delta) == 0
+    assert len(state.paper_ids) == 14
+    assert [sh.university for sh in state.shards] == ["MIT", "Oxford"]
+    assert pairs(index.search(db, q, 10, -1.0, "exact")) == brute_force(db, q, 10)
+    assert len(index.state.delta) == 0
+
+
+def test_a_full_delta_is_compacted_in_the_background(db, index, add_professor, rng, monkeypatch):
+    monkeypatch.setattr(vector_index_module, "DELTA_MAX_ROWS", 5)
+    add_professor("MIT", rng.standard_normal((10, DIM)))
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+    state = index.state
+    add_professor("ETH", _near(q, rng, 6))
+    index.search(db, q, 10, -1.0, "exact")
+    for _ in range(100):
+        if index.state is not state and not index._compacting:
+            break
+        time.sleep(0.05)
+    assert index.state is not state
+    assert len(index.state.paper_ids) == 16
+    assert pairs(index.search(db, q, 10, -1.0, "exact")) == brute_force(db, q, 10)
+
+
+def test_updated_and_deleted_rows_are_never_served_stale(db, index, add_professor, rng):
+    prof_id, paper_ids = add_professor("MIT", rng.standard_normal((5, DIM)))
+    add_professor("ETH", rng.standard_normal((5, DIM)))
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+
+    # Within the same second as the indexed rows were written
+    prof = db.get(Professor, prof_id)
+    prof.email = "new@example.org"
+    refresh_professor_rows(db, prof)
+    db.commit()
+    bump_index_generation(db)
+    matches = index.search(db, q, 10, -1.0, "exact")
+    assert {m["email"] for m in matches if m["prof_id"] == prof_id} == {"new@example.org"}
+
+    db.execute(text("DELETE FROM match_rows WHERE paper_id = :paper_id"), {"paper_id": paper_ids[0]})
+    db.commit()
+    bump_index_generation(db)
+    matches = index.search(db, q, 10, -1.0, "exact")
+    assert paper_ids[0] not in {m["paper_id"] for m in matches}
+    assert len(matches) == 9
+
+
+def test_rows_are_invisible_until_the_generation_is_bumped(db, index, add_professor, rng):
+    add_professor("MIT", rng.standard_normal((5, DIM)))
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+    db.execute(text("DELETE FROM match_rows"))
+    db.commit()
+    assert len(index.search(db, q, 10, -1.0, "exact")) == 5
+    bump_index_generation(db)
+    assert index.search(db, q, 10, -1.0, "exact") == []
+
+
+def test_hnsw_scores_compacted_rows_exactly_until_the_graph_has_them(db, index, add_professor, rng):
+    add_professor("MIT", rng.standard_normal((40, DIM)))
+    q = rng.standard_normal(DIM)
+    index.sync_hnsw(index.ensure_fresh(db))
+    _, new_ids = add_professor("ETH", _near(q, rng, 3))
+    index.search(db, q, 10, -1.0, "exact")
+
+    # Another process holds the build lock: the graph cannot catch up
+    with hnsw_build_lock():
+        state = index.compact(db)
+        hnsw, missing = index._ensure_hnsw(state)
+        assert sorted(state.paper_ids[missing].tolist()) == sorted(new_ids)
+        stats = {}
+        matches = index.search(db, q, 3, -1.0, "hnsw", stats=stats)
+        assert stats["strategy"] == "hnsw"
+        assert {m["paper_id"] for m in matches} == set(new_ids)
+
+    index.sync_hnsw(state)
+    assert len(index._ensure_hnsw(state)[1]) == 0
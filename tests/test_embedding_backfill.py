@@ -0,0 +1,118 @@
+"""
+Resumable backfill: the checkpoint only covers batches committed in order,
+an interrupted run resumes after it, and no paper is embedded twice.
+"""
+import json
+import pytest
+from sqlalchemy import text
+from backend.models.models import Paper
+from backend.core.nlp_core import NLPEngine
+from backend.core.embedding_cache import EmbeddingCache
+from backend.core.embedding_providers import HashedNgramProvider
+from backend.workers import tasks
+from backend.workers.embedding_backfill import backfill, _checkpoint_path
+
+N_PAPERS = 10
+
+
+class FlakyProvider(HashedNgramProvider):
+    """Local embeddings under a model name of their own; fails on texts containing a marker in `failing`."""
+
+    def __init__(self):
+        super().__init__()
+        self.model_name = "flaky-test"
+        self.failing = set()
+        self.embedded = []
+
+    def embed(self, texts):
+        if any(marker in t for t in texts for marker in self.failing):
+            raise RuntimeError("embeddings API unavailable")
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def engine(db, tmp_path, monkeypatch):
+    # A private document cache, and no retry sleeps
+    monkeypatch.setattr(tasks, "document_cache", EmbeddingCache(str(tmp_path / "documents.db"), 64, 3600, 1000))
+    monkeypatch.setattr(tasks.time, "sleep", lambda seconds: None)
+    return NLPEngine(FlakyProvider())
+
+
+@pytest.fixture
+def paper_ids(db):
+    papers = [Paper(semantic_scholar_id=f"paper-{i}", title=f"Backfilled paper {i}", abstract=f"abstract {i}",
+                    year=2020, citations=0) for i in range(N_PAPERS)]
+    db.add_all(papers)
+    db.commit()
+    return [p.id for p in papers]
+
+
+def embedding_counts(db, version):
+    rows = db.execute(text("SELECT paper_id, COUNT(*) FROM paper_embeddings WHERE model_version = :v "
+                           "GROUP BY paper_id"), {"v": version})
+    return dict(rows.fetchall())
+
+
+def checkpoint(engine):
+    with open(_checkpoint_path(engine.model_version)) as fh:
+        return json.load(fh)
+
+
+def test_backfill_embeds_every_paper(db, engine, paper_ids):
+    assert backfill(engine, batch_size=3, workers=2) == N_PAPERS
+    assert embedding_counts(db, engine.model_version) == {pid: 1 for pid in paper_ids}
+    assert checkpoint(engine)["after"] == paper_ids[-1]
+    assert checkpoint(engine)["embedded"] == N_PAPERS
+
+    # Nothing left to do
+    assert backfill(engine, batch_size=3, workers=2) == 0
+
+
+def test_interrupted_backfill_resumes_after_checkpoint(db, engine, paper_ids):
+    engine.provider.failing = {"Backfilled paper 9"}   # the last batch
+    with pytest.raises(RuntimeError):
+        backfill(engine, batch_size=3, workers=1)
+    assert checkpoint(engine)["after"] == paper_ids[8]
+    assert checkpoint(engine)["embedded"] == 9
+    assert set(embedding_counts(db, engine.model_version)) == set(paper_ids[:9])
+
+    engine.provider.failing = set()
+    engine.provider.embedded.clear()
+    assert backfill(engine, batch_size=3, workers=1) == 1
+    # Only the paper after the checkpoint was sent to the provider
+    assert engine.provider.embedded == ["Backfilled paper 9. abstract 9"]
+    assert embedding_counts(db, engine.model_version) == {pid: 1 for pid in paper_ids}
+    assert checkpoint(engine)["embedded"] == N_PAPERS
+
+
+def test_checkpoint_never_passes_a_failed_batch(db, engine, paper_ids):
+    # Later batches may commit while an earlier one fails; the checkpoint
+    # stays before the failure and the rerun skips what was committed
+    engine.provider.failing = {"Backfilled paper 3"}   # the second batch of three
+    with pytest.raises(RuntimeError):
+        backfill(engine, batch_size=3, workers=3)
+    assert checkpoint(engine)["after"] == paper_ids[2]
+    assert not set(paper_ids[3:6]) & set(embedding_counts(db, engine.model_version))
+
+    engine.provider.failing = set()
+    backfill(engine, batch_size=3, workers=3)
+    assert embedding_counts(db, engine.model_version) == {pid: 1 for pid in paper_ids}
+
+
+def test_restart_ignores_checkpoint(db, engine, paper_ids):
+    backfill(engine, batch_size=4, workers=1)
+    db.execute(text("DELETE FROM paper_embeddings WHERE paper_id IN (:a, :b)"), {"a": paper_ids[0], "b": paper_ids[1]})
+    db.commit()
+
+    # Behind the checkpoint, so only a restart finds them
+    assert backfill(engine, batch_size=4, workers=1) == 0
+    assert backfill(engine, batch_size=4, workers=1, restart=True) == 2
+    assert embedding_counts(db, engine.model_version) == {pid: 1 for pid in paper_ids}
+
+
+def test_backfill_of_another_model_leaves_served_rows_alone(db, engine, paper_ids):
+    backfill(engine, batch_size=5, workers=1)
+    assert db.execute(text("SELECT COUNT(*) FROM match_rows")).scalar() == 0
+    assert db.execute(text("SELECT COUNT(*) FROM paper_embeddings WHERE model_version != :v"),
+                      {"v": engine.model_version}).scalar() == 0
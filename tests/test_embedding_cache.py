@@ -0,0 +1,103 @@
+"""
+Two-tier embedding cache: memory LRU in front of SQLite, TTL expiry,
+size-bounded eviction, and /match embedding a repeated profile once.
+"""
+import numpy as np
+import pytest
+from backend.core import embedding_cache
+from backend.core.embedding_cache import EmbeddingCache, cache_key
+from backend.core.nlp_core import nlp_engine
+
+
+def vec(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    return lambda memory_size=4, ttl=3600, max_rows=1000: EmbeddingCache(
+        str(tmp_path / "cache" / "embeddings.db"), memory_size, ttl, max_rows)
+
+
+def test_cache_key_normalizes_text_and_separates_models():
+    assert cache_key("deep   learning\n", "m", 768) == cache_key(" deep learning", "m", 768)
+    assert cache_key("é", "m", 768) == cache_key("é", "m", 768)
+    assert cache_key("deep learning", "m", 768) != cache_key("deep learning", "m", 256)
+    assert cache_key("deep learning", "m", 768) != cache_key("deep learning", "other", 768)
+
+
+def test_read_through_memory_then_disk_then_miss(make_cache):
+    cache = make_cache()
+    v = vec(0)
+    cache.put("a", v)
+    np.testing.assert_array_equal(cache.get("a"), v)
+    assert cache.get("b") is None
+
+    # A new process: only the disk tier has it, and the read refills memory
+    fresh = make_cache()
+    assert fresh.get_memory("a") is None
+    np.testing.assert_array_equal(fresh.get("a"), v)
+    np.testing.assert_array_equal(fresh.get_memory("a"), v)
+
+    assert cache.stats() == {"hits_memory": 1, "hits_disk": 0, "misses": 1, "hit_ratio": 0.5,
+                             "memory_entries": 1, "disk_entries": 1}
+    stats = fresh.stats()
+    assert (stats["hits_memory"], stats["hits_disk"], stats["misses"]) == (1, 1, 0)
+
+
+def test_memory_tier_is_a_bounded_lru(make_cache):
+    cache = make_cache(memory_size=2)
+    cache.put_many([("a", vec(0)), ("b", vec(1))])
+    cache.get("a")
+    cache.put("c", vec(2))
+    # "b" was least recently used: evicted from memory, still on disk
+    assert cache.get_memory("b") is None
+    assert cache.get_memory("a") is not None
+    assert cache.get("b") is not None and cache.hits_disk == 1
+
+
+def test_expired_entries_miss(make_cache, monkeypatch):
+    cache = make_cache(ttl=60)
+    cache.put("a", vec(0))
+    later = embedding_cache.time.time() + 120
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: later)
+    assert make_cache(ttl=60).get("a") is None
+    assert make_cache(ttl=60).get_many(["a"]) == {}
+
+
+def test_get_many_mixes_tiers(make_cache):
+    make_cache().put_many([("a", vec(0)), ("b", vec(1))])
+    cache = make_cache()
+    cache.put("c", vec(2))
+    found = cache.get_many(["a", "c", "missing", "a"])
+    assert set(found) == {"a", "c"}
+    np.testing.assert_array_equal(found["a"], vec(0))
+    assert (cache.hits_memory, cache.hits_disk, cache.misses) == (1, 1, 1)
+
+
+def test_disk_tier_evicts_least_recently_accessed(make_cache, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_EVICT_EVERY", 1)
+    cache = make_cache(memory_size=1, max_rows=2)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+    cache.put("a", vec(0))
+    cache.put("b", vec(1))
+    cache.get("a")            # from disk: "a" is now more recent than "b"
+    cache.put("c", vec(2))
+    assert cache.stats()["disk_entries"] == 2
+    assert make_cache().get("b") is None
+    assert make_cache().get("a") is not None
+
+
+def test_match_embeds_a_repeated_profile_once(client, monkeypatch):
+    calls = []
+    aembed = nlp_engine.provider.aembed
+
+    async def counting(texts):
+        calls.append(texts)
+        return await aembed(texts)
+
+    monkeypatch.setattr(nlp_engine.provider, "aembed", counting)
+    for text in ("graph neural networks", "  graph neural   networks"):
+        assert client.post("/match", json={"profile_text": text}).status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,78 @@
+"""
+Embedding providers: selection by name, and the local hashed n-gram
+provider's dimensions, determinism and projection-specific model name.
+"""
+import asyncio
+import numpy as np
+import pytest
+from backend.core.embedding_providers import (get_provider, OpenAIProvider, HashedNgramProvider, EMBEDDING_DIMENSIONS,
+                                              hashed_ngram_features, random_projection, fit_svd_projection,
+                                              save_projection)
+from backend.core.nlp_core import nlp_engine
+
+TEXTS = ["Graph neural networks for molecules", "Protein folding with deep learning", "Glacier melt models"]
+
+
+@pytest.fixture
+def projection_path(tmp_path):
+    return str(tmp_path / "models" / "hashed_ngrams.npy")
+
+
+def test_provider_selection(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert isinstance(get_provider("local"), HashedNgramProvider)
+    # Selecting OpenAI needs neither a key nor the network until the first call
+    provider = get_provider("openai")
+    assert isinstance(provider, OpenAIProvider)
+    assert (provider.model_name, provider.dimensions) == ("text-embedding-3-small", EMBEDDING_DIMENSIONS)
+    with pytest.raises(RuntimeError):
+        provider.embed(["x"])
+    with pytest.raises(ValueError, match="Unknown EMBEDDING_PROVIDER"):
+        get_provider("word2vec")
+    assert isinstance(nlp_engine.provider, HashedNgramProvider)
+
+
+def test_local_vectors_are_deterministic_unit_vectors(projection_path):
+    provider = HashedNgramProvider(projection_path)
+    assert provider.dimensions == EMBEDDING_DIMENSIONS
+    vectors = np.array(provider.embed(TEXTS))
+    assert vectors.shape == (3, EMBEDDING_DIMENSIONS)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+    # Same projection on disk: same model, same vectors (also via aembed)
+    again = HashedNgramProvider(projection_path)
+    assert again.model_name == provider.model_name
+    np.testing.assert_allclose(again.embed(TEXTS), vectors, rtol=1e-6)
+    np.testing.assert_allclose(asyncio.run(again.aembed(TEXTS)), vectors, rtol=1e-6)
+    # Empty text: a zero vector rather than NaNs
+    assert not np.any(provider.embed_array([""]))
+
+
+def test_similar_texts_are_closer(projection_path):
+    provider = HashedNgramProvider(projection_path)
+    a, b, c = provider.embed_array(["graph neural networks", "graph neural network models", "glacier melt"])
+    assert a @ b > a @ c
+
+
+def test_model_name_identifies_the_projection(projection_path):
+    first = HashedNgramProvider(projection_path).model_name
+    assert first.startswith("hashed-ngrams-")
+    save_projection(random_projection(seed=1), projection_path)
+    assert HashedNgramProvider(projection_path).model_name != first
+
+
+def test_features_are_per_text():
+    # Hashing texts together gives each text's own features (no n-grams across texts)
+    together = hashed_ngram_features(TEXTS, 1024)
+    alone = np.stack([hashed_ngram_features([t], 1024)[0] for t in TEXTS])
+    np.testing.assert_array_equal(together, alone)
+    np.testing.assert_array_equal(hashed_ngram_features(["Deep  Learning"], 1024),
+                                  hashed_ngram_features(["deep learning"], 1024))
+    with pytest.raises(ValueError):
+        hashed_ngram_features(TEXTS, 1000)
+
+
+def test_svd_projection_is_orthonormal():
+    texts = [f"paper {i} on {topic}" for i in range(40) for topic in ("graphs", "proteins", "glaciers")]
+    projection = fit_svd_projection(texts, n_features=256, dimensions=16)
+    assert projection.shape == (256, 16)
+    np.testing.assert_allclose(projection.T @ projection, np.eye(16), atol=1e-4)
@@ -0,0 +1,215 @@
+"""
+ThrottledEncoder: request splitting, rate-limit (429) handling and pacing,
+against a fake embed function and a fake clock.
+"""
+import asyncio
+import pytest
+from backend.core import embedding_throttle
+from backend.core.embedding_throttle import ThrottledEncoder, TokenBucket, rate_limit_delay
+
+
+class Response:
+    def __init__(self, status_code=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APIError(Exception):
+    """Shaped like the OpenAI client's errors: status_code and the HTTP response."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = Response(status_code, headers)
+
+
+class FakeEmbed:
+    """Returns [index of the text, batch size] per text; raises the queued errors first."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.errors:
+            raise self.errors.pop(0)
+        return [[float(t.split()[-1]), float(len(texts))] for t in texts]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic() only moves when time.sleep() is called; sleeps are recorded."""
+    class Clock:
+        now = 1000.0
+        sleeps = []
+
+        def sleep(self, seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+    clock = Clock()
+    monkeypatch.setattr(embedding_throttle.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(embedding_throttle.time, "sleep", clock.sleep)
+    return clock
+
+
+def texts(n):
+    return [f"text {i}" for i in range(n)]
+
+
+def test_rate_limit_delay():
+    assert rate_limit_delay(APIError(429, {"retry-after": "2.5"})) == 2.5
+    assert rate_limit_delay(APIError(429)) == 0.0
+    assert rate_limit_delay(APIError(429, {"retry-after": "soon"})) == 0.0
+    assert rate_limit_delay(APIError(500, {"retry-after": "2"})) is None
+    assert rate_limit_delay(ValueError("not an HTTP error")) is None
+
+    # Bogus or huge headers: our own backoff, or the cap
+    assert rate_limit_delay(APIError(429, {"retry-after": "-5"})) == 0.0
+    assert rate_limit_delay(APIError(429, {"retry-after": "nan"})) == 0.0
+    assert rate_limit_delay(APIError(429, {"retry-after": "86400"})) == embedding_throttle._MAX_RETRY_AFTER
+
+    # Status only on the response
+    error = Exception("rate limited")
+    error.response = Response(429, {"retry-after": "1"})
+    assert rate_limit_delay(error) == 1.0
+
+
+def test_encode_splits_batches_and_keeps_order(clock):
+    embed = FakeEmbed()
+    encoder = ThrottledEncoder(embed, max_batch=4)
+    vectors = encoder.encode(texts(10))
+    assert [len(b) for b in embed.batches] == [4, 4, 2]
+    assert [v[0] for v in vectors] == list(range(10))
+    assert encoder.stats()["calls"] == 3
+
+
+def test_encode_skips_empty_texts(clock):
+    embed = FakeEmbed()
+    vectors = ThrottledEncoder(embed).encode(["text 0", "", "   ", None, "text 4"])
+    assert embed.batches == [["text 0", "text 4"]]
+    assert vectors[1:4] == [None, None, None]
+    assert [vectors[0][0], vectors[4][0]] == [0.0, 4.0]
+
+
+def test_encode_caps_tokens_per_request(clock):
+    embed = FakeEmbed()
+    long_text = "x" * 400 + " 1"   # ~100 tokens, over the cap on its own
+    ThrottledEncoder(embed, max_batch_tokens=10).encode(["text 0", long_text, "text 2", "text 3"])
+    # The long text goes alone; the short ones (3 tokens each) share requests
+    assert [len(b) for b in embed.batches] == [1, 1, 2]
+
+
+def test_429_retries_after_retry_after_with_smaller_batches(clock):
+    embed = FakeEmbed([APIError(429, {"retry-after": "3"})])
+    encoder = ThrottledEncoder(embed, max_batch=8)
+    vectors = encoder.encode(texts(8))
+
+    assert [v[0] for v in vectors] == list(range(8))
+    assert clock.sleeps == [3.0]
+    # The failed batch of 8 is retried in halves
+    assert [len(b) for b in embed.batches] == [8, 4, 4]
+    stats = encoder.stats()
+    assert stats["rate_limited"] == 1
+    assert stats["calls"] == 3
+    assert stats["waited_seconds"] == 3.0
+
+
+def test_batch_size_grows_back_after_429(clock):
+    encoder = ThrottledEncoder(FakeEmbed([APIError(429)] * 3), max_batch=16)
+    encoder.encode(texts(1))
+    assert encoder.stats()["batch_size"] == 16 // 8 + 1   # halved three times, then one success
+
+    for _ in range(10):
+        encoder.encode(texts(1))
+    assert encoder.stats()["batch_size"] == 16
+
+
+def test_429_without_retry_after_backs_off(clock):
+    encoder = ThrottledEncoder(FakeEmbed([APIError(429), APIError(429)]))
+    encoder.encode(texts(2))
+    assert len(clock.sleeps) == 2
+    assert 1.0 <= clock.sleeps[0] <= 1.5 and 2.0 <= clock.sleeps[1] <= 2.5
+
+
+def test_429_empties_the_buckets(clock):
+    embed = FakeEmbed([APIError(429, {"retry-after": "1"})])
+    encoder = ThrottledEncoder(embed, requests_per_minute=60)
+    encoder.encode(texts(1))
+    # After the Retry-After (1s), the retry waits for a request token to refill (0 -> 1 at 1/s)
+    assert clock.sleeps == [1.0]
+    assert encoder.requests._level == pytest.approx(0.0)
+
+
+def test_other_errors_propagate_immediately(clock):
+    embed = FakeEmbed([APIError(500), APIError(429)])
+    encoder = ThrottledEncoder(embed)
+    with pytest.raises(APIError) as raised:
+        encoder.encode(texts(3))
+    assert raised.value.status_code == 500
+    assert len(embed.batches) == 1
+    assert clock.sleeps == []
+    assert encoder.stats()["rate_limited"] == 0
+
+
+def test_gives_up_after_max_rate_limited(clock):
+    embed = FakeEmbed([APIError(429, {"retry-after": "1"})] * 10)
+    encoder = ThrottledEncoder(embed, max_rate_limited=3)
+    with pytest.raises(APIError):
+        encoder.encode(texts(4))
+    assert len(embed.batches) == 4
+    assert encoder.stats()["rate_limited"] == 3
+
+
+def test_async_queries_retry_after_429(clock, monkeypatch):
+    embed = FakeEmbed([APIError(429, {"retry-after": "2"})])
+    sleeps = []
+
+    async def aembed(texts):
+        return embed(texts)
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(embedding_throttle.asyncio, "sleep", sleep)
+    encoder = ThrottledEncoder(embed, requests_per_minute=60, max_batch=8)
+    vectors = asyncio.run(encoder.aencode(aembed, ["text 7"]))
+
+    assert vectors == [[7.0, 1.0]]
+    assert sleeps == [2.0]
+    # Never waits on the buckets; the 429 shrinks ingestion's batches too
+    assert clock.sleeps == []
+    stats = encoder.stats()
+    assert (stats["calls"], stats["rate_limited"], stats["batch_size"]) == (2, 1, 4)
+    assert stats["waited_seconds"] == 2.0
+
+
+def test_async_queries_raise_other_errors(clock):
+    async def aembed(texts):
+        raise APIError(500)
+
+    encoder = ThrottledEncoder(FakeEmbed())
+    with pytest.raises(APIError):
+        asyncio.run(encoder.aencode(aembed, ["text 0"]))
+    assert encoder.stats()["rate_limited"] == 0
+
+
+def test_token_bucket_paces_requests(clock):
+    bucket = TokenBucket(60)   # one unit per second, a minute's burst
+    assert bucket.take(60) == 0.0
+    assert bucket.take(5) == pytest.approx(5.0)
+    # Debits may overdraw; the next take waits for them
+    bucket.debit(10)
+    assert bucket.take(1) == pytest.approx(11.0)
+    # Never more than the capacity at once
+    clock.now += 3600
+    assert bucket.take(1000) == 0.0
+
+
+def test_request_budget_spreads_calls(clock):
+    encoder = ThrottledEncoder(FakeEmbed(), requests_per_minute=2, max_batch=1)
+    encoder.encode(texts(4))
+    # Two requests from the burst, then one per 30s
+    assert sum(clock.sleeps) == pytest.approx(60.0)
+    assert encoder.stats()["waited_seconds"] == pytest.approx(60.0)
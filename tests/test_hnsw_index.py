@@ -0,0 +1,77 @@
+"""
+HNSW: recall@k against brute force, persistence, and serving a complete
+graph through VectorIndex.
+"""
+import numpy as np
+import pytest
+from backend.core.hnsw_index import HNSWIndex
+from conftest import DIM, brute_force, pairs
+
+
+def unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def graph():
+    # Built once; the tests only read it
+    x = unit(np.random.default_rng(1).standard_normal((800, 32)))
+    index = HNSWIndex(32, M=8, ef_construction=64, capacity=16)
+    for i, v in enumerate(x):
+        index.insert(v, 10_000 + i)
+    return index, x
+
+
+def test_recall_against_brute_force(graph, rng):
+    index, x = graph
+    assert index.count == len(x)
+    recalls = []
+    for q in unit(rng.standard_normal((30, 32))):
+        ids, sims = index.search(q, 10, ef_search=64)
+        expected = np.argsort(-(x @ q))[:10] + 10_000
+        recalls.append(len(set(ids.tolist()) & set(expected.tolist())) / 10)
+        assert np.all(np.diff(sims) <= 0)
+        np.testing.assert_allclose(sims, x[ids - 10_000] @ q, rtol=1e-5)
+    assert np.mean(recalls) >= 0.95
+
+
+def test_exact_neighbour_is_found(graph):
+    index, x = graph
+    ids, sims = index.search(x[123], 1)
+    assert ids.tolist() == [10_123]
+    assert sims[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_save_and_load_round_trip(graph, rng, tmp_path):
+    index, _ = graph
+    path = str(tmp_path / "hnsw.npz")
+    index.save(path)
+    loaded = HNSWIndex.load(path)
+    assert HNSWIndex.saved_count(path) == loaded.count == index.count
+    assert np.array_equal(loaded.indexed_ids(), index.indexed_ids())
+    for q in unit(rng.standard_normal((5, 32))):
+        assert np.array_equal(loaded.search(q, 10)[0], index.search(q, 10)[0])
+    assert HNSWIndex.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_empty_graph_and_zero_vectors():
+    index = HNSWIndex(4)
+    assert len(index.search(np.ones(4, dtype=np.float32), 5)[0]) == 0
+    index.insert(np.zeros(4), 1)
+    assert index.count == 0
+
+
+def test_index_hnsw_serves_complete_graph(db, index, add_professor, rng):
+    for i in range(10):
+        add_professor(("MIT", "ETH")[i % 2], rng.standard_normal((10, DIM)))
+    state = index.ensure_fresh(db)
+    index.sync_hnsw(state)
+    assert "hnsw" in index.ready_strategies()
+
+    recalls = []
+    for q in rng.standard_normal((10, DIM)):
+        stats = {}
+        found = pairs(index.search(db, q, 10, -1.0, "hnsw", ef_search=64, stats=stats))
+        assert stats["strategy"] == "hnsw"
+        recalls.append(len(set(found) & set(brute_force(db, q, 10))) / 10)
+    assert np.mean(recalls) >= 0.9
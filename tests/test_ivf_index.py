@@ -0,0 +1,87 @@
+"""
+IVF: probing every list is an exact scan, and a few probes keep recall@k
+high on a clustered corpus.
+"""
+import numpy as np
+from backend.core.ivf_index import IVFIndex, inverted_lists, search_lists
+from conftest import DIM, brute_force, pairs
+
+N_CLUSTERS = 8
+
+
+def clustered(rng, n, centers):
+    x = centers[rng.integers(len(centers), size=n)] + 0.3 * rng.standard_normal((n, centers.shape[1]))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def _corpus(add_professor, rng, centers, profs=12, papers=10):
+    for i in range(profs):
+        add_professor(("MIT", "ETH", "EPFL")[i % 3], clustered(rng, papers, centers))
+
+
+def test_all_probes_scan_every_row(rng):
+    centers = rng.standard_normal((N_CLUSTERS, 64))
+    x = clustered(rng, 500, centers)
+    ivf = IVFIndex.train(lambda rows: x[rows], np.arange(500) + 1000, n_lists=N_CLUSTERS)
+    assert ivf.n_lists == N_CLUSTERS
+    assert set(ivf.lookup(np.arange(500) + 1000)) <= set(range(N_CLUSTERS))
+    assert (ivf.lookup(np.array([1, 5000])) == -1).all()
+
+    offsets, order = inverted_lists(ivf.lookup(np.arange(500) + 1000), ivf.n_lists)
+    q = clustered(rng, 1, centers)[0]
+    rows, scores = search_lists(q, ivf.probe(q, ivf.n_lists), offsets, order, lambda rows: x[rows])
+    assert sorted(rows.tolist()) == list(range(500))
+    np.testing.assert_allclose(scores, x[rows] @ q, rtol=1e-6)
+
+
+def test_few_probes_keep_recall(rng):
+    centers = rng.standard_normal((N_CLUSTERS, 64))
+    x = clustered(rng, 2000, centers)
+    ivf = IVFIndex.train(lambda rows: x[rows], np.arange(2000), n_lists=16)
+    offsets, order = inverted_lists(ivf.lookup(np.arange(2000)), ivf.n_lists)
+    recalls = []
+    for q in clustered(rng, 20, centers):
+        rows, scores = search_lists(q, ivf.probe(q, 4), offsets, order, lambda rows: x[rows])
+        found = rows[np.argsort(-scores)[:10]]
+        recalls.append(recall(found.tolist(), np.argsort(-(x @ q))[:10].tolist()))
+    assert np.mean(recalls) >= 0.9
+
+
+def test_add_assigns_new_ids_without_retraining(rng):
+    centers = rng.standard_normal((N_CLUSTERS, 64))
+    x = clustered(rng, 300, centers)
+    ivf = IVFIndex.train(lambda rows: x[rows], np.arange(300) * 2, n_lists=N_CLUSTERS)
+    centroids = ivf.centroids.copy()
+    new = clustered(rng, 5, centers)
+    ivf.add(new, [1, 3, 5, 7, 9])
+    assert (ivf.lookup(np.array([1, 3, 5, 7, 9])) >= 0).all()
+    assert np.array_equal(np.sort(ivf.ids), ivf.ids)
+    np.testing.assert_array_equal(ivf.centroids, centroids)
+
+
+def test_index_ivf_with_every_list_probed_equals_exact(db, index, add_professor, rng):
+    centers = rng.standard_normal((N_CLUSTERS, DIM))
+    _corpus(add_professor, rng, centers)
+    ivf = index.train_ivf(index.ensure_fresh(db), n_lists=N_CLUSTERS)
+    for q in clustered(rng, 3, centers):
+        stats = {}
+        matches = index.search(db, q, 20, -1.0, "ivf", n_probes=ivf.n_lists, stats=stats)
+        assert stats["strategy"] == "ivf"
+        assert pairs(matches) == pairs(index.search(db, q, 20, -1.0, "exact")) == brute_force(db, q, 20)
+
+
+def test_index_ivf_recall_at_k(db, index, add_professor, rng):
+    centers = rng.standard_normal((N_CLUSTERS, DIM))
+    _corpus(add_professor, rng, centers)
+    index.train_ivf(index.ensure_fresh(db), n_lists=N_CLUSTERS)
+    recalls = []
+    for q in clustered(rng, 10, centers):
+        stats = {}
+        found = pairs(index.search(db, q, 10, -1.0, "ivf", n_probes=2, stats=stats))
+        assert stats["scanned"] < 1.0
+        recalls.append(recall(found, brute_force(db, q, 10)))
+    assert np.mean(recalls) >= 0.9
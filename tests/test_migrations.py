@@ -0,0 +1,91 @@
+"""
+Startup migrations: tables created by an older schema gain the columns the
+current models need, and derived tables missing on an upgraded database are
+backfilled, idempotently.
+"""
+from sqlalchemy import text, inspect
+from backend.db.database import engine
+from backend.db.migrate_embeddings import add_job_counters, JOB_COUNTER_COLUMNS
+from backend.core.match_rows import backfill_if_empty as backfill_match_rows
+from conftest import DIM
+from backend.models.models import IngestionJob
+from backend.workers.tasks import _record_job_embeddings
+
+# ingestion_jobs as the baseline schema created it
+BASELINE_INGESTION_JOBS = """
+    CREATE TABLE ingestion_jobs (
+        id VARCHAR NOT NULL PRIMARY KEY,
+        university VARCHAR,
+        total_faculty INTEGER,
+        processed_faculty INTEGER,
+        status VARCHAR,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+    )
+"""
+
+
+def baseline_jobs_table(db):
+    db.execute(text("DROP TABLE ingestion_jobs"))
+    db.execute(text(BASELINE_INGESTION_JOBS))
+    db.execute(text("INSERT INTO ingestion_jobs (id, university, total_faculty, processed_faculty, status) "
+                    "VALUES ('old-job', 'EPFL', 3, 3, 'completed')"))
+    db.commit()
+
+
+def job_columns():
+    return {c["name"] for c in inspect(engine).get_columns("ingestion_jobs")}
+
+
+def test_add_job_counters_upgrades_baseline_table(db):
+    baseline_jobs_table(db)
+    assert not set(JOB_COUNTER_COLUMNS) & job_columns()
+
+    assert add_job_counters() is True
+    assert set(JOB_COUNTER_COLUMNS) <= job_columns()
+    # Idempotent
+    assert add_job_counters() is False
+
+    db.expire_all()
+    job = db.get(IngestionJob, "old-job")
+    assert job.status == "completed"
+    assert all(getattr(job, name) == 0 for name in JOB_COUNTER_COLUMNS)
+
+
+def test_upgraded_table_accepts_new_jobs_and_counters(db):
+    baseline_jobs_table(db)
+    add_job_counters()
+
+    db.add(IngestionJob(id="new-job", university="EPFL", status="queued"))
+    db.commit()
+    _record_job_embeddings(db, {"old-job": (5, 2, 1), "new-job": (3, 0, 1)})
+
+    db.expire_all()
+    old, new = db.get(IngestionJob, "old-job"), db.get(IngestionJob, "new-job")
+    assert (old.papers_embedded, old.embedding_cache_hits, old.embedding_calls) == (5, 2, 1)
+    assert (new.papers_embedded, new.embedding_cache_hits, new.embedding_calls) == (3, 0, 1)
+
+
+def test_add_job_counters_is_a_no_op_on_current_schema(db):
+    assert add_job_counters() is False
+
+
+def count(db, table):
+    return db.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_empty_match_rows_are_backfilled(db, add_professor, rng):
+    add_professor("EPFL", rng.standard_normal((3, DIM)))
+    add_professor("ETH Zurich", rng.standard_normal((2, DIM)))
+    db.execute(text("DELETE FROM match_rows"))
+    db.commit()
+
+    assert backfill_match_rows() is True
+    assert count(db, "match_rows") == 5
+    # Only an empty table is backfilled
+    assert backfill_match_rows() is False
+
+
+def test_nothing_to_backfill_without_embeddings(db):
+    assert backfill_match_rows() is False
+    assert count(db, "match_rows") == 0
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from backend.core import vector_index as vector_index_module
+from backend.core.prefilter import PairFilter, normalize_filters
+from conftest import DIM, brute_force, pairs
+
+UNIVERSITIES = ("MIT", "ETH", "Oxford", "TUM")
+
+
+@pytest.fixture
+def corpus(add_professor, rng):
+    for i in range(12):
+        add_professor(UNIVERSITIES[i % len(UNIVERSITIES)], rng.standard_normal((8, DIM)),
+                      years=[2000 + (i + j) % 20 for j in range(8)],
+                      citations=[int(c) for c in rng.integers(0, 100, 8)])
+
+
+def test_normalize_filters():
+    assert normalize_filters() is None
+    assert normalize_filters(universities=[" ", ""], min_citations=0) is None
+    assert normalize_filters(universities=["TUM ", "ETH", "TUM"], year_min="2010") == {
+        "universities": ["ETH", "TUM"], "year_min": 2010}
+
+
+def test_pair_filter_selects_exactly_the_matching_pairs():
+    universities = np.array(["MIT", "ETH", "MIT", "", "ETH", "MIT"], dtype=object)
+    years = np.array([2001, 2015, -1, 2020, 2010, 2018])
+    citations = np.array([5, 50, 500, 0, 20, 80])
+    pair_filter = PairFilter(universities, years, citations)
+    assert pair_filter.select(None) is None
+    assert pair_filter.select({"universities": ["MIT"]}).tolist() == [0, 2, 5]
+    assert pair_filter.select({"universities": ["Nowhere"]}).tolist() == []
+    # Unknown years never pass a year filter
+    assert pair_filter.select({"year_max": 2012}).tolist() == [0, 4]
+    assert pair_filter.select({"universities": ["MIT", "ETH"], "year_min": 2010, "min_citations": 30}).tolist() == [1, 5]
+
+
+@pytest.mark.parametrize("filters", [
+    {"universities": ["ETH"]},
+    {"universities": ["MIT", "TUM"], "year_min": 2005},
+    {"year_min": 2004, "year_max": 2008},
+    {"min_citations": 90},
+    {"universities": ["Nowhere"]},
+])
+def test_filtered_search_matches_brute_force(db, index, corpus, rng, filters):
+    q = rng.standard_normal(DIM)
+    assert pairs(index.search(db, q, 15, -1.0, "exact", filters=filters)) == brute_force(db, q, 15, filters)
+
+
+@pytest.mark.parametrize("scan_fraction", [0.0, 1.0])
+def test_selective_and_broad_filters_agree(db, index, corpus, rng, monkeypatch, scan_fraction):
+    # 0.0: always the masked full scan; 1.0: always score only the surviving rows
+    monkeypatch.setattr(vector_index_module, "FILTER_SCAN_FRACTION", scan_fraction)
+    filters = {"universities": ["MIT", "ETH", "Oxford"], "year_min": 2003}
+    q = rng.standard_normal(DIM)
+    stats = {}
+    matches = index.search(db, q, 25, -1.0, "exact", filters=filters, stats=stats)
+    assert pairs(matches) == brute_force(db, q, 25, filters)
+    if scan_fraction:
+        assert stats["scanned"] < 1.0
+    else:
+        assert stats["scanned"] == 1.0
+
+
+def test_filters_apply_to_delta_rows(db, index, corpus, add_professor, rng):
+    q = rng.standard_normal(DIM)
+    index.search(db, q, 10, -1.0, "exact")
+    # Rows past the high-water mark are served from the delta
+    add_professor("EPFL", [q, q + 0.01 * rng.standard_normal(DIM)], years=[2024, 1990])
+    eth = index.search(db, q, 10, -1.0, "exact", filters={"universities": ["ETH"]})
+    assert len(index.state.delta) == 2
+    assert all(m["university"] == "ETH" for m in eth)
+    recent = index.search(db, q, 3, -1.0, "exact", filters={"universities": ["EPFL"], "year_min": 2020})
+    assert [(m["university"], m["year"]) for m in recent] == [("EPFL", 2024)]
@@ -0,0 +1,96 @@
+"""
+int8 / PQ first passes: compressed scores track the exact ones, and the
+exact re-rank returns the exact top-k.
+"""
+import numpy as np
+import pytest
+from backend.core.quantization import ScalarQuantizer, ProductQuantizer, QuantizedIndex, rerank
+from conftest import DIM, brute_force, pairs
+
+
+def unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def pq_decode(pq, codes):
+    return np.concatenate([pq.codebooks[j, codes[:, j]] for j in range(pq.m)], axis=1)
+
+
+def test_int8_scan_approximates_dot_products(rng):
+    x = unit(rng.standard_normal((1000, 64)))
+    sq = ScalarQuantizer.train(x)
+    codes = sq.layout(sq.encode(x))
+    assert codes.dtype == np.int8 and codes.shape == (1000, 64)
+    q = unit(rng.standard_normal(64))
+    np.testing.assert_allclose(sq.scan(codes, q), x @ q, atol=0.02)
+
+
+@pytest.mark.parametrize("dim, m", [(64, 16), (60, 15)])
+def test_pq_scan_is_exact_over_decoded_vectors(rng, dim, m):
+    # Asymmetric distances: the scan scores the reconstruction exactly (odd m
+    # exercises the padded subspace pair)
+    x = unit(rng.standard_normal((600, dim)))
+    pq = ProductQuantizer.train(x, m=m, iterations=4)
+    codes = pq.encode(x)
+    assert codes.shape == (600, m) and pq.bytes_per_vector == m
+    q = unit(rng.standard_normal(dim))
+    np.testing.assert_allclose(pq.scan(pq.layout(codes), q), pq_decode(pq, codes) @ q, rtol=1e-4, atol=1e-5)
+
+
+def test_pq_rejects_indivisible_dimension(rng):
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(rng.standard_normal((10, 30)), m=7)
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_rerank_returns_exact_top_k(rng, kind):
+    x = unit(rng.standard_normal((2000, 64)))
+    quantizer = ScalarQuantizer.train(x) if kind == "int8" else ProductQuantizer.train(x, m=16, iterations=4)
+    codes = quantizer.layout(quantizer.encode(x))
+    for q in unit(rng.standard_normal((10, 64))):
+        positions, scores = rerank(q, quantizer.scan(codes, q), 10, lambda rows: x[rows], n_candidates=200)
+        top = positions[np.argsort(-scores)[:10]]
+        exact = np.argsort(-(x @ q))[:10]
+        assert len(set(top.tolist()) & set(exact.tolist())) >= 9
+        np.testing.assert_allclose(scores, x[positions] @ q, rtol=1e-5)
+
+    # Every row a candidate: exactly the exact ranking
+    q = unit(rng.standard_normal(64))
+    positions, scores = rerank(q, quantizer.scan(codes, q), 10, lambda rows: x[rows], n_candidates=len(x))
+    assert positions[np.argsort(-scores)[:10]].tolist() == np.argsort(-(x @ q))[:10].tolist()
+
+
+def test_quantized_index_add_and_persist(rng, monkeypatch, tmp_path):
+    from backend.core import quantization
+    monkeypatch.setattr(quantization, "QUANT_DIR", str(tmp_path))
+    x = unit(rng.standard_normal((50, 32)))
+    index = QuantizedIndex.train("int8", x)
+    index.add(x[25:], np.arange(25, 50) * 2)
+    index.add(x[:25], np.arange(25) * 2)
+    assert np.array_equal(index.ids, np.arange(50) * 2)
+    assert index.missing(np.array([0, 1, 98])).tolist() == [False, True, False]
+    np.testing.assert_array_equal(index.codes_for(np.array([6, 60])), index.quantizer.encode(x[[3, 30]]))
+
+    index.save()
+    loaded = QuantizedIndex.load("int8")
+    assert np.array_equal(loaded.ids, index.ids) and np.array_equal(loaded.codes, index.codes)
+    np.testing.assert_array_equal(loaded.quantizer.scale, index.quantizer.scale)
+    assert QuantizedIndex.load("pq") is None
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_index_quantized_search_reranks_to_exact(db, index, add_professor, rng, kind):
+    for i in range(12):
+        add_professor(("MIT", "ETH", "EPFL")[i % 3], rng.standard_normal((10, DIM)))
+    index.train_quantized(index.ensure_fresh(db), kind)
+    assert kind in index.ready_strategies()
+
+    for q in rng.standard_normal((3, DIM)):
+        stats = {}
+        # Re-ranking every row: the exact result
+        matches = index.search(db, q, 20, -1.0, kind, n_rerank=120, stats=stats)
+        assert stats["strategy"] == kind
+        assert pairs(matches) == brute_force(db, q, 20)
+        # A quarter of the rows as candidates still finds the exact top-5
+        found = pairs(index.search(db, q, 5, -1.0, kind, n_rerank=30))
+        assert len(set(found) & set(brute_force(db, q, 5))) >= 4
@@ -0,0 +1,81 @@
+"""
+/match ranking cache: slicing by limit, LRU bounds, and invalidation as soon
+as a request observes a newer index generation.
+"""
+from backend.core.nlp_core import nlp_engine
+from backend.core.result_cache import MatchResultCache, query_key, get_index_generation, bump_index_generation
+
+
+def ranking(n):
+    return [{"paper_id": i, "score": 1 - i / 100} for i in range(n)]
+
+
+def test_generation_change_drops_every_entry():
+    cache = MatchResultCache(depth=10)
+    cache.put(1, "a", ranking(10), 10)
+    cache.put(1, "b", ranking(10), 10)
+    assert cache.get(1, "a", 5) == ranking(10)
+    assert cache.get(2, "b", 5) is None
+    assert cache.stats() == {"generation": 2, "entries": 0, "hits": 1, "misses": 1,
+                             "hit_ratio": 0.5, "invalidations": 1}
+    # Rankings computed after the change are cached under the new generation
+    cache.put(2, "a", ranking(3), 10)
+    assert cache.get(2, "a", 50) == ranking(3)
+
+
+def test_limit_beyond_a_truncated_ranking_misses():
+    cache = MatchResultCache(depth=10)
+    cache.put(1, "full", ranking(10), 10)      # may have been cut at depth 10
+    cache.put(1, "short", ranking(4), 10)      # the whole result set
+    assert cache.get(1, "full", 10) is not None
+    assert cache.get(1, "full", 11) is None
+    assert cache.get(1, "short", 200) == ranking(4)
+
+
+def test_lru_keeps_max_entries():
+    cache = MatchResultCache(max_entries=2)
+    cache.put(1, "a", [], 10)
+    cache.put(1, "b", [], 10)
+    cache.get(1, "a", 1)
+    cache.put(1, "c", [], 10)
+    assert cache.get(1, "b", 1) is None
+    assert cache.get(1, "a", 1) == [] and cache.get(1, "c", 1) == []
+
+
+def test_dump_and_restore():
+    cache = MatchResultCache()
+    cache.put(3, "a", ranking(2), 10)
+    restored = MatchResultCache()
+    assert restored.restore(cache.dump())
+    assert restored.get(3, "a", 2) == ranking(2)
+    assert not restored.restore(cache.dump())
+
+
+def test_query_key_covers_vector_and_params():
+    assert query_key([1.0, 2.0], strategy="exact", probes=None) == query_key([1.0, 2.0], probes=None, strategy="exact")
+    assert query_key([1.0, 2.0], strategy="exact") != query_key([1.0, 2.0], strategy="hnsw")
+    assert query_key([1.0, 2.0], strategy="exact") != query_key([1.0, 2.5], strategy="exact")
+
+
+def test_bump_index_generation(db):
+    assert get_index_generation(db) == 0
+    bump_index_generation(db)
+    bump_index_generation(db)
+    assert get_index_generation(db) == 2
+
+
+def test_match_is_served_from_cache_until_the_index_changes(client, add_professor):
+    add_professor("MIT", nlp_engine.batch_encode(["graph neural networks"]))
+    body = {"profile_text": "graph neural networks", "min_score": -1.0}
+
+    first = client.post("/match", json=body)
+    assert first.headers["X-Match-Path"] == "exact"
+    second = client.post("/match", json={**body, "limit": 10})
+    assert second.headers["X-Match-Path"] == "cache"
+    assert second.json() == first.json()
+
+    # New papers bump the generation: the next request ranks afresh and sees them
+    add_professor("ETH", nlp_engine.batch_encode(["graph neural networks for molecules"]))
+    third = client.post("/match", json=body)
+    assert third.headers["X-Match-Path"] == "exact"
+    assert [g["professor"] for g in third.json()] == ["Prof 1", "Prof 2"]
@@ -0,0 +1,79 @@
+import pytest
+from backend.models.models import Professor
+from backend.core import snapshot
+from backend.core.match_rows import refresh_professor_rows
+from backend.core.vector_index import VectorIndex
+from backend.core.result_cache import MatchResultCache, get_index_generation, bump_index_generation, query_key
+from backend.core.segments import segment_store
+from conftest import DIM, brute_force, pairs
+
+
+@pytest.fixture
+def restart(monkeypatch):
+    """restart() swaps in a fresh index and result cache, as a new API process has; returns the index."""
+    def new_process():
+        fresh = VectorIndex()
+        monkeypatch.setattr(snapshot, "vector_index", fresh)
+        monkeypatch.setattr(snapshot, "result_cache", MatchResultCache())
+        return fresh
+    return new_process
+
+
+@pytest.fixture
+def snapshotted(db, add_professor, rng, restart):
+    """A corpus over three universities, indexed and snapshotted; returns a query vector."""
+    for i in range(6):
+        add_professor(("MIT", "ETH", "Oxford")[i % 3], rng.standard_normal((5, DIM)))
+    q = rng.standard_normal(DIM)
+    index = restart()
+    index.search(db, q, 10, -1.0, "exact")
+    generation = get_index_generation(db)
+    snapshot.result_cache.put(generation, query_key(q), [{"paper_id": 1}], 200)
+    snapshot.save_snapshot()
+    return q
+
+
+def test_current_snapshot_is_served_without_a_rebuild(db, snapshotted, restart, monkeypatch):
+    index = restart()
+    monkeypatch.setattr(index, "_build", lambda *args: pytest.fail("warm start rebuilt the index"))
+    assert snapshot.warm_start() is True
+    assert pairs(index.search(db, snapshotted, 10, -1.0, "exact")) == brute_force(db, snapshotted, 10)
+    assert snapshot.result_cache.get(get_index_generation(db), query_key(snapshotted), 10) == [{"paper_id": 1}]
+
+
+def test_only_changed_shards_are_rebuilt(db, snapshotted, restart):
+    for prof in db.query(Professor).filter(Professor.university == "ETH"):
+        prof.email = "moved@example.org"
+        refresh_professor_rows(db, prof)
+    db.commit()
+    bump_index_generation(db)
+
+    index = restart()
+    assert snapshot.load_snapshot() is not None
+    loaded = {sh.university: sh for sh in index.state.shards}
+    state = index.ensure_fresh(db)
+    for shard in state.shards:
+        assert (shard is loaded[shard.university]) == (shard.university != "ETH")
+    matches = index.search(db, snapshotted, 30, -1.0, "exact")
+    assert {m["email"] for m in matches if m["university"] == "ETH"} == {"moved@example.org"}
+
+
+def test_rows_added_since_the_snapshot_are_caught_up(db, snapshotted, add_professor, rng, restart):
+    _, new_ids = add_professor("TUM", [snapshotted])
+    index = restart()
+    snapshot.warm_start()
+    # Past the snapshot's high-water mark: polled into the delta, shards kept
+    assert len(index.state.delta) == 1
+    matches = index.search(db, snapshotted, 10, -1.0, "exact")
+    assert matches[0]["paper_id"] == new_ids[0]
+    assert pairs(matches) == brute_force(db, snapshotted, 10)
+
+
+def test_snapshot_of_removed_segments_is_skipped(db, snapshotted, restart):
+    with segment_store.lock():
+        segment_store.clear()
+    index = restart()
+    assert snapshot.load_snapshot() is None
+    assert index.state is None
+    assert snapshot.warm_start() is False
+    assert pairs(index.search(db, snapshotted, 10, -1.0, "exact")) == brute_force(db, snapshotted, 10)
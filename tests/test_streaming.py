@@ -0,0 +1,61 @@
+"""
+NDJSON /match: one professor group per line, in the same order and shape as
+the JSON response, each yielded as soon as it is final.
+"""
+import json
+from backend.api.main import _iter_group_matches, NDJSON
+from backend.core.nlp_core import nlp_engine
+
+
+def match(prof_id, score, title=None):
+    return {"prof_id": prof_id, "prof_name": f"Prof {prof_id}", "university": "EPFL", "email": None,
+            "score": score, "title": title or f"{prof_id}@{score}", "year": 2020, "url": None}
+
+
+def test_groups_keep_the_top_three_papers_in_score_order():
+    flat = [match(1, 0.9), match(2, 0.8), match(1, 0.7), match(1, 0.6), match(1, 0.5), match(2, 0.4)]
+    groups = list(_iter_group_matches(flat))
+    assert [g["professor"] for g in groups] == ["Prof 1", "Prof 2"]
+    assert [p["score"] for p in groups[0]["papers"]] == [0.9, 0.7, 0.6]
+    assert groups[0]["max_score"] == 0.9 and groups[1]["max_score"] == 0.8
+    assert [p["score"] for p in groups[1]["papers"]] == [0.8, 0.4]
+
+
+def test_a_group_is_yielded_once_final():
+    consumed = []
+
+    def flat():
+        for m in [match(1, 0.9), match(2, 0.8), match(2, 0.7), match(2, 0.6), match(1, 0.5), match(1, 0.4),
+                  match(3, 0.3)]:
+            consumed.append(m["score"])
+            yield m
+
+    groups = _iter_group_matches(flat())
+    # Prof 2 is complete first but waits behind the better-scoring Prof 1
+    assert next(groups)["professor"] == "Prof 1"
+    assert consumed[-1] == 0.4
+    assert next(groups)["professor"] == "Prof 2"
+    assert consumed[-1] == 0.4
+    assert next(groups)["professor"] == "Prof 3"
+    assert next(groups, None) is None
+
+
+def test_stream_matches_json_response(client, add_professor):
+    for topic in ["graph neural networks", "protein folding", "glacier melt models"]:
+        add_professor("EPFL", nlp_engine.batch_encode([f"{topic} part {i}" for i in range(5)]))
+    body = {"profile_text": "protein folding", "min_score": -1.0, "limit": 12}
+
+    groups = client.post("/match", json=body).json()
+    response = client.post("/match", json={**body, "stream": True})
+    assert response.headers["content-type"] == NDJSON
+    assert response.headers["X-Match-Path"] == "cache"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == groups
+    assert lines[0]["professor"] == "Prof 2"
+    assert all(len(g["papers"]) <= 3 for g in lines)
+
+
+def test_stream_of_empty_profile_is_empty(client):
+    response = client.post("/match", json={"profile_text": "  ", "stream": True})
+    assert response.headers["content-type"] == NDJSON
+    assert response.text == ""
@@ -0,0 +1,77 @@
+import numpy as np
+from backend.core import vector_index as vector_index_module
+from conftest import DIM, brute_force, pairs
+
+
+def _corpus(add_professor, rng, universities=("MIT", "ETH", "Oxford"), profs=4, papers=6):
+    for i in range(profs * len(universities)):
+        add_professor(universities[i % len(universities)], rng.standard_normal((papers, DIM)))
+
+
+def test_exact_search_matches_brute_force(db, index, add_professor, rng):
+    _corpus(add_professor, rng)
+    for _ in range(3):
+        q = rng.standard_normal(DIM)
+        matches = index.search(db, q, 20, -1.0, "exact")
+        assert pairs(matches) == brute_force(db, q, 20)
+        scores = [m["score"] for m in matches]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_exact_search_scores_are_cosine_similarities(db, index, add_professor, rng):
+    vectors = rng.standard_normal((5, DIM))
+    _, paper_ids = add_professor("MIT", vectors)
+    q = vectors[2] * 3.0
+    top = index.search(db, q, 1, -1.0, "exact")[0]
+    assert top["paper_id"] == paper_ids[2]
+    assert abs(top["score"] - 1.0) < 1e-5
+
+
+def test_min_score_and_limit(db, index, add_professor, rng):
+    _corpus(add_professor, rng)
+    q = rng.standard_normal(DIM)
+    everything = index.search(db, q, 1000, -1.0, "exact")
+    assert len(everything) == 3 * 4 * 6
+    above = index.search(db, q, 1000, 0.05, "exact")
+    assert above == [m for m in everything if m["score"] >= 0.05]
+    assert index.search(db, q, 0, -1.0, "exact") == []
+
+
+def test_sharded_fan_out_matches_single_pass(db, index, add_professor, rng, monkeypatch):
+    _corpus(add_professor, rng, universities=("MIT", "ETH", "Oxford", "TUM", "EPFL"))
+    q = rng.standard_normal(DIM)
+    single = index.search(db, q, 30, -1.0, "exact")
+    # Force several row blocks and shard groups on a small corpus
+    monkeypatch.setattr(vector_index_module, "SHARD_WORKERS", 4)
+    monkeypatch.setattr(vector_index_module, "_MIN_ROWS_PER_TASK", 10)
+    index.state.shard_groups = None
+    assert len(index._shard_groups(index.state)) > 1
+    assert pairs(index.search(db, q, 30, -1.0, "exact")) == pairs(single) == brute_force(db, q, 30)
+
+
+def test_co_authored_paper_is_one_row_with_a_match_per_professor(db, index, add_professor, rng):
+    from backend.models.models import Author, paper_authors
+    from backend.core.match_rows import upsert_match_rows
+    from backend.core.result_cache import bump_index_generation
+    vector = rng.standard_normal(DIM)
+    _, (paper_id,) = add_professor("MIT", [vector])
+    prof_id, _ = add_professor("ETH", rng.standard_normal((2, DIM)))
+    author = db.query(Author).filter(Author.professor_id == prof_id).one()
+    db.execute(paper_authors.insert().values(paper_id=paper_id, author_id=author.id))
+    upsert_match_rows(db, prof_id=prof_id)
+    db.commit()
+    bump_index_generation(db)
+
+    matches = index.search(db, vector, 2, -1.0, "exact")
+    assert {m["paper_id"] for m in matches} == {paper_id}
+    assert {m["university"] for m in matches} == {"MIT", "ETH"}
+    assert len(index.state.paper_ids) == 3
+
+
+def test_search_many_matches_single_searches(db, index, add_professor, rng):
+    _corpus(add_professor, rng)
+    queries = [rng.standard_normal(DIM) for _ in range(4)] + [np.zeros(DIM)]
+    results = index.search_many(db, queries, 10, -1.0)
+    for q, matches in zip(queries[:-1], results):
+        assert pairs(matches) == pairs(index.search(db, q, 10, -1.0, "exact"))
+    assert results[-1] == []